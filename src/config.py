@@ -33,6 +33,51 @@ _REQUIRED = object()
 # =============================================================================
 _FALLBACK_CONFIG: dict = {
     "app": {"name": "FuelPyTracker"},
+    "database": {
+        "pool": {
+            "mode":            "queue",
+            "size":            5,
+            "max_overflow":    5,
+            "recycle_seconds": 1800,
+            "timeout_seconds": 30,
+            "pre_ping":        True,
+        },
+        "session": {"leak_after_seconds": 60, "expire_on_commit": False},
+        "async": {"enabled": True, "timeout_seconds": 30},
+    },
+    "import": {"streaming_min_mb": 5.0, "trace_memory": False},
+    "export": {
+        "xlsx_max_rows": 100000,
+        "cache": {"memory_mb": 64, "disk_dir": "", "disk_mb": 512},
+    },
+    "ocr": {
+        "engines": ["openai", "tesseract"],
+        "tesseract": {"lang": "ita", "psm": 6, "timeout_seconds": 10, "cmd": ""},
+        "resilience": {
+            "max_attempts":          3,
+            "deadline_seconds":      30,
+            "backoff_base_seconds":  0.5,
+            "backoff_max_seconds":   8,
+            "breaker_failures":      5,
+            "breaker_reset_seconds": 60,
+        },
+        "batch": {"max_workers": 4, "rate_per_minute": 30, "burst": 5, "max_files": 50},
+        "preprocess": {
+            "enabled":      True,
+            "max_edge":     1600,
+            "jpeg_quality": 80,
+            "grayscale":    True,
+            "crop":         True,
+        },
+        "cache": {
+            "enabled":                 True,
+            "memory_entries":          256,
+            "sqlite_path":             ".cache/ocr.sqlite3",
+            "sqlite_max_entries":      5000,
+            "perceptual":              False,
+            "perceptual_max_distance": 4,
+        }
+    },
     "defaults": {
         "settings": {
             "price_fluctuation_cents":      0.15,
@@ -0,0 +1,144 @@
+"""
+src/database/async_core.py — Engine asincrono (SQLAlchemy asyncio) per letture concorrenti
+
+Espone:
+  - to_async_url(url)              → URL con driver async (asyncpg / aiosqlite) e connect_args
+  - build_async_engine(url)        → AsyncEngine con il pool di [database.pool]
+  - get_async_session_factory()    → async_sessionmaker sull'URL dei secrets (lazy, per processo)
+  - run_async(coro, timeout)       → esegue una coroutine dal codice sincrono (script Streamlit)
+  - get_async_pool_stats()         → gauge del pool asincrono
+
+Strategia:
+  Gli script Streamlit sono sincroni. Le coroutine girano su un unico event loop
+  in un thread dedicato, condiviso dal processo: le connessioni asyncpg sono legate
+  al loop che le ha aperte, quindi un loop stabile permette di riusarle tra i rerun
+  (asyncio.run ne creerebbe uno nuovo a ogni chiamata, invalidando il pool).
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from functools import lru_cache
+from typing import Awaitable, Optional, Tuple, TypeVar
+from uuid import uuid4
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from src.config import cfg
+from src.database.pool import PoolMetrics, _pool_mode, attach_metrics, pool_stats
+
+T = TypeVar("T")
+
+_ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+# =============================================================================
+# ENGINE
+# =============================================================================
+
+def to_async_url(url: str) -> Tuple[str, dict]:
+    """
+    Converte l'URL sincrono (psycopg2 / pysqlite) nell'equivalente asincrono.
+    asyncpg non accetta 'sslmode' nella query string: viene passato come connect_args['ssl'].
+    """
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = _ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"Backend '{backend}' non supportato dal data layer asincrono")
+
+    connect_args: dict = {}
+    if backend == "postgresql" and "sslmode" in parsed.query:
+        connect_args["ssl"] = parsed.query["sslmode"]
+        parsed = parsed.difference_update_query(["sslmode"])
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False), connect_args
+
+
+def _unique_statement_name() -> str:
+    return f"__asyncpg_{uuid4()}__"
+
+
+def async_engine_options(url: str) -> dict:
+    """kwargs per create_async_engine: stessi parametri del pool sincrono ([database.pool])."""
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+
+    mode = _pool_mode()
+    if mode in ("pgbouncer", "null"):
+        options = {"poolclass": NullPool, "pool_pre_ping": False}
+        if mode == "pgbouncer":
+            # Transaction mode: niente cache di prepared statement tra transazioni diverse e
+            # nomi univoci (i nomi numerati di default di asyncpg collidono tra client sul pooler)
+            options["connect_args"] = {
+                "statement_cache_size": 0,
+                "prepared_statement_cache_size": 0,
+                "prepared_statement_name_func": _unique_statement_name,
+            }
+        return options
+
+    return {
+        "pool_size": int(cfg("database.pool.size", 5)),
+        "max_overflow": int(cfg("database.pool.max_overflow", 5)),
+        "pool_recycle": int(cfg("database.pool.recycle_seconds", 1800)),
+        "pool_timeout": float(cfg("database.pool.timeout_seconds", 30)),
+        "pool_pre_ping": bool(cfg("database.pool.pre_ping", True)),
+    }
+
+
+def build_async_engine(url: str, **overrides) -> AsyncEngine:
+    """AsyncEngine con driver asincrono, pool configurato e metriche di checkout."""
+    async_url, connect_args = to_async_url(url)
+    options = async_engine_options(url)
+    options["connect_args"] = {**options.get("connect_args", {}), **connect_args}
+    engine = create_async_engine(async_url, **{**options, **overrides})
+    attach_metrics(engine.sync_engine, PoolMetrics())
+    return engine
+
+
+@lru_cache(maxsize=1)
+def _default_engine() -> AsyncEngine:
+    # Import locale: core legge i secrets all'import, qui solo al primo utilizzo
+    from src.database.core import DATABASE_URL
+    return build_async_engine(DATABASE_URL)
+
+
+@lru_cache(maxsize=1)
+def get_async_session_factory() -> async_sessionmaker:
+    """Factory di AsyncSession sul database dell'app (sola lettura: nessun expire dopo commit)."""
+    return async_sessionmaker(_default_engine(), expire_on_commit=False, autoflush=False)
+
+
+def get_async_pool_stats() -> dict:
+    """Gauge del pool asincrono (in uso, checkout), stesso formato di core.get_pool_stats()."""
+    return pool_stats(_default_engine().sync_engine)
+
+
+# =============================================================================
+# EVENT LOOP CONDIVISO
+# =============================================================================
+
+class _LoopThread:
+    """Event loop in un thread daemon: punto d'ingresso unico per le coroutine del processo."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="db-async-loop", daemon=True).start()
+            return self._loop
+
+
+_runner = _LoopThread()
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Esegue la coroutine sul loop condiviso e ne attende il risultato (bloccante)."""
+    future = asyncio.run_coroutine_threadsafe(coro, _runner.loop())
+    return future.result(timeout)
@@ -0,0 +1,144 @@
+"""
+src/database/async_crud.py — Repository asincrono per le letture della dashboard
+
+Espone:
+  - get_all_refuelings / get_settings
+      → versioni async (AsyncSession) delle letture di crud.py, con DTO in sola lettura
+  - fetch_dashboard_snapshot(session_factory, user_id)
+      → le letture in parallelo, una sessione (connessione) ciascuna
+  - load_dashboard_snapshot(user_id)
+      → ingresso sincrono per la UI, cachato per utente e versione dei dati
+
+Strategia:
+  Il render della dashboard eseguiva le letture una dopo l'altra sulla stessa
+  sessione sincrona: il tempo al primo grafico era la somma dei round-trip.
+  Con asyncio.gather le query partono insieme su connessioni diverse del pool
+  e il caricamento dura quanto la query più lenta. Il risultato è cachato con
+  le versioni di cache.py delle entità lette: una scrittura su una di esse
+  (es. nuovo rifornimento) invalida lo snapshot del solo utente interessato.
+  Con [database.async] enabled = false le stesse letture passano dalle funzioni
+  sincrone di crud.py (fallback, es. driver async non disponibile).
+  Scadenze, promemoria e km per avvisi e health score non sono qui: arrivano da
+  crud.get_user_snapshot, la stessa query (cachata) di sidebar e impostazioni.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Mapping
+from dataclasses import fields
+from typing import Any, List, Optional
+
+import streamlit as st
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from src.config import DEFAULTS, cfg
+from src.database import cache
+from src.database.dto import (
+    DashboardSnapshot, RefuelingDTO, SettingsDTO, select_columns, to_dtos,
+)
+from src.database.models import AppSettings, Refueling
+
+# Entità lette dallo snapshot: la sua chiave di cache dipende dalle loro versioni
+SNAPSHOT_ENTITIES = (cache.REFUELINGS, cache.SETTINGS)
+
+
+# =============================================================================
+# LETTURE ASINCRONE
+# =============================================================================
+
+async def get_all_refuelings(session: AsyncSession, user_id: str) -> List[RefuelingDTO]:
+    """Storico rifornimenti dell'utente, dal più recente (come crud.get_all_refuelings)."""
+    stmt = select_columns(Refueling, RefuelingDTO).where(Refueling.user_id == user_id).order_by(Refueling.date.desc())
+    return to_dtos(RefuelingDTO, await session.execute(stmt))
+
+
+async def get_settings(session: AsyncSession, user_id: str) -> SettingsDTO:
+    """
+    Impostazioni dell'utente con i default applicati.
+    A differenza di crud.get_settings non crea la riga mancante: la lettura resta
+    senza scritture, la riga viene creata alla prima visita delle Impostazioni.
+    """
+    stmt = select_columns(AppSettings, SettingsDTO).where(AppSettings.user_id == user_id).limit(1)
+    row = (await session.execute(stmt)).first()
+    return settings_to_dto(user_id, row._mapping if row else None)
+
+
+def settings_to_dto(user_id: str, source: Optional[Any]) -> SettingsDTO:
+    """
+    SettingsDTO da una riga (mapping) o da un'istanza AppSettings; None = riga assente.
+    Applica gli stessi fallback di crud.get_settings ai campi nulli.
+    """
+    def _value(name):
+        if source is None:
+            return None
+        return source.get(name) if isinstance(source, Mapping) else getattr(source, name, None)
+
+    data = {f.name: _value(f.name) for f in fields(SettingsDTO)}
+    data["user_id"] = user_id
+    for name, default in _settings_defaults().items():
+        if data[name] is None:
+            data[name] = default
+    return SettingsDTO(**data)
+
+
+def _settings_defaults() -> dict:
+    return {
+        "price_fluctuation_cents": DEFAULTS.SETTINGS.PRICE_FLUCTUATION_CENTS,
+        "max_total_cost": DEFAULTS.SETTINGS.MAX_TOTAL_COST,
+        "max_accumulated_partial_cost": DEFAULTS.SETTINGS.MAX_ACCUMULATED_PARTIAL_COST,
+        "reminder_types": list(DEFAULTS.SETTINGS.REMINDER_TYPES),
+        "maintenance_types": list(DEFAULTS.SETTINGS.MAINTENANCE_TYPES),
+        "import_kml_min": DEFAULTS.SETTINGS.IMPORT.KML_MIN,
+        "import_kml_max": DEFAULTS.SETTINGS.IMPORT.KML_MAX,
+        "import_kml_error": DEFAULTS.SETTINGS.IMPORT.KML_ERROR,
+        "import_kmd_max": DEFAULTS.SETTINGS.IMPORT.KMD_MAX,
+    }
+
+
+# =============================================================================
+# SNAPSHOT DASHBOARD
+# =============================================================================
+
+async def fetch_dashboard_snapshot(session_factory: async_sessionmaker, user_id: str) -> DashboardSnapshot:
+    """
+    Esegue in parallelo le letture della dashboard.
+    Una AsyncSession non ammette query concorrenti: ogni lettura apre la propria.
+    """
+    async def _read(query):
+        async with session_factory() as session:
+            return await query(session, user_id)
+
+    refuelings, settings = await asyncio.gather(
+        _read(get_all_refuelings),
+        _read(get_settings),
+    )
+    return DashboardSnapshot(refuelings=refuelings, settings=settings)
+
+
+def _load_snapshot_sync(user_id: str) -> DashboardSnapshot:
+    """Fallback seriale sulle letture sincrone (e cachate) di crud.py."""
+    from src.database import crud
+    from src.database.core import db_session
+
+    with db_session() as db:
+        return DashboardSnapshot(
+            refuelings=crud.get_all_refuelings(db, user_id),
+            settings=settings_to_dto(user_id, crud.get_settings(db, user_id)),
+        )
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _cached_snapshot(user_id: str, data_versions: tuple) -> DashboardSnapshot:
+    # data_versions entra solo nella chiave: una scrittura la cambia e forza il ricaricamento
+    if not cfg("database.async.enabled", True):
+        return _load_snapshot_sync(user_id)
+
+    from src.database.async_core import get_async_session_factory, run_async
+    timeout = float(cfg("database.async.timeout_seconds", 30))
+    return run_async(fetch_dashboard_snapshot(get_async_session_factory(), user_id), timeout)
+
+
+def load_dashboard_snapshot(user_id: str) -> DashboardSnapshot:
+    """Rifornimenti e impostazioni dell'utente per il render della dashboard."""
+    versions = tuple(cache.get_version(user_id, entity) for entity in SNAPSHOT_ENTITIES)
+    return _cached_snapshot(user_id, versions)
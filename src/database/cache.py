@@ -0,0 +1,134 @@
+"""
+src/database/cache.py — Cache versionata per utente ed entità
+
+Espone:
+  - versioned_cache(*entities)        → decoratore per le letture CRUD cachate
+  - bump_version(user_id, *entities)  → invalida SOLO le entità indicate dell'utente
+  - on_version_bump(listener)         → notifica i bump a cache esterne (es. file di export)
+  - cache_stats()                     → contatori hit/miss per entità
+
+Strategia:
+  Ogni lettura è cachata da st.cache_data con chiave (user_id, data_version, args),
+  dove data_version è il contatore corrente della coppia (user_id, entity).
+  Una lettura che combina più entità usa la tupla delle rispettive versioni.
+  Una scrittura incrementa la versione della sola coppia toccata: le voci vecchie
+  non vengono più richieste e scadono per TTL, mentre le cache degli altri utenti
+  (e delle altre entità dello stesso utente) restano valide.
+"""
+from __future__ import annotations
+
+import functools
+import threading
+from collections import defaultdict
+
+import streamlit as st
+
+# Entità cachate (una versione indipendente per ciascuna)
+REFUELINGS   = "refuelings"
+MAINTENANCES = "maintenances"
+REMINDERS    = "reminders"
+SETTINGS     = "settings"
+
+# Stato condiviso tra le sessioni del processo Streamlit
+_lock = threading.Lock()
+_versions: dict[tuple[str, str], int] = defaultdict(int)
+_calls: dict[str, int] = defaultdict(int)
+_misses: dict[str, int] = defaultdict(int)
+_bump_listeners: list = []
+
+
+# =============================================================================
+# VERSIONI DATI
+# =============================================================================
+
+def get_version(user_id: str, entity: str) -> int:
+    """Versione corrente dei dati dell'utente per l'entità indicata."""
+    with _lock:
+        return _versions[(user_id, entity)]
+
+
+def bump_version(user_id: str, *entities: str) -> None:
+    """Invalida la cache delle entità indicate per il solo utente specificato."""
+    with _lock:
+        for entity in entities:
+            _versions[(user_id, entity)] += 1
+        listeners = list(_bump_listeners)
+    # Fuori dal lock: un listener può leggere le versioni
+    for listener in listeners:
+        listener(user_id, entities)
+
+
+def on_version_bump(listener) -> None:
+    """Registra listener(user_id, entities), chiamato dopo ogni bump_version (una volta sola)."""
+    with _lock:
+        if listener not in _bump_listeners:
+            _bump_listeners.append(listener)
+
+
+# =============================================================================
+# DECORATORE
+# =============================================================================
+
+def versioned_cache(*entities: str, ttl: int = 300):
+    """
+    Decoratore per funzioni di lettura con firma (db, user_id, *args).
+    La sessione DB non entra nella chiave di cache (parametro con underscore).
+    Con più entità la voce è invalidata dalla scrittura su una qualsiasi di esse;
+    i contatori sono raggruppati sotto "entità1+entità2+...".
+    """
+    entity = "+".join(entities)
+
+    def _data_version(user_id):
+        if len(entities) == 1:
+            return get_version(user_id, entities[0])
+        return tuple(get_version(user_id, e) for e in entities)
+
+    def decorator(func):
+        def _cached(_db, user_id, data_version, *args):
+            # Eseguito solo in caso di miss: il corpo non gira se st.cache_data trova la voce
+            with _lock:
+                _misses[entity] += 1
+            return func(_db, user_id, *args)
+
+        # Qualname univoco: st.cache_data distingue le funzioni per nome e sorgente
+        _cached.__qualname__ = f"{func.__qualname__}__versioned"
+        cached = st.cache_data(ttl=ttl, show_spinner=False)(_cached)
+
+        @functools.wraps(func)
+        def wrapper(db, user_id, *args):
+            with _lock:
+                _calls[entity] += 1
+            return cached(db, user_id, _data_version(user_id), *args)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorator
+
+
+# =============================================================================
+# METRICHE
+# =============================================================================
+
+def cache_stats() -> dict:
+    """
+    Contatori per entità: {"refuelings": {"hits", "misses", "hit_rate"}, ...}.
+    Gli hit sono derivati come chiamate - miss.
+    """
+    with _lock:
+        stats = {}
+        for entity, calls in _calls.items():
+            misses = min(_misses[entity], calls)
+            hits = calls - misses
+            stats[entity] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / calls if calls else 0.0,
+            }
+        return stats
+
+
+def reset_stats() -> None:
+    """Azzera i contatori hit/miss (es. tra un test e l'altro o dopo un deploy)."""
+    with _lock:
+        _calls.clear()
+        _misses.clear()
@@ -1,9 +1,12 @@
 import streamlit as st
 
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from contextlib import contextmanager
+from sqlalchemy import text
 from sqlalchemy.exc import OperationalError
+from src.config import cfg
+from src.database.pool import build_engine, pool_stats
+from src.database.session import SessionProvider
+from src.database.migrations import run_migrations
 from src.database.models import Base, Refueling, Maintenance, AppSettings, Reminder, ReminderHistory
 
 # =============================================================================
@@ -27,15 +30,21 @@ except Exception:
     )
     st.stop()
 
-# Engine SQLAlchemy — pool_pre_ping per rilevare connessioni stantie.
-engine = create_engine(
-    DATABASE_URL, 
-    pool_pre_ping=True,
-    poolclass=NullPool
-)
+# Engine SQLAlchemy — pool configurato da [database.pool] in config.toml (QueuePool o PgBouncer).
+engine = build_engine(DATABASE_URL)
 
-# Configurazione transazioni esplicite (no autocommit, no autoflush prematuro)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Configurazione transazioni esplicite (no autocommit, no autoflush prematuro).
+# Sessioni tracciate: conteggio di quelle aperte e warning per quelle che sopravvivono al run.
+# expire_on_commit=False: gli oggetti restano validi dopo il commit (le scritture di crud.py
+# li popolano con RETURNING), senza SELECT di ricarica a ogni accesso successivo.
+_sessions = SessionProvider(
+    engine,
+    leak_after_seconds=float(cfg("database.session.leak_after_seconds", 60)),
+    autocommit=False,
+    autoflush=False,
+    expire_on_commit=bool(cfg("database.session.expire_on_commit", False)),
+)
+SessionLocal = _sessions.open
 
 # =============================================================================
 # FUNZIONI DI UTILITÀ
@@ -48,6 +57,7 @@ def init_db():
     Operazioni:
         - Verifica l'esistenza delle tabelle tramite i metadati di SQLAlchemy.
         - Crea le tabelle mancanti (operazione idempotente).
+        - Applica le migrazioni pendenti (es. indici aggiunti dopo il primo deploy).
 
     Raises:
         Mostra un messaggio di errore e blocca l'app se il database non è raggiungibile.
@@ -57,6 +67,7 @@ def init_db():
         with engine.connect() as conn:
             conn.execute(text("SELECT 1"))
         Base.metadata.create_all(bind=engine)
+        run_migrations(engine)
     except OperationalError as e:
         st.error(
             """
@@ -73,9 +84,46 @@ def init_db():
         st.stop()
 
 
+def get_pool_stats() -> dict:
+    """Gauge del pool di connessioni (in uso, overflow, latenza di checkout) per il dimensionamento."""
+    return pool_stats(engine)
+
+
+def get_session_stats() -> dict:
+    """Sessioni aperte ora, picco, aperte in totale e leak rilevati (sessioni sopravvissute al run)."""
+    return _sessions.stats()
+
+
+@contextmanager
+def db_session():
+    """
+    Sessione dello script run corrente (uso: `with db_session() as db:`).
+    I blocchi annidati nello stesso run condividono la sessione; l'uscita dal blocco
+    più esterno la chiude e restituisce la connessione al pool, anche su eccezione,
+    st.stop() o st.rerun().
+    In caso di DB irraggiungibile, mostra un messaggio di errore e blocca l'app.
+    """
+    try:
+        with _sessions.session() as db:
+            yield db
+    except OperationalError:
+        st.error(
+            """
+            🔴 **Connessione al database persa**
+
+            La connessione al database è caduta durante l'operazione.
+            Questo può accadere se il server è andato in timeout o è stato riavviato.
+
+            ⚙️ Ricarica la pagina per ristabilire la connessione.
+            """
+        )
+        st.stop()
+
+
 def get_db():
     """
     Generatore per la Dependency Injection della sessione database.
+    Per il codice UI preferire db_session(): con next(get_db()) la chiusura dipende dal chiamante.
     Garantisce la chiusura della connessione anche in caso di eccezioni.
     In caso di DB irraggiungibile, mostra un messaggio di errore e blocca l'app.
     """
@@ -1,30 +1,66 @@
-import streamlit as st # <--- Nuovo Import per Cache
-from typing import List, Optional
-from datetime import date
-from sqlalchemy import func, desc, and_, or_
+from dataclasses import fields
+from typing import Callable, Iterator, List, Optional
+from datetime import date, datetime, timezone
+from sqlalchemy import (func, desc, and_, or_, insert, update, bindparam, select, case, cast, literal, null,
+                        true, union_all, Date, Integer)
+from sqlalchemy import inspect as sa_inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Session
-from src.database.models import Refueling, Maintenance, AppSettings, Reminder, ReminderHistory
+from sqlalchemy.sql import expression
+from src.database.models import Refueling, Maintenance, AppSettings, Reminder, ReminderHistory, ReceiptScan
+from src.database import cache
+from src.database.dto import RefuelingDTO, MaintenanceDTO, ReminderDTO, UserSnapshot, select_columns, to_dtos
 from src.config import DEFAULTS
 
+# ==========================================
+# SEZIONE: SCRITTURE SINGOLE (RETURNING)
+# ==========================================
+
+# INSERT/UPDATE ... RETURNING restituiscono l'oggetto già popolato (id e default)
+# nella stessa query: niente SELECT di refresh dopo il commit. Le sessioni dell'app
+# hanno expire_on_commit=False, quindi il commit non invalida l'oggetto; le sessioni
+# che scadono al commit (es. script esterni) lo ricaricano in _commit().
+
+def _insert_returning(db: Session, model, **values):
+    """Inserisce una riga e restituisce l'istanza persistente (un solo round-trip)."""
+    return db.scalars(insert(model).values(**values).returning(model)).one()
+
+def _update_returning(db: Session, model, values: dict, *criteria):
+    """UPDATE filtrato con RETURNING: l'istanza aggiornata, o None se nessuna riga corrisponde."""
+    stmt = update(model).where(*criteria).values(**values).returning(model)
+    return db.scalars(stmt).one_or_none()
+
+def _commit(db: Session, obj):
+    """Commit; refresh solo se la sessione invalida gli oggetti al commit."""
+    db.commit()
+    if obj is not None and db.expire_on_commit:
+        db.refresh(obj)
+    return obj
+
 # ==========================================
 # SEZIONE: GESTIONE RIFORNIMENTI (Refueling)
 # ==========================================
 
-# Prefisso underscore: evita che Streamlit tenti di hashare la sessione DB.
-@st.cache_data(ttl=300, show_spinner=False)
-def get_all_refuelings(_db: Session, user_id: str) -> List[Refueling]:
-    """Restituisce storico filtrato per utente (Cachato)."""
-    return _db.query(Refueling).filter(Refueling.user_id == user_id).order_by(Refueling.date.desc()).all()
+# Cache versionata per (utente, entità): una scrittura invalida solo i dati toccati.
+@cache.versioned_cache(cache.REFUELINGS)
+def get_all_refuelings(db: Session, user_id: str) -> List[RefuelingDTO]:
+    """Restituisce storico filtrato per utente (Cachato, DTO in sola lettura)."""
+    stmt = select_columns(Refueling, RefuelingDTO).where(Refueling.user_id == user_id).order_by(Refueling.date.desc())
+    return to_dtos(RefuelingDTO, db.execute(stmt))
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_last_refueling(_db: Session, user_id: str) -> Optional[Refueling]:
-    """Recupera l'ultimo inserimento dell'utente (Cachato)."""
-    return _db.query(Refueling).filter(Refueling.user_id == user_id).order_by(desc(Refueling.date)).first()
+@cache.versioned_cache(cache.REFUELINGS)
+def get_last_refueling(db: Session, user_id: str) -> Optional[RefuelingDTO]:
+    """Recupera l'ultimo inserimento dell'utente (Cachato, DTO in sola lettura)."""
+    stmt = select_columns(Refueling, RefuelingDTO).where(Refueling.user_id == user_id).order_by(desc(Refueling.date)).limit(1)
+    row = db.execute(stmt).first()
+    return RefuelingDTO(*row) if row else None
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_max_km(_db: Session, user_id: str) -> int:
+@cache.versioned_cache(cache.REFUELINGS)
+def get_max_km(db: Session, user_id: str) -> int:
     """Max KM dell'utente (Cachato)."""
-    max_km = _db.query(func.max(Refueling.total_km)).filter(Refueling.user_id == user_id).scalar()
+    max_km = db.query(func.max(Refueling.total_km)).filter(Refueling.user_id == user_id).scalar()
     return max_km if max_km is not None else 0
 
 def get_neighbors(db: Session, user_id: str, target_date: date) -> dict:
@@ -45,7 +81,8 @@ def create_refueling(
     notes: Optional[str] = None
 ) -> Refueling:
     """Crea e persiste un nuovo record di rifornimento."""
-    new_refueling = Refueling(
+    new_refueling = _insert_returning(
+        db, Refueling,
         user_id=user_id,
         date=date_obj,
         total_km=total_km,
@@ -55,25 +92,19 @@ def create_refueling(
         is_full_tank=is_full_tank,
         notes=notes
     )
-    
-    db.add(new_refueling)
-    db.commit()
-    db.refresh(new_refueling)
-    st.cache_data.clear()  # Invalida cache Streamlit per rendere il nuovo dato visibile
+    _commit(db, new_refueling)
+    cache.bump_version(user_id, cache.REFUELINGS)  # Invalida solo la cache di questo utente/entità
     
     return new_refueling
 
 def update_refueling(db: Session, user_id: str, record_id: int, new_data: dict):
     """Aggiorna un record solo se appartiene all'utente (Sicurezza)."""
-    record = db.query(Refueling).filter(and_(Refueling.id == record_id, Refueling.user_id == user_id)).first()
+    record = _update_returning(db, Refueling, new_data, Refueling.id == record_id, Refueling.user_id == user_id)
     if record:
-        for key, value in new_data.items():
-            setattr(record, key, value)
-        db.commit()
-        db.refresh(record)
+        _commit(db, record)
         
         # Pulizia Cache
-        st.cache_data.clear()
+        cache.bump_version(user_id, cache.REFUELINGS)
         
         return record
     return None
@@ -86,7 +117,7 @@ def delete_refueling(db: Session, user_id: str, record_id: int) -> bool:
         db.commit()
         
         # Pulizia Cache
-        st.cache_data.clear()
+        cache.bump_version(user_id, cache.REFUELINGS)
         
         return True
     return False
@@ -95,10 +126,11 @@ def delete_refueling(db: Session, user_id: str, record_id: int) -> bool:
 # SEZIONE: GESTIONE MANUTENZIONE (Maintenance)
 # ==========================================
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_all_maintenances(_db: Session, user_id: str) -> List[Maintenance]:
-    """Recupera storico manutenzioni (Cachato)."""
-    return _db.query(Maintenance).filter(Maintenance.user_id == user_id).order_by(Maintenance.date.desc()).all()
+@cache.versioned_cache(cache.MAINTENANCES)
+def get_all_maintenances(db: Session, user_id: str) -> List[MaintenanceDTO]:
+    """Recupera storico manutenzioni (Cachato, DTO in sola lettura)."""
+    stmt = select_columns(Maintenance, MaintenanceDTO).where(Maintenance.user_id == user_id).order_by(Maintenance.date.desc())
+    return to_dtos(MaintenanceDTO, db.execute(stmt))
 
 def create_maintenance(
     db: Session,
@@ -112,7 +144,8 @@ def create_maintenance(
     expiry_date: Optional[date] = None
 ) -> Maintenance:
     """Crea e persiste un nuovo record di manutenzione."""
-    new_maintenance = Maintenance(
+    new_maintenance = _insert_returning(
+        db, Maintenance,
         user_id=user_id,
         date=date_obj,
         total_km=total_km,
@@ -122,13 +155,10 @@ def create_maintenance(
         expiry_km=expiry_km,
         expiry_date=expiry_date
     )
-
-    db.add(new_maintenance)
-    db.commit()
-    db.refresh(new_maintenance)
+    _commit(db, new_maintenance)
     
     # Pulizia Cache
-    st.cache_data.clear()
+    cache.bump_version(user_id, cache.MAINTENANCES)
     
     return new_maintenance
 
@@ -139,20 +169,17 @@ def delete_maintenance(db: Session, user_id: str, record_id: int) -> bool:
         db.commit()
         
         # Pulizia Cache
-        st.cache_data.clear()
+        cache.bump_version(user_id, cache.MAINTENANCES)
         return True
     return False
 
 def update_maintenance(db: Session, user_id: str, record_id: int, new_data: dict) -> bool:
-    record = db.query(Maintenance).filter(and_(Maintenance.id == record_id, Maintenance.user_id == user_id)).first()
+    record = _update_returning(db, Maintenance, new_data, Maintenance.id == record_id, Maintenance.user_id == user_id)
     if record:
-        for key, value in new_data.items():
-            setattr(record, key, value)
-        db.commit()
-        db.refresh(record)
+        _commit(db, record)
         
         # Pulizia Cache
-        st.cache_data.clear()
+        cache.bump_version(user_id, cache.MAINTENANCES)
         return True
     return False
 
@@ -187,12 +214,13 @@ def get_all_active_deadlines(db: Session, user_id: str) -> List[Maintenance]:
 # SEZIONE: GESTIONE REMINDERS
 # ==========================================
 
-@st.cache_data(ttl=300, show_spinner=False)
-def get_active_reminders(_db: Session, user_id: str) -> List[Reminder]:
-    """Recupera solo i promemoria attivi dell'utente."""
-    return _db.query(Reminder).filter(
+@cache.versioned_cache(cache.REMINDERS)
+def get_active_reminders(db: Session, user_id: str) -> List[ReminderDTO]:
+    """Recupera solo i promemoria attivi dell'utente (DTO in sola lettura)."""
+    stmt = select_columns(Reminder, ReminderDTO).where(
         and_(Reminder.user_id == user_id, Reminder.is_active == True)
-    ).all()
+    )
+    return to_dtos(ReminderDTO, db.execute(stmt))
 
 def create_reminder(
     db: Session, 
@@ -205,7 +233,8 @@ def create_reminder(
     notes: Optional[str] = None
 ) -> Reminder:
     """Crea un nuovo promemoria (Km o Giorni o entrambi)."""
-    new_reminder = Reminder(
+    new_reminder = _insert_returning(
+        db, Reminder,
         user_id=user_id,
         title=title,
         frequency_km=frequency_km,
@@ -215,10 +244,8 @@ def create_reminder(
         is_active=True,
         notes=notes
     )
-    db.add(new_reminder)
-    db.commit()
-    db.refresh(new_reminder)
-    st.cache_data.clear()
+    _commit(db, new_reminder)
+    cache.bump_version(user_id, cache.REMINDERS)
     return new_reminder
 
 def log_reminder_execution(
@@ -251,7 +278,7 @@ def log_reminder_execution(
         rem.last_date_check = check_date
     
     db.commit()
-    st.cache_data.clear()
+    cache.bump_version(user_id, cache.REMINDERS)
     return True
 
 def update_reminder(
@@ -264,15 +291,11 @@ def update_reminder(
     notes: str
 ):
     """Aggiorna la definizione di un reminder esistente."""
-    rem = db.query(Reminder).filter(and_(Reminder.id == reminder_id, Reminder.user_id == user_id)).first()
+    changes = {"title": title, "frequency_km": freq_km, "frequency_days": freq_days, "notes": notes}
+    rem = _update_returning(db, Reminder, changes, Reminder.id == reminder_id, Reminder.user_id == user_id)
     if rem:
-        rem.title = title
-        rem.frequency_km = freq_km
-        rem.frequency_days = freq_days
-        rem.notes = notes
-        db.commit()
-        db.refresh(rem)
-        st.cache_data.clear()
+        _commit(db, rem)
+        cache.bump_version(user_id, cache.REMINDERS)
         return True
     return False
 
@@ -282,7 +305,7 @@ def delete_reminder(db: Session, user_id: str, reminder_id: int) -> bool:
         # La cascade="all, delete-orphan" nel modello gestisce la pulizia della history.
         db.delete(rem)
         db.commit()
-        st.cache_data.clear()
+        cache.bump_version(user_id, cache.REMINDERS)
         return True
     return False
 
@@ -304,14 +327,13 @@ def get_settings(db: Session, user_id: str) -> AppSettings:
     default_maint  = DEFAULTS.SETTINGS.MAINTENANCE_TYPES
     
     if not settings:
-        settings = AppSettings(
+        settings = _insert_returning(
+            db, AppSettings,
             user_id=user_id,
             reminder_types=list(default_labels),
             maintenance_types=list(default_maint)
         )
-        db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        _commit(db, settings)
     
     # Fallback se il campo nel DB è None (es. vecchi record prima della migrazione)
     if settings.reminder_types is None:
@@ -345,22 +367,379 @@ def update_settings(
     kml_error: float = DEFAULTS.SETTINGS.IMPORT.KML_ERROR,
     kmd_max:   float = DEFAULTS.SETTINGS.IMPORT.KMD_MAX,
 ):
-    settings = db.query(AppSettings).filter(AppSettings.user_id == user_id).first()
-    if not settings:
-        settings = AppSettings(user_id=user_id)
-        db.add(settings)
-    
-    settings.price_fluctuation_cents = fluctuation
-    settings.max_total_cost = max_cost
-    settings.max_accumulated_partial_cost = alert_threshold
-    settings.reminder_types = custom_labels
-    settings.maintenance_types = maintenance_labels
-    settings.import_kml_min = kml_min
-    settings.import_kml_max = kml_max
-    settings.import_kml_error = kml_error
-    settings.import_kmd_max = kmd_max
+    values = {
+        "price_fluctuation_cents": fluctuation,
+        "max_total_cost": max_cost,
+        "max_accumulated_partial_cost": alert_threshold,
+        "reminder_types": custom_labels,
+        "maintenance_types": maintenance_labels,
+        "import_kml_min": kml_min,
+        "import_kml_max": kml_max,
+        "import_kml_error": kml_error,
+        "import_kmd_max": kmd_max,
+    }
+    # Caso comune: la riga esiste già (creata da get_settings) → un solo UPDATE
+    settings = _update_returning(db, AppSettings, values, AppSettings.user_id == user_id)
+    if settings is None:
+        settings = _insert_returning(db, AppSettings, user_id=user_id, **values)
     
+    _commit(db, settings)
+    cache.bump_version(user_id, cache.SETTINGS)
+    return settings
+
+# ==========================================
+# SEZIONE: SNAPSHOT UTENTE (Bootstrap pagine)
+# ==========================================
+
+class _days_between(expression.FunctionElement):
+    """Giorni interi tra due date, compilato per dialetto (differenza nativa su Postgres)."""
+    type = Integer()
+    inherit_cache = True
+
+@compiles(_days_between)
+def _days_between_default(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return f"({compiler.process(end, **kw)} - {compiler.process(start, **kw)})"
+
+@compiles(_days_between, "sqlite")
+def _days_between_sqlite(element, compiler, **kw):
+    start, end = list(element.clauses)
+    return (f"CAST(julianday({compiler.process(end, **kw)}) - "
+            f"julianday({compiler.process(start, **kw)}) AS INTEGER)")
+
+def _tagged_columns(model, dto, prefix: str, present: bool) -> list:
+    """Colonne del DTO con prefisso; NULL tipizzati per l'altro ramo della UNION."""
+    cols = [getattr(model, f.name) for f in fields(dto)]
+    return [(col if present else cast(null(), col.type)).label(f"{prefix}{col.key}") for col in cols]
+
+def _user_snapshot_stmt(user_id: str, today: date):
+    """
+    Una sola SELECT con CTE: aggregati per entità + ultimo rifornimento, più le righe
+    delle scadenze attive (kind 'm') e dei promemoria attivi (kind 'p') in UNION ALL.
+    Gli aggregati stanno su ogni riga (LEFT JOIN): senza elementi resta una riga sola.
+    """
+    ref = (select(func.coalesce(func.max(Refueling.total_km), 0).label("max_km"),
+                  func.count(Refueling.id).label("n_ref"))
+           .where(Refueling.user_id == user_id)).cte("ref_stats")
+
+    last_ref = (select_columns(Refueling, RefuelingDTO)
+                .where(Refueling.user_id == user_id)
+                .order_by(desc(Refueling.date), desc(Refueling.id)).limit(1)).cte("last_ref")
+
+    has_deadline = or_(Maintenance.expiry_km != None, Maintenance.expiry_date != None)
+    maint_overdue = or_(Maintenance.expiry_km < ref.c.max_km, Maintenance.expiry_date < today)
+    maint = (select(func.count(Maintenance.id).label("n_maint"),
+                    func.coalesce(func.sum(case((and_(has_deadline, maint_overdue), 1), else_=0)), 0).label("overdue_maint"))
+             .select_from(Maintenance).join(ref, true())
+             .where(Maintenance.user_id == user_id)).cte("maint_stats")
+
+    # Stessa regola di startup_alerts / gamification: soglia Km oppure giorni raggiunta
+    rem_active = and_(Reminder.user_id == user_id, Reminder.is_active == True)
+    rem_overdue = or_(
+        and_(Reminder.frequency_km > 0, ref.c.max_km - Reminder.last_km_check >= Reminder.frequency_km),
+        and_(Reminder.frequency_days > 0,
+             _days_between(Reminder.last_date_check, literal(today, Date)) >= Reminder.frequency_days),
+    )
+    rem = (select(func.count(Reminder.id).label("n_rem"),
+                  func.coalesce(func.sum(case((rem_overdue, 1), else_=0)), 0).label("overdue_rem"))
+           .select_from(Reminder).join(ref, true())
+           .where(rem_active)).cte("rem_stats")
+
+    items = union_all(
+        select(literal("m").label("kind"),
+               *_tagged_columns(Maintenance, MaintenanceDTO, "m_", True),
+               *_tagged_columns(Reminder, ReminderDTO, "p_", False))
+        .where(Maintenance.user_id == user_id, has_deadline),
+        select(literal("p").label("kind"),
+               *_tagged_columns(Maintenance, MaintenanceDTO, "m_", False),
+               *_tagged_columns(Reminder, ReminderDTO, "p_", True))
+        .where(rem_active),
+    ).cte("items")
+
+    ref_cols = [last_ref.c[f.name].label(f"r_{f.name}") for f in fields(RefuelingDTO)]
+    # Scadenze per data (più vicina prima), poi quelle solo a km; promemoria per id
+    return (select(ref.c.max_km, ref.c.n_ref, maint.c.n_maint, maint.c.overdue_maint,
+                   rem.c.n_rem, rem.c.overdue_rem, *ref_cols, *items.c)
+            .select_from(ref.join(maint, true()).join(rem, true())
+                         .outerjoin(last_ref, true()).outerjoin(items, true()))
+            .order_by(items.c.kind, items.c.m_expiry_date.is_(None), items.c.m_expiry_date,
+                      items.c.m_expiry_km, items.c.p_id))
+
+@cache.versioned_cache(cache.REFUELINGS, cache.MAINTENANCES, cache.REMINDERS)
+def _get_user_snapshot(db: Session, user_id: str, today: date) -> UserSnapshot:
+    rows = [row._mapping for row in db.execute(_user_snapshot_stmt(user_id, today))]
+    first = rows[0]
+
+    def _dto(dto, row, prefix):
+        return dto(*(row[f"{prefix}{f.name}"] for f in fields(dto)))
+
+    return UserSnapshot(
+        max_km=first["max_km"] or 0,
+        last_refueling=_dto(RefuelingDTO, first, "r_") if first["r_id"] is not None else None,
+        refuelings_count=first["n_ref"],
+        maintenances_count=first["n_maint"],
+        active_reminders_count=first["n_rem"],
+        overdue_deadlines=int(first["overdue_maint"] or 0),
+        overdue_reminders=int(first["overdue_rem"] or 0),
+        next_deadlines=[_dto(MaintenanceDTO, row, "m_") for row in rows if row["kind"] == "m"],
+        active_reminders=[_dto(ReminderDTO, row, "p_") for row in rows if row["kind"] == "p"],
+    )
+
+def get_user_snapshot(db: Session, user_id: str) -> UserSnapshot:
+    """
+    Max km, ultimo rifornimento, conteggi, scadenze (superate e prossime) e promemoria
+    attivi/scaduti in un solo round-trip (Cachato per utente, versione dei dati e giorno).
+    """
+    return _get_user_snapshot(db, user_id, date.today())
+
+# ==========================================
+# SEZIONE: SCRITTURE MASSIVE (Import)
+# ==========================================
+
+# Righe per singolo executemany: limita la dimensione del batch inviato al DB
+BULK_CHUNK_SIZE = 500
+
+ProgressCallback = Callable[[int, int], None]
+
+def _chunks(rows: List[dict], size: int) -> Iterator[List[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+def _bulk_execute(
+    db: Session, user_id: str, entity: str, stmt, rows: List[dict],
+    chunk_size: int, on_progress: Optional[ProgressCallback], commit: bool
+) -> int:
+    """
+    Esegue stmt in executemany a blocchi, tutto nella transazione corrente.
+    commit=True  → commit unico, rollback dell'intero batch su errore, una sola invalidazione cache.
+    commit=False → transazione e invalidazione restano al chiamante (es. update + insert dello stesso import).
+    stmt può essere anche una funzione che scrive un blocco di righe (es. fallback riga per riga).
+    """
+    if not rows:
+        return 0
+    done = 0
+    try:
+        write = stmt if callable(stmt) else (lambda chunk: db.execute(stmt, chunk))
+        for chunk in _chunks(rows, chunk_size):
+            write(chunk)
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, len(rows))
+        if commit:
+            db.commit()
+    except Exception:
+        if commit:
+            db.rollback()
+        raise
+    if commit:
+        cache.bump_version(user_id, entity)
+    return done
+
+def _bulk_update_stmt(model, user_id: str):
+    """UPDATE per executemany: chiave 'b_id' nei parametri, SET derivato dalle altre chiavi. Solo record dell'utente."""
+    table = model.__table__
+    return update(table).where(and_(table.c.id == bindparam("b_id"), table.c.user_id == user_id))
+
+def bulk_create_refuelings(
+    db: Session, user_id: str, rows: List[dict],
+    chunk_size: int = BULK_CHUNK_SIZE, on_progress: Optional[ProgressCallback] = None, commit: bool = True
+) -> int:
+    """Inserisce N rifornimenti (dict con i nomi colonna) in executemany. Ritorna il numero di righe."""
+    params = [{**r, "user_id": user_id} for r in rows]
+    return _bulk_execute(db, user_id, cache.REFUELINGS, insert(Refueling.__table__), params,
+                         chunk_size, on_progress, commit)
+
+def bulk_update_refuelings(
+    db: Session, user_id: str, updates: List[dict],
+    chunk_size: int = BULK_CHUNK_SIZE, on_progress: Optional[ProgressCallback] = None, commit: bool = True
+) -> int:
+    """Aggiorna N rifornimenti: ogni dict contiene 'id' e gli stessi campi da modificare."""
+    params = [{"b_id": u["id"], **{k: v for k, v in u.items() if k != "id"}} for u in updates]
+    return _bulk_execute(db, user_id, cache.REFUELINGS, _bulk_update_stmt(Refueling, user_id), params,
+                         chunk_size, on_progress, commit)
+
+def bulk_create_maintenances(
+    db: Session, user_id: str, rows: List[dict],
+    chunk_size: int = BULK_CHUNK_SIZE, on_progress: Optional[ProgressCallback] = None, commit: bool = True
+) -> int:
+    """Inserisce N manutenzioni (dict con i nomi colonna) in executemany. Ritorna il numero di righe."""
+    params = [{**r, "user_id": user_id} for r in rows]
+    return _bulk_execute(db, user_id, cache.MAINTENANCES, insert(Maintenance.__table__), params,
+                         chunk_size, on_progress, commit)
+
+def bulk_update_maintenances(
+    db: Session, user_id: str, updates: List[dict],
+    chunk_size: int = BULK_CHUNK_SIZE, on_progress: Optional[ProgressCallback] = None, commit: bool = True
+) -> int:
+    """Aggiorna N manutenzioni: ogni dict contiene 'id' e gli stessi campi da modificare."""
+    params = [{"b_id": u["id"], **{k: v for k, v in u.items() if k != "id"}} for u in updates]
+    return _bulk_execute(db, user_id, cache.MAINTENANCES, _bulk_update_stmt(Maintenance, user_id), params,
+                         chunk_size, on_progress, commit)
+
+# --- Upsert sulla chiave naturale (riconciliazione import) ---
+
+# INSERT ... ON CONFLICT: stessa sintassi su Postgres e SQLite (>= 3.24)
+_DIALECT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+def _natural_key_index(model):
+    return next(ix for ix in model.__table__.indexes if ix.unique)
+
+def _natural_key(model) -> tuple:
+    """Colonne dell'indice unique del modello (es. user_id, date, total_km)."""
+    return tuple(col.name for col in _natural_key_index(model).columns)
+
+def _has_natural_key_index(db: Session, model) -> bool:
+    """
+    L'indice unique esiste nel DB? Manca se la migrazione 0002 è in attesa perché
+    ci sono record duplicati da risolvere: ON CONFLICT senza indice fallirebbe.
+    """
+    names = {ix["name"] for ix in sa_inspect(db.connection()).get_indexes(model.__tablename__)}
+    return _natural_key_index(model).name in names
+
+def _upsert_stmt(db: Session, model, columns):
+    """
+    INSERT ... ON CONFLICT (chiave naturale) DO UPDATE delle altre colonne presenti nelle righe.
+    Un record già noto viene aggiornato senza conoscerne l'id, uno nuovo inserito.
+    """
+    dialect = db.get_bind().dialect.name
+    dialect_insert = _DIALECT_INSERTS.get(dialect)
+    if dialect_insert is None:
+        raise ValueError(f"Upsert non supportato sul backend '{dialect}'")
+
+    stmt = dialect_insert(model.__table__)
+    key = _natural_key(model)
+    changes = {col: stmt.excluded[col] for col in columns if col not in key}
+    if not changes:
+        return stmt.on_conflict_do_nothing(index_elements=key)
+    return stmt.on_conflict_do_update(index_elements=key, set_=changes)
+
+def _upsert_rowwise(db: Session, model):
+    """Fallback senza indice unique: UPDATE sulla chiave naturale, INSERT se nessuna riga corrisponde."""
+    table = model.__table__
+    key = _natural_key(model)
+
+    def write(chunk: List[dict]) -> None:
+        for row in chunk:
+            same_key = [table.c[col] == row[col] for col in key]
+            changes = {col: value for col, value in row.items() if col not in key}
+            if changes:
+                matched = db.execute(update(table).where(*same_key).values(**changes)).rowcount
+            else:
+                matched = db.execute(select(table.c.id).where(*same_key).limit(1)).first() is not None
+            if not matched:
+                db.execute(insert(table).values(**row))
+    return write
+
+def _bulk_upsert(
+    db: Session, user_id: str, entity: str, model, rows: List[dict],
+    chunk_size: int, on_progress: Optional[ProgressCallback], commit: bool
+) -> int:
+    if not rows:
+        return 0
+    params = [{**r, "user_id": user_id} for r in rows]
+    if _has_natural_key_index(db, model):
+        stmt = _upsert_stmt(db, model, params[0].keys())
+    else:
+        stmt = _upsert_rowwise(db, model)
+    return _bulk_execute(db, user_id, entity, stmt, params, chunk_size, on_progress, commit)
+
+def upsert_refuelings(
+    db: Session, user_id: str, rows: List[dict],
+    chunk_size: int = BULK_CHUNK_SIZE, on_progress: Optional[ProgressCallback] = None, commit: bool = True
+) -> int:
+    """
+    Inserisce o aggiorna N rifornimenti sulla chiave (date, total_km) dell'utente, senza id.
+    Le righe hanno gli stessi campi e chiavi distinte tra loro. Ritorna il numero di righe.
+    """
+    return _bulk_upsert(db, user_id, cache.REFUELINGS, Refueling, rows, chunk_size, on_progress, commit)
+
+def upsert_maintenances(
+    db: Session, user_id: str, rows: List[dict],
+    chunk_size: int = BULK_CHUNK_SIZE, on_progress: Optional[ProgressCallback] = None, commit: bool = True
+) -> int:
+    """
+    Inserisce o aggiorna N manutenzioni sulla chiave (date, total_km, expense_type) dell'utente.
+    Le righe hanno gli stessi campi e chiavi distinte tra loro. Ritorna il numero di righe.
+    """
+    return _bulk_upsert(db, user_id, cache.MAINTENANCES, Maintenance, rows, chunk_size, on_progress, commit)
+
+# ==========================================
+# SEZIONE: LETTURE IN STREAMING (Export)
+# ==========================================
+
+# Righe per partizione lette dal cursore lato server (yield_per)
+EXPORT_CHUNK_SIZE = 1000
+
+def _stream_dtos(db: Session, model, dto, user_id: str, chunk_size: int) -> Iterator[list]:
+    """
+    Storico in ordine cronologico a partizioni di chunk_size DTO (No Cache).
+    yield_per attiva il cursore lato server (stream_results) dove il driver lo supporta:
+    in memoria resta una sola partizione alla volta. La sessione deve restare aperta
+    finché il generatore non è esaurito.
+    """
+    stmt = (select_columns(model, dto).where(model.user_id == user_id)
+            .order_by(model.date.asc(), model.id.asc())
+            .execution_options(yield_per=chunk_size))
+    for partition in db.execute(stmt).partitions():
+        yield to_dtos(dto, partition)
+
+def stream_refuelings(db: Session, user_id: str, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[RefuelingDTO]]:
+    """Rifornimenti dell'utente a blocchi, dal più vecchio."""
+    return _stream_dtos(db, Refueling, RefuelingDTO, user_id, chunk_size)
+
+def stream_maintenances(db: Session, user_id: str, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[List[MaintenanceDTO]]:
+    """Manutenzioni dell'utente a blocchi, dal più vecchio."""
+    return _stream_dtos(db, Maintenance, MaintenanceDTO, user_id, chunk_size)
+
+# ==========================================
+# SEZIONE: STAGING SCANSIONI SCONTRINI (OCR in blocco)
+# ==========================================
+
+def create_receipt_scan(
+    db: Session,
+    user_id: str,
+    batch_id: str,
+    file_name: Optional[str],
+    date_obj: Optional[date] = None,
+    price_per_liter: float = 0.0,
+    total_cost: float = 0.0,
+    liters: float = 0.0,
+    station_name: Optional[str] = None,
+    engine: Optional[str] = None,
+    error: Optional[str] = None,
+    scan_ms: Optional[float] = None,
+) -> ReceiptScan:
+    """Persiste l'esito di una scansione (No Cache: lo staging non entra nelle statistiche)."""
+    scan = ReceiptScan(
+        user_id=user_id,
+        batch_id=batch_id,
+        file_name=file_name,
+        date=date_obj,
+        price_per_liter=price_per_liter,
+        total_cost=total_cost,
+        liters=liters,
+        station_name=station_name,
+        engine=engine,
+        error=error,
+        scan_ms=scan_ms,
+        created_at=datetime.now(timezone.utc).replace(tzinfo=None),
+    )
+    db.add(scan)
+    db.commit()
+    return scan
+
+def get_receipt_scans(db: Session, user_id: str, batch_id: Optional[str] = None) -> List[ReceiptScan]:
+    """Scansioni in staging dell'utente (di un batch o tutte), in ordine di completamento."""
+    query = db.query(ReceiptScan).filter(ReceiptScan.user_id == user_id)
+    if batch_id is not None:
+        query = query.filter(ReceiptScan.batch_id == batch_id)
+    return query.order_by(ReceiptScan.id.asc()).all()
+
+def delete_receipt_scans(db: Session, user_id: str, batch_id: Optional[str] = None) -> int:
+    """Svuota lo staging dell'utente (un batch o tutto). Ritorna le righe eliminate."""
+    query = db.query(ReceiptScan).filter(ReceiptScan.user_id == user_id)
+    if batch_id is not None:
+        query = query.filter(ReceiptScan.batch_id == batch_id)
+    deleted = query.delete(synchronize_session=False)
     db.commit()
-    db.refresh(settings)
-    st.cache_data.clear()
-    return settings
\ No newline at end of file
+    return deleted
@@ -0,0 +1,115 @@
+"""
+src/database/dto.py — Read model immutabili per le letture cachate
+
+Le funzioni CRUD cachate non restituiscono più istanze ORM (stato di sessione,
+riferimenti alla Session, overhead di pickling a ogni hit di st.cache_data) ma
+dataclass frozen con __slots__, popolate da select() sulle sole colonne.
+I nomi dei campi coincidono con le colonne del modello: il codice UI e dei
+servizi accede agli stessi attributi (date, total_km, liters, ...) senza modifiche.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from datetime import date
+from typing import List, Optional, Type, TypeVar
+
+from sqlalchemy import select
+
+T = TypeVar("T")
+
+
+# =============================================================================
+# READ MODEL
+# =============================================================================
+
+@dataclass(frozen=True, slots=True)
+class RefuelingDTO:
+    """Rifornimento in sola lettura (stessi campi di models.Refueling)."""
+    id: int
+    user_id: str
+    date: date
+    total_km: int
+    price_per_liter: float
+    total_cost: float
+    liters: float
+    is_full_tank: Optional[bool]
+    notes: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class MaintenanceDTO:
+    """Manutenzione in sola lettura (stessi campi di models.Maintenance)."""
+    id: int
+    user_id: str
+    date: date
+    total_km: int
+    expense_type: str
+    cost: float
+    description: Optional[str]
+    expiry_km: Optional[int]
+    expiry_date: Optional[date]
+
+
+@dataclass(frozen=True, slots=True)
+class ReminderDTO:
+    """Promemoria in sola lettura (colonne di models.Reminder, senza relazione history)."""
+    id: int
+    user_id: str
+    title: str
+    frequency_km: Optional[int]
+    frequency_days: Optional[int]
+    last_km_check: Optional[int]
+    last_date_check: Optional[date]
+    is_active: Optional[bool]
+    notes: Optional[str]
+
+
+@dataclass(frozen=True, slots=True)
+class SettingsDTO:
+    """Impostazioni utente in sola lettura (colonne di models.AppSettings, default già applicati)."""
+    id: Optional[int]
+    user_id: str
+    price_fluctuation_cents: float
+    max_total_cost: float
+    max_accumulated_partial_cost: float
+    reminder_types: List[str]
+    maintenance_types: List[str]
+    import_kml_min: float
+    import_kml_max: float
+    import_kml_error: float
+    import_kmd_max: float
+
+
+@dataclass(frozen=True, slots=True)
+class DashboardSnapshot:
+    """Dati letti dalla dashboard a ogni render, caricati in un'unica passata."""
+    refuelings: List[RefuelingDTO]
+    settings: SettingsDTO
+
+
+@dataclass(frozen=True, slots=True)
+class UserSnapshot:
+    """Riepilogo per il bootstrap delle pagine (crud.get_user_snapshot, una sola query)."""
+    max_km: int
+    last_refueling: Optional[RefuelingDTO]
+    refuelings_count: int
+    maintenances_count: int
+    active_reminders_count: int
+    overdue_deadlines: int
+    overdue_reminders: int
+    next_deadlines: List[MaintenanceDTO]    # scadenze attive, dalla più vicina (data, poi km)
+    active_reminders: List[ReminderDTO]
+
+
+# =============================================================================
+# HELPER DI QUERY
+# =============================================================================
+
+def select_columns(model, dto: Type[T]):
+    """select() delle sole colonne del modello corrispondenti ai campi del DTO (stesso ordine)."""
+    return select(*(getattr(model, f.name) for f in fields(dto)))
+
+
+def to_dtos(dto: Type[T], rows) -> List[T]:
+    """Converte le righe di una select_columns() nei DTO (costruzione posizionale)."""
+    return [dto(*row) for row in rows]
@@ -0,0 +1,145 @@
+"""
+src/database/migrations.py — Runner di migrazioni leggero e idempotente
+
+Espone:
+  - run_migrations(engine)  → applica in ordine gli step non ancora registrati
+  - MigrationPending        → uno step che non può ancora essere applicato (ritentato al prossimo avvio)
+
+Strategia:
+  create_all() crea tabelle e indici solo per le tabelle NUOVE: sulle installazioni
+  esistenti gli indici aggiunti in seguito ai modelli non verrebbero mai creati.
+  Ogni step è registrato nella tabella 'schema_migrations' ed è comunque scritto
+  in modo idempotente (checkfirst), così un'esecuzione ripetuta di init_db non
+  fallisce. Su Postgres le esecuzioni concorrenti (più worker all'avvio) sono
+  serializzate da un advisory lock di transazione: chi arriva dopo attende e
+  trova gli step già registrati. La registrazione ignora comunque uno step già
+  presente (ON CONFLICT DO NOTHING), così anche su SQLite, dove le scritture sono
+  serializzate dal lock sul file, il secondo runner non fallisce.
+  Uno step che richiede un intervento manuale (es. duplicati da risolvere prima
+  di un vincolo unique) solleva MigrationPending: non viene registrato, gli step
+  successivi restano in attesa e l'app si avvia comunque.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timezone
+from typing import Callable, List, Tuple
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection, Engine
+
+from src.database.models import Maintenance, Refueling, ReminderHistory
+
+logger = logging.getLogger(__name__)
+
+# Tabella di servizio separata dai modelli applicativi (non fa parte di Base.metadata)
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("id", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Chiave dell'advisory lock Postgres che serializza i runner concorrenti (valore arbitrario, fisso)
+_MIGRATION_LOCK_KEY = 718_204_001
+
+_DIALECT_INSERTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+class MigrationPending(Exception):
+    """Step non applicabile finché i dati non vengono sistemati a mano: nessuna modifica ai dati utente."""
+
+
+# =============================================================================
+# STEP
+# =============================================================================
+
+def _create_composite_indexes(conn: Connection) -> None:
+    """Indici (user_id, date) e (user_id, total_km) sulle tabelle storiche."""
+    for model in (Refueling, Maintenance, ReminderHistory):
+        for index in model.__table__.indexes:
+            # I vincoli unique hanno uno step dedicato (deduplica preliminare)
+            if len(index.columns) > 1 and not index.unique:
+                index.create(conn, checkfirst=True)
+
+
+def _natural_key_duplicates(conn: Connection, table, index) -> List[List[int]]:
+    """Gruppi di id che condividono la chiave dell'indice unique (vuoto se nessun conflitto)."""
+    key = [table.c[col.name] for col in index.columns]
+    ids = func.group_concat(table.c.id) if conn.dialect.name == "sqlite" else func.string_agg(
+        table.c.id.cast(String), ",")
+    rows = conn.execute(select(ids).group_by(*key).having(func.count() > 1)).scalars()
+    return [sorted(int(i) for i in str(group).split(",")) for group in rows]
+
+
+def _create_natural_key_constraints(conn: Connection) -> None:
+    """
+    Indici unique sulle chiavi naturali (utente, data, km[, tipo]), target di ON CONFLICT
+    negli upsert degli import. I record esistenti con la stessa chiave non vengono toccati:
+    l'indice della tabella non viene creato, gli id in conflitto finiscono nel log e lo step
+    resta in attesa finché i duplicati non sono risolti (unione o modifica dei record).
+    """
+    pending = []
+    for model in (Refueling, Maintenance):
+        table = model.__table__
+        for index in (ix for ix in table.indexes if ix.unique):
+            duplicates = _natural_key_duplicates(conn, table, index)
+            if duplicates:
+                logger.warning("%s non creato: record con la stessa chiave in '%s' (id: %s)",
+                               index.name, table.name, "; ".join(",".join(map(str, g)) for g in duplicates))
+                pending.append(index.name)
+                continue
+            index.create(conn, checkfirst=True)
+    if pending:
+        raise MigrationPending(f"Duplicati da risolvere prima di: {', '.join(pending)}")
+
+
+# Ordine di applicazione: aggiungere i nuovi step in coda, mai rinominare quelli esistenti
+MIGRATIONS: List[Tuple[str, Callable[[Connection], None]]] = [
+    ("0001_composite_user_indexes", _create_composite_indexes),
+    ("0002_natural_key_unique", _create_natural_key_constraints),
+]
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+def run_migrations(engine: Engine) -> List[str]:
+    """Applica gli step mancanti in un'unica transazione. Ritorna gli id applicati."""
+    applied_now = []
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Rilasciato al commit/rollback: un secondo worker attende qui e poi trova gli step registrati
+            conn.execute(select(func.pg_advisory_xact_lock(_MIGRATION_LOCK_KEY)))
+        schema_migrations.create(conn, checkfirst=True)
+        done = set(conn.execute(select(schema_migrations.c.id)).scalars())
+
+        for migration_id, step in MIGRATIONS:
+            if migration_id in done:
+                continue
+            logger.info("Applico migrazione %s", migration_id)
+            try:
+                step(conn)
+            except MigrationPending as exc:
+                # Non registrato: ritentato al prossimo avvio, gli step successivi attendono
+                logger.warning("Migrazione %s in attesa: %s", migration_id, exc)
+                break
+            if _record_migration(conn, migration_id):
+                applied_now.append(migration_id)
+    return applied_now
+
+
+def _record_migration(conn: Connection, migration_id: str) -> bool:
+    """Registra lo step; False se un'altra esecuzione lo aveva già registrato."""
+    values = {"id": migration_id, "applied_at": datetime.now(timezone.utc).replace(tzinfo=None)}
+    dialect_insert = _DIALECT_INSERTS.get(conn.dialect.name)
+    if dialect_insert is None:
+        if conn.execute(select(schema_migrations.c.id).where(schema_migrations.c.id == migration_id)).first():
+            return False
+        conn.execute(schema_migrations.insert().values(**values))
+        return True
+    stmt = dialect_insert(schema_migrations).values(**values).on_conflict_do_nothing(index_elements=["id"])
+    return conn.execute(stmt).rowcount == 1
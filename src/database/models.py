@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, Date, Text, ForeignKey, JSON, DateTime
+from sqlalchemy import Column, Integer, String, Float, Boolean, Date, Text, ForeignKey, JSON, DateTime, Index
 from sqlalchemy.orm import declarative_base, relationship
 from src.config import DEFAULTS
 
@@ -19,6 +19,14 @@ class Refueling(Base):
     is_full_tank = Column(Boolean, default=True)
     notes = Column(Text, nullable=True)
 
+    # Indici composti: filtro per utente + ordinamento per data / MAX(total_km) senza sort.
+    # Chiave naturale unica (utente, data, km): target dell'upsert degli import.
+    __table_args__ = (
+        Index("ix_refuelings_user_date", "user_id", "date"),
+        Index("ix_refuelings_user_km", "user_id", "total_km"),
+        Index("uq_refuelings_user_date_km", "user_id", "date", "total_km", unique=True),
+    )
+
     def __repr__(self):
         return f"<Refueling(id={self.id}, user={self.user_id}, date={self.date})>"
 
@@ -36,6 +44,12 @@ class Maintenance(Base):
     expiry_km = Column(Integer, nullable=True)
     expiry_date = Column(Date, nullable=True)
 
+    __table_args__ = (
+        Index("ix_maintenances_user_date", "user_id", "date"),
+        Index("ix_maintenances_user_km", "user_id", "total_km"),
+        Index("uq_maintenances_user_date_km_type", "user_id", "date", "total_km", "expense_type", unique=True),
+    )
+
     def __repr__(self):
         return f"<Maintenance(id={self.id}, user={self.user_id}, type={self.expense_type})>"
     
@@ -71,6 +85,10 @@ class ReminderHistory(Base):
 
     reminder = relationship("Reminder", back_populates="history")
 
+    __table_args__ = (
+        Index("ix_reminder_history_user_date", "user_id", "date_checked"),
+    )
+
     def __repr__(self):
         return f"<ReminderLog(id={self.id}, rem={self.reminder_id})>"
     
@@ -96,3 +114,30 @@ class AppSettings(Base):
 
     def __repr__(self):
         return f"<AppSettings(user={self.user_id})>"
+
+# Staging delle scansioni scontrino in blocco: una riga per immagine, scritta
+# appena l'OCR termina. Le righe riuscite diventano righe del foglio Rifornimenti
+# da rivedere (km inclusi) nell'importazione; nessun vincolo con 'refuelings'.
+class ReceiptScan(Base):
+    __tablename__ = 'receipt_scans'
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(String, nullable=False)
+    batch_id = Column(String, nullable=False)
+    file_name = Column(String, nullable=True)
+    date = Column(Date, nullable=True)
+    price_per_liter = Column(Float, default=0.0)
+    total_cost = Column(Float, default=0.0)
+    liters = Column(Float, default=0.0)
+    station_name = Column(String, nullable=True)
+    engine = Column(String, nullable=True)       # motore OCR che ha prodotto il risultato
+    error = Column(Text, nullable=True)          # valorizzato se la lettura è fallita
+    scan_ms = Column(Float, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        Index("ix_receipt_scans_user_batch", "user_id", "batch_id"),
+    )
+
+    def __repr__(self):
+        return f"<ReceiptScan(id={self.id}, user={self.user_id}, batch={self.batch_id})>"
@@ -0,0 +1,189 @@
+"""
+src/database/pool.py — Pool di connessioni configurabile e relative metriche
+
+Espone:
+  - build_engine(url)     → Engine SQLAlchemy configurato secondo [database.pool]
+  - engine_options(url)   → kwargs per create_engine (usato da build_engine e dai test)
+  - pool_stats(engine)    → gauge in-use/overflow e latenza di checkout
+
+Modalità ([database.pool].mode in config.toml):
+  - "queue"     → QueuePool con size/overflow/recycle/timeout
+  - "pgbouncer" → NullPool: il riuso lo gestisce il pooler in transaction mode
+  - "null"      → NullPool senza pooler esterno
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import NullPool, QueuePool
+
+from src.config import cfg
+
+logger = logging.getLogger(__name__)
+
+POOL_MODES = ("queue", "pgbouncer", "null")
+
+
+# =============================================================================
+# METRICHE
+# =============================================================================
+
+class PoolMetrics:
+    """Contatori thread-safe: latenza di checkout, timeout e connessioni in uso."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait = 0.0
+            self.max_wait = 0.0
+            self.in_use = 0
+            self.peak_in_use = 0
+
+    def record_wait(self, seconds: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+
+    def connection_out(self) -> None:
+        with self._lock:
+            self.in_use += 1
+            self.peak_in_use = max(self.peak_in_use, self.in_use)
+
+    def connection_in(self) -> None:
+        with self._lock:
+            self.in_use = max(self.in_use - 1, 0)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "in_use": self.in_use,
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_checkout_ms": (self.total_wait / self.checkouts * 1000) if self.checkouts else 0.0,
+                "max_checkout_ms": self.max_wait * 1000,
+            }
+
+
+# =============================================================================
+# POOL STRUMENTATI
+# =============================================================================
+
+class _TimedPoolMixin:
+    """Misura il tempo speso in pool.connect() (attesa + eventuale apertura connessione)."""
+
+    metrics: PoolMetrics | None = None
+
+    def connect(self):
+        if self.metrics is None:
+            return super().connect()
+        start = time.perf_counter()
+        try:
+            conn = super().connect()
+        except PoolTimeoutError:
+            self.metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        self.metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+    def recreate(self):
+        # engine.dispose() ricrea il pool: i contatori passano alla nuova istanza
+        new_pool = super().recreate()
+        new_pool.metrics = self.metrics
+        return new_pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedNullPool(_TimedPoolMixin, NullPool):
+    pass
+
+
+# =============================================================================
+# COSTRUZIONE ENGINE
+# =============================================================================
+
+def _pool_mode() -> str:
+    mode = str(cfg("database.pool.mode", "queue")).lower()
+    if mode not in POOL_MODES:
+        logger.warning("database.pool.mode '%s' non valido, uso 'queue'.", mode)
+        return "queue"
+    return mode
+
+
+def engine_options(url: str) -> dict:
+    """
+    kwargs per create_engine in base alla modalità configurata.
+    SQLite in memoria mantiene il pool di default del dialetto (una connessione
+    nuova corrisponderebbe a un database vuoto).
+    """
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:"):
+        return {}
+
+    mode = _pool_mode()
+    if mode in ("pgbouncer", "null"):
+        # Connessione nuova a ogni checkout: il pre-ping sarebbe un round-trip inutile
+        return {"poolclass": TimedNullPool, "pool_pre_ping": False}
+
+    return {
+        "poolclass": TimedQueuePool,
+        "pool_size": int(cfg("database.pool.size", 5)),
+        "max_overflow": int(cfg("database.pool.max_overflow", 5)),
+        "pool_recycle": int(cfg("database.pool.recycle_seconds", 1800)),
+        "pool_timeout": float(cfg("database.pool.timeout_seconds", 30)),
+        "pool_pre_ping": bool(cfg("database.pool.pre_ping", True)),
+    }
+
+
+def build_engine(url: str, **overrides) -> Engine:
+    """Crea l'engine con il pool configurato e aggancia le metriche al pool."""
+    options = {**engine_options(url), **overrides}
+    engine = create_engine(url, **options)
+    attach_metrics(engine, PoolMetrics())
+    return engine
+
+
+def attach_metrics(engine: Engine, metrics: PoolMetrics) -> None:
+    """Registra checkout/checkin del pool sui contatori (i listener sopravvivono a dispose())."""
+    engine.pool.metrics = metrics
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        metrics.connection_out()
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        metrics.connection_in()
+
+
+def pool_stats(engine: Engine) -> dict:
+    """
+    Gauge del pool per il dimensionamento sotto carico:
+    in_use/peak_in_use, overflow attivo, connessioni idle, latenza media/max di checkout.
+    """
+    pool = engine.pool
+    metrics = getattr(pool, "metrics", None)
+    stats = metrics.snapshot() if metrics else {}
+    stats["pool"] = type(pool).__name__
+    if isinstance(pool, QueuePool):
+        stats["size"] = pool.size()
+        stats["idle"] = pool.checkedin()
+        stats["overflow"] = max(pool.overflow(), 0)
+    return stats
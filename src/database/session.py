@@ -0,0 +1,165 @@
+"""
+src/database/session.py — Sessioni per script run, con chiusura garantita e rilevamento dei leak
+
+Espone:
+  - SessionProvider(bind, leak_after_seconds)
+      .session()  → context manager: sessione del run corrente (rientrante), sempre chiusa all'uscita
+      .open()     → sessione tracciata da chiudere a mano (compatibilità con get_db)
+      .stats()    → sessioni aperte, picco, aperte in totale, leak rilevati
+      .sweep()    → segnala (e chiude, se possibile) le sessioni sopravvissute al loro run
+  - TrackedSession → Session che notifica la chiusura al provider
+
+Strategia:
+  Ogni script run di Streamlit gira in un thread dello ScriptRunner: la sessione
+  aperta dal blocco 'with' più esterno è riusata dai blocchi annidati dello stesso
+  thread (una connessione per run invece di una per componente) e viene chiusa,
+  con ritorno della connessione al pool, all'uscita dal blocco esterno, anche su
+  eccezione, st.stop() o st.rerun(). Una sessione è un leak se resta aperta dopo
+  la fine del thread che l'ha creata, oltre 'leak_after_seconds', o se viene
+  raccolta dal garbage collector senza close(): viene registrato un warning e
+  incrementato il contatore 'leaked'.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator
+
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger(__name__)
+
+
+class TrackedSession(Session):
+    """Session che avvisa il provider (in info['tracker']) alla chiusura."""
+
+    def close(self) -> None:
+        super().close()
+        tracker = self.info.get("tracker")
+        if tracker is not None:
+            tracker._closed(self)
+
+
+@dataclass
+class _Tracked:
+    ref: weakref.ref
+    thread: weakref.ref
+    thread_name: str
+    opened_at: float
+    reported: bool = field(default=False)
+
+
+# =============================================================================
+# PROVIDER
+# =============================================================================
+
+class SessionProvider:
+    """Factory di sessioni tracciate con scope per script run."""
+
+    def __init__(self, bind, leak_after_seconds: float = 60.0, clock=time.monotonic, **session_options):
+        self.leak_after_seconds = leak_after_seconds
+        self._clock = clock
+        self._factory = sessionmaker(bind=bind, class_=TrackedSession,
+                                     info={"tracker": self}, **session_options)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._open: dict[int, _Tracked] = {}
+        self._peak = 0
+        self._opened = 0
+        self._leaked = 0
+
+    # --- Apertura / chiusura -------------------------------------------------
+
+    def open(self) -> TrackedSession:
+        """Nuova sessione tracciata: il chiamante deve chiuderla (preferire session())."""
+        self.sweep()
+        db = self._factory()
+        key = id(db)
+        thread = threading.current_thread()
+        entry = _Tracked(ref=weakref.ref(db, lambda _ref, key=key: self._collected(key)),
+                         thread=weakref.ref(thread), thread_name=thread.name,
+                         opened_at=self._clock())
+        with self._lock:
+            self._open[key] = entry
+            self._opened += 1
+            self._peak = max(self._peak, len(self._open))
+        return db
+
+    @contextmanager
+    def session(self) -> Iterator[TrackedSession]:
+        """
+        Sessione del run corrente. Nei blocchi annidati dello stesso thread restituisce
+        la stessa sessione; la chiude solo l'uscita dal blocco più esterno.
+        close() annulla l'eventuale transazione non confermata.
+        """
+        current = getattr(self._local, "session", None)
+        if current is not None:
+            yield current
+            return
+
+        db = self.open()
+        self._local.session = db
+        try:
+            yield db
+        finally:
+            self._local.session = None
+            db.close()
+
+    def _closed(self, db: Session) -> None:
+        with self._lock:
+            self._open.pop(id(db), None)
+
+    def _collected(self, key: int) -> None:
+        # Sessione raccolta dal GC ancora aperta: la connessione non è tornata al pool con close()
+        with self._lock:
+            entry = self._open.pop(key, None)
+            if entry is None:
+                return
+            if not entry.reported:
+                self._leaked += 1
+        if not entry.reported:
+            logger.warning("Sessione DB non chiusa (thread %s) raccolta dal garbage collector", entry.thread_name)
+
+    # --- Rilevamento leak ----------------------------------------------------
+
+    def sweep(self) -> int:
+        """
+        Sessioni sopravvissute al loro run: warning e contatore 'leaked' una volta per
+        sessione. Se il thread proprietario è terminato la sessione viene anche chiusa.
+        Restituisce il numero di nuovi leak.
+        """
+        now = self._clock()
+        found, to_close = [], []
+        with self._lock:
+            for entry in list(self._open.values()):
+                owner = entry.thread()
+                owner_done = owner is None or not owner.is_alive()
+                too_old = now - entry.opened_at > self.leak_after_seconds
+                if not (owner_done or too_old):
+                    continue
+                if not entry.reported:
+                    entry.reported = True
+                    self._leaked += 1
+                    found.append((entry, now - entry.opened_at, owner_done))
+                db = entry.ref()
+                if owner_done and db is not None:
+                    to_close.append(db)
+
+        for entry, age, owner_done in found:
+            logger.warning("Sessione DB aperta da %.1f s oltre il suo run (thread %s%s)",
+                           age, entry.thread_name, ", terminato: chiusa" if owner_done else "")
+        for db in to_close:
+            # Il thread proprietario non esiste più: nessun accesso concorrente alla sessione
+            db.close()
+        return len(found)
+
+    def stats(self) -> dict:
+        """Gauge e contatori: open (attualmente aperte), peak_open, opened, leaked."""
+        self.sweep()
+        with self._lock:
+            return {"open": len(self._open), "peak_open": self._peak,
+                    "opened": self._opened, "leaked": self._leaked}
@@ -0,0 +1,82 @@
+import sys
+import os
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+# Comando Avvio: python -m src.scripts.bench_excel_export [n_righe_max]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../../'))
+sys.path.append(project_root)
+
+from src.database.dto import MaintenanceDTO, RefuelingDTO
+from src.services.data.exporters.reports import build_excel_report
+
+# =============================================================================
+# BENCHMARK EXPORT EXCEL — scalabilità su storici grandi
+# =============================================================================
+# Genera storici sintetici di dimensione crescente (raddoppio) e misura per
+# ciascuno tempo di export e picco di memoria Python (tracemalloc).
+# Con scrittura a cella singola + constant_memory entrambi devono crescere
+# in modo lineare: il rapporto per riga resta circa costante tra le taglie.
+# =============================================================================
+
+
+def build_history(n_rows: int, seed: int = 42) -> tuple:
+    """Rifornimenti e manutenzioni sintetici (una manutenzione ogni 10 rifornimenti)."""
+    rng = random.Random(seed)
+    start = date(2000, 1, 1)
+    refuelings, maintenances = [], []
+    for i in range(n_rows):
+        day = start + timedelta(days=i // 3)
+        price = round(rng.uniform(1.5, 2.1), 3)
+        cost = round(rng.uniform(20, 90), 2)
+        refuelings.append(RefuelingDTO(
+            id=i, user_id="bench", date=day, total_km=10000 + i * 60,
+            price_per_liter=price, total_cost=cost, liters=round(cost / price, 2),
+            is_full_tank=i % 4 != 0, notes="Autostrada" if i % 7 == 0 else None,
+        ))
+        if i % 10 == 0:
+            maintenances.append(MaintenanceDTO(
+                id=i, user_id="bench", date=day, total_km=10000 + i * 60,
+                expense_type="Tagliando", cost=round(rng.uniform(80, 400), 2),
+                description=None if i % 20 else "Olio e filtri",
+                expiry_km=10000 + i * 60 + 15000 if i % 20 == 0 else None,
+                expiry_date=day + timedelta(days=365) if i % 30 == 0 else None,
+            ))
+    return refuelings, maintenances
+
+
+def measure(n_rows: int) -> dict:
+    refuelings, maintenances = build_history(n_rows)
+
+    # Tempo e memoria in due passate: tracemalloc rallenta sensibilmente l'export
+    t0 = time.perf_counter()
+    payload = build_excel_report(refuelings, maintenances)
+    elapsed = time.perf_counter() - t0
+
+    tracemalloc.start()
+    build_excel_report(refuelings, maintenances)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"rows": n_rows, "seconds": elapsed, "peak_mb": peak / (1024 * 1024),
+            "size_mb": len(payload) / (1024 * 1024)}
+
+
+def run(max_rows: int = 100_000, steps: int = 3) -> list:
+    """Misura le taglie max_rows / 2^k (k = steps-1 … 0)."""
+    return [measure(max_rows >> k) for k in reversed(range(steps))]
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    results = run(n)
+    print(f"\n{'='*66}")
+    print(f"  {'Righe':>9} | {'Tempo':>8} | {'µs/riga':>8} | {'Picco MB':>9} | {'KB/riga':>8}")
+    for r in results:
+        print(f"  {r['rows']:>9,} | {r['seconds']:>7.2f}s | {r['seconds'] / r['rows'] * 1e6:>8.1f}"
+              f" | {r['peak_mb']:>9.1f} | {r['peak_mb'] * 1024 / r['rows']:>8.2f}")
+    print(f"{'='*66}\n")
@@ -0,0 +1,94 @@
+import sys
+import os
+import random
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+# Comando Avvio: python -m src.scripts.bench_import_parsing [n_righe]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../../'))
+sys.path.append(project_root)
+
+from src.services.data.importers.utils import (
+    parse_date, parse_float, parse_int, parse_typed_columns
+)
+
+# =============================================================================
+# BENCHMARK PARSING IMPORT — per cella vs per colonna
+# =============================================================================
+# Confronta lo stadio di parsing degli importer su un foglio sintetico:
+#   - per cella:   parse_date / parse_float / parse_int chiamati riga per riga
+#   - per colonna: parse_typed_columns (pd.to_datetime per formato + to_numeric)
+# Il foglio mescola i formati reali visti negli export utente (ISO, dd/mm/yyyy,
+# dd-mm-yyyy, celle data native, virgola decimale, celle vuote).
+# =============================================================================
+
+DATE_STYLES = [
+    lambda d: d.strftime("%Y-%m-%d"),
+    lambda d: d.strftime("%d/%m/%Y"),
+    lambda d: d.strftime("%d-%m-%Y"),
+    lambda d: pd.Timestamp(d),
+]
+
+
+def build_sheet(n_rows: int, seed: int = 42) -> pd.DataFrame:
+    """Foglio Rifornimenti sintetico con formati misti."""
+    rng = random.Random(seed)
+    start = date(2010, 1, 1)
+    rows = []
+    for i in range(n_rows):
+        day = start + timedelta(days=i // 10)
+        price = round(rng.uniform(1.5, 2.1), 3)
+        cost = round(rng.uniform(20, 90), 2)
+        rows.append({
+            "data": rng.choice(DATE_STYLES)(day),
+            "km": str(40000 + i * 60) if i % 2 else 40000 + i * 60,
+            "prezzo": str(price).replace(".", ",") if i % 3 == 0 else price,
+            "costo": str(cost).replace(".", ",") if i % 4 == 0 else cost,
+            "litri": None if i % 5 == 0 else round(cost / price, 2),
+        })
+    return pd.DataFrame(rows)
+
+
+def _per_cell(df: pd.DataFrame) -> list:
+    return [
+        (parse_date(r["data"]), parse_int(r["km"]), parse_float(r["prezzo"]),
+         parse_float(r["costo"]), parse_float(r["litri"]))
+        for _, r in df.iterrows()
+    ]
+
+
+def _per_column(df: pd.DataFrame) -> pd.DataFrame:
+    return parse_typed_columns(df, dates=["data"], floats=["prezzo", "costo", "litri"], ints=["km"])
+
+
+def run(n_rows: int = 50_000) -> dict:
+    df = build_sheet(n_rows)
+
+    t0 = time.perf_counter()
+    cells = _per_cell(df)
+    t_cell = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    typed = _per_column(df)
+    t_col = time.perf_counter() - t0
+
+    # I due percorsi devono produrre gli stessi valori
+    vectorized = list(zip(typed["data"], typed["km"], typed["prezzo"], typed["costo"], typed["litri"]))
+    assert vectorized == cells, "Parsing per colonna diverso dal parsing per cella"
+
+    return {"rows": n_rows, "per_cell_s": t_cell, "per_column_s": t_col, "speedup": t_cell / t_col}
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    res = run(n)
+    print(f"\n{'='*55}")
+    print(f"  Righe:            {res['rows']:,}")
+    print(f"  Per cella:        {res['per_cell_s']:.2f} s")
+    print(f"  Per colonna:      {res['per_column_s']:.2f} s")
+    print(f"  Speedup:          {res['speedup']:.1f}x")
+    print(f"{'='*55}\n")
@@ -0,0 +1,67 @@
+import sys
+import os
+import json
+import statistics
+import subprocess
+
+# Comando Avvio: python -m src.scripts.bench_ocr_import [ripetizioni]
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '../../'))
+sys.path.append(project_root)
+
+# =============================================================================
+# BENCHMARK IMPORT OCR — costo di avvio del motore OpenAI
+# =============================================================================
+# Ogni misura gira in un interprete nuovo (moduli non ancora in cache) e
+# riporta la mediana su più ripetizioni:
+#   - 'lazy'  → import del registro motori, come fa la pagina Rifornimenti
+#   - 'eager' → stesso import + SDK openai + costruzione del client, cioè
+#               il costo che prima veniva pagato all'avvio di ogni processo.
+# La differenza è il risparmio per chi non scansiona mai uno scontrino.
+# =============================================================================
+
+_PROBES = {
+    "lazy": "import src.services.ocr.engines",
+    "eager": ("import src.services.ocr.engines\n"
+              "from openai import OpenAI\n"
+              "OpenAI(api_key='sk-bench', max_retries=0)"),
+}
+
+_TEMPLATE = """
+import json, sys, time
+t0 = time.perf_counter()
+{body}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{"seconds": elapsed, "openai": "openai" in sys.modules}}))
+"""
+
+
+def measure(kind: str) -> dict:
+    """Una misura in un sottoprocesso: secondi e presenza di openai in sys.modules."""
+    code = _TEMPLATE.format(body=_PROBES[kind])
+    out = subprocess.run([sys.executable, "-c", code], cwd=project_root,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(repeats: int = 5) -> list:
+    """Mediana dei tempi per ciascuna variante."""
+    results = []
+    for kind in _PROBES:
+        samples = [measure(kind) for _ in range(repeats)]
+        results.append({"kind": kind, "seconds": statistics.median(s["seconds"] for s in samples),
+                        "openai": samples[-1]["openai"]})
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    results = run(n)
+    print(f"\n{'='*54}")
+    print(f"  {'Variante':>9} | {'Mediana':>9} | {'openai':>7}")
+    for r in results:
+        print(f"  {r['kind']:>9} | {r['seconds'] * 1000:>7.0f}ms | {str(r['openai']):>7}")
+    saving = results[1]["seconds"] - results[0]["seconds"]
+    print(f"  Risparmio all'avvio: {saving * 1000:.0f} ms")
+    print(f"{'='*54}\n")
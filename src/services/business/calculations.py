@@ -1,5 +1,6 @@
 from typing import List
 from src.database.models import Refueling
+from src.services.business.columnar import RefuelingColumns, partial_accumulation
 
 # ==========================================
 # SEZIONE: LOGICA CALCOLO STATISTICHE (Full-to-Full)
@@ -54,6 +55,68 @@ def calculate_stats(current: Refueling, history: List[Refueling]) -> dict:
     return stats
 
 
+def calculate_all_stats(history: List[Refueling]) -> List[dict]:
+    """
+    Versione batch di calculate_stats: calcola le metriche per TUTTI i record in un'unica passata.
+    Ordina lo storico una sola volta e percorre la timeline mantenendo l'ultimo pieno (anchor)
+    e i litri dei parziali successivi, invece di rifiltrare e riordinare lo storico per ogni record.
+
+    Returns:
+        Lista di dict (stesse chiavi di calculate_stats), allineata all'ordine di input.
+    """
+    results = [None] * len(history)
+
+    # Ordinamento stabile per data: a parità di data si mantiene l'ordine di input,
+    # come avviene nel sorted(reverse=True) di calculate_stats.
+    order = sorted(range(len(history)), key=lambda i: history[i].date)
+
+    prev_record = None      # Primo record (ordine input) della data precedente più recente
+    last_full = None        # Anchor point per il Full-to-Full
+    pending_liters = []     # Litri dei parziali dopo l'anchor, dal più vecchio al più recente
+
+    start = 0
+    while start < len(order):
+        # 1. Raggruppamento per data: i record dello stesso giorno non si "vedono" tra loro
+        end = start
+        group_date = history[order[start]].date
+        while end < len(order) and history[order[end]].date == group_date:
+            end += 1
+        group = [history[i] for i in order[start:end]]
+
+        # 2. Calcolo metriche del gruppo rispetto allo stato accumulato finora
+        for idx, current in zip(order[start:end], group):
+            stats = {
+                "delta_km": 0,
+                "km_per_liter": None,
+                "days_since_last": 0
+            }
+            if prev_record is not None:
+                stats["delta_km"] = current.total_km - prev_record.total_km
+                stats["days_since_last"] = (current.date - prev_record.date).days
+
+                if current.is_full_tank and last_full is not None:
+                    # Somma nello stesso ordine del backtracking di calculate_stats (parità float)
+                    liters_consumed = current.liters
+                    for liters in reversed(pending_liters):
+                        liters_consumed += liters
+                    if liters_consumed > 0:
+                        stats["km_per_liter"] = (current.total_km - last_full.total_km) / liters_consumed
+            results[idx] = stats
+
+        # 3. Aggiornamento stato per i gruppi successivi
+        prev_record = group[0]
+        first_full = next((i for i, r in enumerate(group) if r.is_full_tank), None)
+        if first_full is None:
+            pending_liters.extend(r.liters for r in reversed(group))
+        else:
+            last_full = group[first_full]
+            pending_liters = [r.liters for r in reversed(group[:first_full])]
+
+        start = end
+
+    return results
+
+
 # ==========================================
 # SEZIONE: LOGICA ALERT (Parziali)
 # ==========================================
@@ -63,20 +126,4 @@ def check_partial_accumulation(history: List[Refueling]) -> dict:
     Verifica se ci sono troppi rifornimenti parziali consecutivi accumulati.
     Restituisce il costo totale accumulato dall'ultimo pieno.
     """
-    accumulated_cost = 0.0
-    count = 0
-    
-    # Ordine decrescente: dal più recente al più vecchio
-    sorted_history = sorted(history, key=lambda x: x.date, reverse=True)
-    
-    for r in sorted_history:
-        if r.is_full_tank:
-            break
-        else:
-            accumulated_cost += r.total_cost
-            count += 1
-            
-    return {
-        "accumulated_cost": accumulated_cost,
-        "partials_count": count
-    }
\ No newline at end of file
+    return partial_accumulation(RefuelingColumns.from_records(history))
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from src.database.models import Refueling
+
+# Ordinale (date.toordinal) del 1970-01-01: offset per la conversione in datetime64[D]
+_EPOCH_ORDINAL = 719163
+
+# ==========================================
+# SEZIONE: RAPPRESENTAZIONE COLONNARE
+# ==========================================
+
+@dataclass(frozen=True)
+class RefuelingColumns:
+    """
+    Vista colonnare (array NumPy) dello storico rifornimenti di un utente.
+    Le righe sono ordinate per data crescente con sort stabile: a parità di data
+    resta l'ordine della lista di input (stessa semantica di calculate_stats).
+    """
+    date_ord: np.ndarray      # int64  — date.toordinal()
+    total_km: np.ndarray      # int64
+    liters: np.ndarray        # float64
+    total_cost: np.ndarray    # float64
+    price: np.ndarray         # float64 — price_per_liter
+    is_full_tank: np.ndarray  # bool
+    order: np.ndarray         # int64  — indice del record nella lista di input
+
+    @classmethod
+    def from_records(cls, records: List[Refueling]) -> "RefuelingColumns":
+        """Costruisce le colonne con una sola passata sugli oggetti, poi ordina per data."""
+        n = len(records)
+        date_ord = np.fromiter((r.date.toordinal() for r in records), dtype=np.int64, count=n)
+        order = np.argsort(date_ord, kind="stable")
+        return cls(
+            date_ord=date_ord[order],
+            total_km=np.fromiter((r.total_km for r in records), dtype=np.int64, count=n)[order],
+            liters=np.fromiter((r.liters or 0.0 for r in records), dtype=np.float64, count=n)[order],
+            total_cost=np.fromiter((r.total_cost or 0.0 for r in records), dtype=np.float64, count=n)[order],
+            price=np.fromiter((r.price_per_liter or 0.0 for r in records), dtype=np.float64, count=n)[order],
+            is_full_tank=np.fromiter((bool(r.is_full_tank) for r in records), dtype=bool, count=n)[order],
+            order=order,
+        )
+
+    def __len__(self) -> int:
+        return len(self.date_ord)
+
+    @property
+    def dates(self) -> np.ndarray:
+        """Date come datetime64[D] (pronte per pandas/plotly)."""
+        return (self.date_ord - _EPOCH_ORDINAL).astype("datetime64[D]")
+
+    @property
+    def years(self) -> np.ndarray:
+        """Anno di ciascun rifornimento."""
+        return self.dates.astype("datetime64[Y]").astype(np.int64) + 1970
+
+
+# ==========================================
+# SEZIONE: KERNEL VETTORIALI
+# ==========================================
+
+def full_to_full_kml(cols: RefuelingColumns) -> np.ndarray:
+    """
+    Consumo Full-to-Full (km/L) per ogni riga, NaN dove non calcolabile.
+    Replica calculate_stats: i record dello stesso giorno non si vedono tra loro e,
+    risalendo lo storico, l'anchor è il primo pieno del giorno precedente più recente
+    che ne contiene uno; i litri dei parziali intermedi si sommano al pieno corrente.
+    """
+    n = len(cols)
+    kml = np.full(n, np.nan)
+    if n == 0:
+        return kml
+
+    idx = np.arange(n)
+
+    # 1. Gruppi per data (start/end di ogni gruppo, id del gruppo per riga)
+    grp_start = np.searchsorted(cols.date_ord, cols.date_ord, side="left")
+    grp_end = np.searchsorted(cols.date_ord, cols.date_ord, side="right")
+    group_starts = np.flatnonzero(np.r_[True, cols.date_ord[1:] != cols.date_ord[:-1]])
+    group_id = np.cumsum(np.r_[True, cols.date_ord[1:] != cols.date_ord[:-1]]) - 1
+
+    # 2. Primo pieno di ogni gruppo (n = nessun pieno) e ultimo gruppo con pieno fino a g
+    full_idx = np.where(cols.is_full_tank, idx, n)
+    first_full = np.minimum.reduceat(full_idx, group_starts)
+    has_full = first_full < n
+    last_full_group = np.maximum.accumulate(np.where(has_full, np.arange(len(group_starts)), -1))
+
+    # 3. Anchor per riga: ultimo gruppo con pieno STRETTAMENTE precedente al proprio
+    prev_group = group_id - 1
+    anchor_group = np.where(prev_group >= 0, last_full_group[np.maximum(prev_group, 0)], -1)
+    valid = cols.is_full_tank & (anchor_group >= 0)
+    if not valid.any():
+        return kml
+
+    anchor = first_full[np.maximum(anchor_group, 0)]
+    anchor_grp_start = grp_start[anchor]
+    anchor_grp_end = grp_end[anchor]
+
+    # 4. Litri dei parziali tra anchor e riga corrente (somme prefisse)
+    partial_liters = np.where(cols.is_full_tank, 0.0, cols.liters)
+    csum = np.r_[0.0, np.cumsum(partial_liters)]
+    between = (csum[anchor] - csum[anchor_grp_start]) + (csum[grp_start] - csum[anchor_grp_end])
+    liters_consumed = cols.liters + between
+
+    ok = valid & (liters_consumed > 0)
+    distance = cols.total_km - cols.total_km[anchor]
+    kml[ok] = distance[ok] / liters_consumed[ok]
+    return kml
+
+
+def partial_accumulation(cols: RefuelingColumns) -> dict:
+    """
+    Costo e numero dei parziali consecutivi dall'ultimo pieno (equivalente a check_partial_accumulation).
+    L'ordine di risalita è: data decrescente, a parità di data ordine di input.
+    """
+    if len(cols) == 0:
+        return {"accumulated_cost": 0.0, "partials_count": 0}
+
+    walk = np.lexsort((cols.order, -cols.date_ord))
+    fulls = np.flatnonzero(cols.is_full_tank[walk])
+    stop = fulls[0] if len(fulls) else len(walk)
+
+    return {
+        "accumulated_cost": float(cols.total_cost[walk[:stop]].sum()),
+        "partials_count": int(stop)
+    }
+
+
+def efficiency_range(kml: np.ndarray, mask: np.ndarray = None) -> tuple:
+    """Min/Max dei consumi validi (NaN e zeri esclusi, come nel calcolo originale)."""
+    values = kml if mask is None else kml[mask]
+    values = values[~np.isnan(values) & (values != 0)]
+    if len(values) == 0:
+        return 0.0, 0.0
+    return float(values.min()), float(values.max())
@@ -1,33 +1,32 @@
 from datetime import date
-from src.services.business.calculations import calculate_stats
+from src.services.business.columnar import RefuelingColumns, full_to_full_kml, efficiency_range
 
 def calculate_year_kpis(records, year):
-    """Calcola i KPI aggregati per un anno specifico."""
+    """Calcola i KPI aggregati per un anno specifico (kernel vettoriale su colonne NumPy)."""
     view_records = [r for r in records if r.date.year == year]
-    
-    total_liters = sum(r.liters for r in view_records)
-    total_cost = sum(r.total_cost for r in view_records)
+
+    cols = RefuelingColumns.from_records(records)
+    in_year = cols.years == year
+
+    total_liters = float(cols.liters[in_year].sum())
+    total_cost = float(cols.total_cost[in_year].sum())
     avg_price = (total_cost / total_liters) if total_liters > 0 else 0.0
     
     km_est = 0
-    if len(view_records) > 1:
-        km_vals = [r.total_km for r in view_records]
-        km_est = max(km_vals) - min(km_vals)
+    if in_year.sum() > 1:
+        km_vals = cols.total_km[in_year]
+        km_est = int(km_vals.max() - km_vals.min())
         
-    # Calcolo efficienza min/max
-    efficiencies = [
-        stats["km_per_liter"] 
-        for r in view_records 
-        if (stats := calculate_stats(r, records))["km_per_liter"]
-    ]
+    # Calcolo efficienza min/max (Full-to-Full sull'intero storico, filtrato sull'anno)
+    min_eff, max_eff = efficiency_range(full_to_full_kml(cols), in_year)
     
     return {
         "total_cost": total_cost,
         "total_liters": total_liters,
         "avg_price": avg_price,
         "km_est": km_est,
-        "min_eff": min(efficiencies) if efficiencies else 0.0,
-        "max_eff": max(efficiencies) if efficiencies else 0.0,
+        "min_eff": min_eff,
+        "max_eff": max_eff,
         "view_records": view_records
     }
 
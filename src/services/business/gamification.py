@@ -7,14 +7,21 @@ def calculate_car_health_score(db, user_id, current_km):
     Start: 100.
     Malus: Scadenze non rispettate.
     """
+    # Recuperiamo TUTTE le manutenzioni con scadenze attive e i reminder attivi
+    deadlines = crud.get_all_active_deadlines(db, user_id)
+    active_reminders = crud.get_active_reminders(db, user_id)
+    return score_car_health(deadlines, active_reminders, current_km)
+
+def score_car_health(deadlines, active_reminders, current_km):
+    """
+    Come calculate_car_health_score, su dati già caricati
+    (es. crud.get_user_snapshot, senza ulteriori query).
+    """
     score = 100
     today = date.today()
     overdue_items = []
     
     # 1. Controllo Manutenzioni Scadute (Pesanti)
-    # Recuperiamo TUTTE le manutenzioni con scadenze attive (metodo nuovo)
-    deadlines = crud.get_all_active_deadlines(db, user_id)
-    
     for maint in deadlines:
         # Check Km
         if maint.expiry_km and current_km > maint.expiry_km:
@@ -27,8 +34,6 @@ def calculate_car_health_score(db, user_id, current_km):
             overdue_items.append(f"Scaduto: {maint.expense_type} (Data)")
 
     # 2. Controllo Reminder Scaduti (Routine)
-    active_reminders = crud.get_active_reminders(db, user_id)
-    
     for rem in active_reminders:
         if rem.frequency_km and (current_km - rem.last_km_check) >= rem.frequency_km:
             score -= 10 # Penalità media
@@ -1 +1,2 @@
-from .pdf_generator import generate_maintenance_report
\ No newline at end of file
+from .pdf_generator import generate_maintenance_report
+from .artifact_cache import get_excel_report, get_maintenance_report
@@ -0,0 +1,301 @@
+"""
+src/services/data/exporters/artifact_cache.py — Cache dei file di export generati
+
+Espone:
+  - get_excel_report(db, user_id)                         → report Excel (cachato)
+  - get_maintenance_report(db, user_id, owner, plate, ...) → libretto PDF (cachato)
+  - get_export_cache()                                    → istanza condivisa (stats / clear / purge_user)
+
+Strategia:
+  La chiave è lo SHA-256 di (user_id, tipo export, filtro anno, parametri, versione dati).
+  La versione dati è un digest del contenuto delle entità usate dall'export, calcolato
+  sulle letture CRUD cachate e memorizzato per (utente, versione cache): sopravvive ai
+  riavvii del processo, quindi anche i file su disco restano validi finché i dati non cambiano.
+  Due livelli: LRU in memoria limitato in byte, più una directory su disco (opzionale,
+  disattivata di default, limitata in byte, svuotata a partire dai file meno usati di recente).
+  I file contengono dati personali (nome, targa): su disco ogni utente ha una propria
+  sottodirectory, e ogni bump_version delle entità esportate cancella i file e le voci
+  in memoria di quell'utente (purge_user, da chiamare anche alla rimozione di un account).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from src.config import cfg
+from src.database import cache, crud
+from . import pdf_generator, reports
+
+logger = logging.getLogger(__name__)
+
+# Tipi di export cachati
+EXCEL_REPORT = "excel_report"
+MAINTENANCE_PDF = "maintenance_pdf"
+
+# Entità lette dagli export: una scrittura su una di esse svuota la cache dell'utente
+EXPORTED_ENTITIES = frozenset({cache.REFUELINGS, cache.MAINTENANCES})
+
+
+# =============================================================================
+# CACHE A DUE LIVELLI
+# =============================================================================
+
+class ExportCache:
+    """
+    LRU in memoria limitato in byte, con livello opzionale su disco
+    (<disk_dir>/<hash utente>/<chiave>.bin). Voci indicizzate per (utente, chiave).
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: Optional[str] = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._items: OrderedDict[Tuple[str, str], bytes] = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "purges": 0}
+        if self.disk_dir:
+            try:
+                os.makedirs(self.disk_dir, exist_ok=True)
+            except OSError as e:
+                # Filesystem in sola lettura: si prosegue con la sola memoria
+                logger.warning("Export cache: directory %s non disponibile (%s)", self.disk_dir, e)
+                self.disk_dir = None
+
+    # -- API ------------------------------------------------------------------
+
+    def get(self, user_id: str, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._items.get((user_id, key))
+            if data is not None:
+                self._items.move_to_end((user_id, key))
+                self._stats["hits"] += 1
+                return data
+
+        data = self._disk_read(user_id, key)
+        with self._lock:
+            if data is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._memory_put((user_id, key), data)
+        return data
+
+    def put(self, user_id: str, key: str, data: bytes) -> None:
+        with self._lock:
+            self._memory_put((user_id, key), data)
+        self._disk_write(user_id, key, data)
+
+    def get_or_create(self, user_id: str, key: str, build: Callable[[], bytes]) -> bytes:
+        """Ritorna il file cachato o lo genera con build() e lo memorizza."""
+        data = self.get(user_id, key)
+        if data is None:
+            data = build()
+            self.put(user_id, key, data)
+        return data
+
+    def purge_user(self, user_id: str) -> None:
+        """Elimina tutte le voci dell'utente, in memoria e su disco."""
+        with self._lock:
+            for item in [k for k in self._items if k[0] == user_id]:
+                self._bytes -= len(self._items.pop(item))
+            self._stats["purges"] += 1
+        if self.disk_dir:
+            _remove_dir(self._user_dir(user_id))
+
+    def on_data_changed(self, user_id: str, entities) -> None:
+        """Listener di cache.bump_version: svuota l'utente se cambia un'entità esportata."""
+        if EXPORTED_ENTITIES.intersection(entities):
+            self.purge_user(user_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._items), "bytes": self._bytes}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+        for user_dir in self._user_dirs():
+            _remove_dir(user_dir)
+
+    # -- Memoria --------------------------------------------------------------
+
+    def _memory_put(self, item: Tuple[str, str], data: bytes) -> None:
+        """Inserimento LRU (da chiamare con il lock). File più grandi dell'intera cache: solo disco."""
+        if len(data) > self.max_bytes:
+            return
+        old = self._items.pop(item, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._items[item] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._stats["evictions"] += 1
+
+    # -- Disco ----------------------------------------------------------------
+
+    def _user_dir(self, user_id: str) -> str:
+        # Hash dell'id: nome di directory sicuro, senza esporre l'id sul filesystem
+        return os.path.join(self.disk_dir, hashlib.sha256(user_id.encode("utf-8")).hexdigest()[:32])
+
+    def _path(self, user_id: str, key: str) -> str:
+        return os.path.join(self._user_dir(user_id), f"{key}.bin")
+
+    def _disk_read(self, user_id: str, key: str) -> Optional[bytes]:
+        if not self.disk_dir:
+            return None
+        path = self._path(user_id, key)
+        try:
+            with open(path, "rb") as fh:
+                data = fh.read()
+            os.utime(path)  # ultimo accesso → ordine di eviction
+            return data
+        except OSError:
+            return None
+
+    def _disk_write(self, user_id: str, key: str, data: bytes) -> None:
+        """Scrittura atomica (file temporaneo + rename), poi rispetto del limite in byte."""
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        user_dir = self._user_dir(user_id)
+        try:
+            os.makedirs(user_dir, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=user_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, self._path(user_id, key))
+        except OSError as e:
+            logger.warning("Export cache: scrittura su disco fallita (%s)", e)
+            return
+        self._disk_evict()
+
+    def _user_dirs(self) -> list:
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return []
+        return [entry.path for entry in os.scandir(self.disk_dir) if entry.is_dir()]
+
+    def _disk_files(self) -> list:
+        return [os.path.join(d, f) for d in self._user_dirs() for f in _list_dir(d) if f.endswith(".bin")]
+
+    def _disk_evict(self) -> None:
+        entries = []
+        for path in self._disk_files():
+            try:
+                info = os.stat(path)
+            except OSError:
+                continue
+            entries.append((info.st_mtime, info.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            _silent_remove(path)
+            total -= size
+            with self._lock:
+                self._stats["evictions"] += 1
+
+
+def _list_dir(path: str) -> list:
+    try:
+        return os.listdir(path)
+    except OSError:
+        return []
+
+
+def _remove_dir(path: str) -> None:
+    """Cancella i file di export (e i temporanei) di una directory utente, poi la directory."""
+    for name in _list_dir(path):
+        if name.endswith((".bin", ".tmp")):
+            _silent_remove(os.path.join(path, name))
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+
+
+def _silent_remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+@lru_cache(maxsize=1)
+def get_export_cache() -> ExportCache:
+    """
+    Istanza condivisa dal processo Streamlit, dimensionata da [export.cache] di config.toml.
+    Registrata su cache.bump_version: i file di un utente spariscono quando cambiano i suoi dati.
+    """
+    instance = ExportCache(
+        max_bytes=int(float(cfg("export.cache.memory_mb", 64)) * 1024 * 1024),
+        disk_dir=cfg("export.cache.disk_dir", ""),
+        disk_max_bytes=int(float(cfg("export.cache.disk_mb", 512)) * 1024 * 1024),
+    )
+    cache.on_version_bump(instance.on_data_changed)
+    return instance
+
+
+# =============================================================================
+# CHIAVI
+# =============================================================================
+
+def make_key(user_id: str, kind: str, year: Optional[int], params: dict, data_version: str) -> str:
+    """SHA-256 della rappresentazione JSON canonica dei componenti della chiave."""
+    payload = json.dumps(
+        {"user": user_id, "kind": kind, "year": year, "params": params, "data": data_version},
+        sort_keys=True, ensure_ascii=False, default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _digest(rows) -> str:
+    h = hashlib.sha256()
+    for row in rows:
+        h.update(repr(row).encode("utf-8"))
+    return h.hexdigest()
+
+
+@cache.versioned_cache(cache.REFUELINGS)
+def _refuelings_digest(db: Session, user_id: str) -> str:
+    return _digest(crud.get_all_refuelings(db, user_id))
+
+
+@cache.versioned_cache(cache.MAINTENANCES)
+def _maintenances_digest(db: Session, user_id: str) -> str:
+    return _digest(crud.get_all_maintenances(db, user_id))
+
+
+# =============================================================================
+# EXPORT CACHATI
+# =============================================================================
+
+def get_excel_report(db: Session, user_id: str) -> bytes:
+    """reports.generate_excel_report con cache (rifornimenti + manutenzioni)."""
+    version = _refuelings_digest(db, user_id) + _maintenances_digest(db, user_id)
+    key = make_key(user_id, EXCEL_REPORT, None, {}, version)
+    return get_export_cache().get_or_create(user_id, key, lambda: reports.generate_excel_report(db, user_id))
+
+
+def get_maintenance_report(
+    db: Session, user_id: str, owner_name: str, plate: str, car_model: str, year: int = None
+) -> bytes:
+    """pdf_generator.generate_maintenance_report con cache (la data di emissione entra nella chiave)."""
+    params = {"owner": owner_name, "plate": plate, "model": car_model, "issued": date.today().isoformat()}
+    key = make_key(user_id, MAINTENANCE_PDF, year, params, _maintenances_digest(db, user_id))
+    return get_export_cache().get_or_create(
+        user_id, key, lambda: pdf_generator.generate_maintenance_report(db, user_id, owner_name, plate, car_model, year)
+    )
@@ -1,11 +1,65 @@
+import multiprocessing
 import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+from typing import List, Optional, Sequence, Tuple
 
 from fpdf import FPDF
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, sessionmaker
 
 from src.database import crud
 
+# =============================================================================
+# ASSET CONDIVISI (caricati una volta per processo)
+# =============================================================================
+
+# Altezza del logo nell'header (mm) e risoluzione con cui viene incorporato
+LOGO_HEIGHT_MM = 20
+LOGO_DPI = 300
+
+_thread_assets = threading.local()
+
+
+@lru_cache(maxsize=1)
+def _logo_asset() -> Optional[Tuple[str, Tuple[int, int]]]:
+    """
+    Percorso del logo e dimensioni in pixel per LOGO_DPI all'altezza di stampa.
+    Risolto una sola volta per processo; None se il file manca o non è un'immagine valida.
+    """
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    project_root = os.path.abspath(os.path.join(current_dir, '../../../../'))
+    logo_path = os.path.join(project_root, 'assets', 'logo.png')
+    if not os.path.exists(logo_path):
+        return None
+    try:
+        from PIL import Image
+        with Image.open(logo_path) as img:  # legge solo l'header del file
+            width, height = img.size
+    except Exception:
+        return None
+
+    # Ridimensionamento alla risoluzione di stampa (mai ingrandito)
+    target_h = min(height, round(LOGO_HEIGHT_MM / 25.4 * LOGO_DPI))
+    return logo_path, (max(1, round(width * target_h / height)), target_h)
+
+
+def _shared_image_cache():
+    """
+    ImageCache di fpdf2 condivisa tra i documenti dello stesso thread: il logo viene
+    decodificato e compresso una volta sola e riusato da pagine e documenti successivi.
+    Per thread, perché i contatori di utilizzo vengono azzerati a ogni nuovo documento.
+    """
+    cache = getattr(_thread_assets, "image_cache", None)
+    if cache is None:
+        cache = FPDF().image_cache
+        _thread_assets.image_cache = cache
+    cache.reset_usages()
+    return cache
+
 # =============================================================================
 # CLASSE ESTESA FPDF
 # =============================================================================
@@ -16,6 +70,11 @@ class ServicePDF(FPDF):
     Gestisce layout standardizzati come Header con Logo/Fallback e Footer con disclaimer.
     """
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Logo già decodificato da documenti precedenti dello stesso thread
+        self.image_cache = _shared_image_cache()
+
     def header(self):
         """
         Definisce l'intestazione di ogni pagina del documento.
@@ -25,18 +84,17 @@ class ServicePDF(FPDF):
         self.set_fill_color(44, 62, 80)
         self.rect(0, 0, 210, 5, 'F')
 
-        # 2. Risoluzione Percorsi Risorse
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.abspath(os.path.join(current_dir, '../../../../'))
-        logo_path = os.path.join(project_root, 'assets', 'logo.png')
+        # 2. Risorse (risolte una volta per processo)
+        logo = _logo_asset()
 
         show_default_header = True
 
         # 3. Gestione Rendering Logo
-        if os.path.exists(logo_path):
+        if logo is not None:
+            logo_path, logo_dims = logo
             try:
-                # Rendering immagine (h=20 mantiene aspect ratio)
-                self.image(logo_path, 10, 8, h=20)
+                # Rendering immagine (h mantiene aspect ratio, dims = risoluzione incorporata)
+                self.image(logo_path, 10, 8, h=LOGO_HEIGHT_MM, dims=logo_dims)
                 # Spaziatura verticale per evitare sovrapposizioni con il corpo
                 self.ln(25) 
                 show_default_header = False
@@ -294,4 +352,92 @@ def generate_maintenance_report(
         pdf.cell(total_width_labels, 7, "TOTALE PERIODO", 1, 0, 'R')
         pdf.cell(cols_w[-1], 7, f"{total_spent:,.2f}".replace('.', ','), 1, 0, 'R', True)
 
-    return bytes(pdf.output())
\ No newline at end of file
+    return bytes(pdf.output())
+
+
+# =============================================================================
+# GENERAZIONE MASSIVA (PROCESS POOL)
+# =============================================================================
+# Per le elaborazioni di fine mese: molti libretti (uno per utente o per anno)
+# renderizzati in parallelo su processi separati. Ogni worker apre il proprio
+# engine sul database indicato e riusa gli asset caricati al primo documento.
+# =============================================================================
+
+@dataclass(frozen=True)
+class ServiceBookJob:
+    """Parametri di un libretto da generare (stessi di generate_maintenance_report)."""
+    user_id: str
+    owner_name: str
+    plate: str
+    car_model: str
+    year: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class ServiceBookResult:
+    """Esito di un job: PDF (None in caso di errore) e tempo di rendering nel worker."""
+    job: ServiceBookJob
+    pdf: Optional[bytes]
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+_worker_sessions: Optional[sessionmaker] = None
+
+
+def _init_worker(database_url: str) -> None:
+    """Inizializzazione del processo worker: engine e factory di sessione propri."""
+    global _worker_sessions
+    from src.database.pool import build_engine
+    _worker_sessions = sessionmaker(autocommit=False, autoflush=False, bind=build_engine(database_url))
+
+
+def _render_job(job: ServiceBookJob) -> ServiceBookResult:
+    """Eseguito nel worker: un documento, cronometrato, errori riportati nel risultato."""
+    start = time.perf_counter()
+    db = _worker_sessions()
+    try:
+        pdf = generate_maintenance_report(db, job.user_id, job.owner_name, job.plate, job.car_model, job.year)
+        return ServiceBookResult(job, pdf, time.perf_counter() - start)
+    except Exception as e:
+        return ServiceBookResult(job, None, time.perf_counter() - start, f"{type(e).__name__}: {e}")
+    finally:
+        db.close()
+
+
+def generate_maintenance_reports_batch(
+    jobs: Sequence[ServiceBookJob],
+    database_url: Optional[str] = None,
+    max_workers: Optional[int] = None,
+) -> List[ServiceBookResult]:
+    """
+    Genera più libretti in un pool di processi.
+
+    Args:
+        jobs: Un ServiceBookJob per documento (es. uno per utente o per anno).
+        database_url: DB da cui leggere; default quello dell'app (secrets).
+        max_workers: Processi del pool (default: CPU disponibili, mai più dei job).
+
+    Returns:
+        List[ServiceBookResult]: Un risultato per job, nello stesso ordine, con i secondi di rendering.
+    """
+    if not jobs:
+        return []
+    if database_url is None:
+        from src.database.core import DATABASE_URL
+        database_url = DATABASE_URL
+
+    workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    # 'spawn': il processo padre (server Streamlit) è multi-thread, il fork non è sicuro
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(database_url,),
+    ) as pool:
+        return list(pool.map(_render_job, jobs))
+
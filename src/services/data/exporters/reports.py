@@ -1,10 +1,20 @@
 import io
+from typing import Sequence
 
+import numpy as np
 import pandas as pd
+import xlsxwriter
 from sqlalchemy.orm import Session
 
 from src.database import crud
 
+# Colonne scritte come date Excel (formato dd/mm/yyyy)
+DATE_COLUMNS = {"Data", "Scadenza Data"}
+
+# Righe campionate per stimare la larghezza colonne (testa + campione uniforme)
+WIDTH_SAMPLE_HEAD = 500
+WIDTH_SAMPLE_SPREAD = 1000
+
 # =============================================================================
 # EXPORT EXCEL LOGIC
 # =============================================================================
@@ -13,119 +23,146 @@ def generate_excel_report(db: Session, user_id: str) -> bytes:
     """
     Genera un report Excel multi-sheet contenente Rifornimenti e Manutenzioni.
     Include formattazione avanzata (bordi, stili header, larghezza colonne automatica).
-    
+
     Args:
         db (Session): Sessione database attiva.
         user_id (str): ID dell'utente per filtrare i dati.
-        
+
     Returns:
         bytes: Buffer binario del file .xlsx pronto per il download.
     """
-    
+
     # 1. Recupero Dati dal Database
     refuelings = crud.get_all_refuelings(db, user_id)
     maintenances = crud.get_all_maintenances(db, user_id)
 
-    # 2. Mapping Dati: Rifornimenti
-    # Trasformazione da oggetti ORM a lista di dizionari per DataFrame
-    data_fuel = []
-    for r in refuelings:
-        data_fuel.append({
-            "Data": r.date,
-            "Km": r.total_km,
-            "Prezzo": r.price_per_liter,
-            "Costo": r.total_cost,
-            "Litri": r.liters,
-            "Pieno": "Sì" if r.is_full_tank else "No",
-            "Note": r.notes
-        })
-
-    # 3. Mapping Dati: Manutenzioni
-    data_maint = []
-    for m in maintenances:
-        data_maint.append({
-            "Data": m.date,
-            "Km": m.total_km,
-            "Tipo": m.expense_type,
-            "Costo": m.cost,
-            "Descrizione": m.description,
-            "Scadenza Km": m.expiry_km,
-            "Scadenza Data": m.expiry_date
-        })
-
-    # 4. Creazione e Ordinamento DataFrame
-    df_fuel = pd.DataFrame(data_fuel)
-    if not df_fuel.empty:
-        df_fuel['Data'] = pd.to_datetime(df_fuel['Data'])
-        df_fuel = df_fuel.sort_values(by='Data', ascending=True)
-
-    df_maint = pd.DataFrame(data_maint)
-    if not df_maint.empty:
-        df_maint['Data'] = pd.to_datetime(df_maint['Data'])
-        df_maint = df_maint.sort_values(by='Data', ascending=True)
-
-    # 5. Scrittura Excel con XlsxWriter
-    # Utilizziamo un buffer in memoria per evitare salvataggi su disco
+    return build_excel_report(refuelings, maintenances)
+
+
+def build_excel_report(refuelings: Sequence, maintenances: Sequence) -> bytes:
+    """
+    Costruisce il file .xlsx a partire dai record già caricati.
+    Ogni cella viene scritta una sola volta, con il formato della propria colonna;
+    xlsxwriter lavora in constant_memory (le righe completate vengono scaricate su disco).
+    """
+    # 2. Mapping Dati (colonnare, una lista per colonna)
+    df_fuel = pd.DataFrame({
+        "Data": [r.date for r in refuelings],
+        "Km": [r.total_km for r in refuelings],
+        "Prezzo": [r.price_per_liter for r in refuelings],
+        "Costo": [r.total_cost for r in refuelings],
+        "Litri": [r.liters for r in refuelings],
+        "Pieno": ["Sì" if r.is_full_tank else "No" for r in refuelings],
+        "Note": [r.notes for r in refuelings],
+    })
+    df_maint = pd.DataFrame({
+        "Data": [m.date for m in maintenances],
+        "Km": [m.total_km for m in maintenances],
+        "Tipo": [m.expense_type for m in maintenances],
+        "Costo": [m.cost for m in maintenances],
+        "Descrizione": [m.description for m in maintenances],
+        "Scadenza Km": [m.expiry_km for m in maintenances],
+        "Scadenza Data": [m.expiry_date for m in maintenances],
+    })
+
+    # 3. Ordinamento cronologico
+    for df in (df_fuel, df_maint):
+        if not df.empty:
+            df['Data'] = pd.to_datetime(df['Data'])
+            df.sort_values(by='Data', ascending=True, inplace=True, kind='stable')
+
+    # 4. Scrittura Excel con XlsxWriter
+    # Buffer in memoria per il download; constant_memory usa file temporanei per le righe
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        
-        # Dump grezzo dei dati nei rispettivi fogli
-        df_fuel.to_excel(writer, sheet_name='Rifornimenti', index=False)
-        df_maint.to_excel(writer, sheet_name='Manutenzione', index=False)
-        
-        workbook = writer.book
-        
+    workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
+    try:
         # Definizione Stili Custom
-        header_fmt = workbook.add_format({
-            'bold': True, 'bg_color': '#D9E1F2', 'border': 1, 
-            'align': 'center', 'valign': 'vcenter'
-        })
-        cell_fmt = workbook.add_format({
-            'border': 1, 'align': 'center', 'valign': 'vcenter'
-        })
-        date_fmt = workbook.add_format({
-            'num_format': 'dd/mm/yyyy', 'border': 1, 
-            'align': 'center', 'valign': 'vcenter'
-        })
-        
-        # Iterazione sui fogli per applicare formattazione
-        for sheet_name, df in {'Rifornimenti': df_fuel, 'Manutenzione': df_maint}.items():
-            worksheet = writer.sheets[sheet_name]
-            
-            # A. Sovrascrittura Intestazioni (per applicare stile header)
-            for col_num, value in enumerate(df.columns.values):
-                worksheet.write(0, col_num, value, header_fmt)
-
-            # B. Calcolo e applicazione larghezza colonne (Auto-fit)
-            for idx, col in enumerate(df.columns):
-                # Larghezza minima 15 char per leggibilità date
-                max_len = max(
-                    df[col].astype(str).map(len).max() if not df[col].empty else 0,
-                    len(str(col))
-                ) + 4 
-                worksheet.set_column(idx, idx, max(15, max_len)) 
-
-            # C. Applicazione stili alle celle dati
-            # XlsxWriter richiede iterazione puntuale per applicare bordi su celle già scritte
-            if not df.empty:
-                rows = len(df)
-                cols = len(df.columns)
-                
-                for row_idx in range(rows):
-                    for col_idx in range(cols):
-                        val = df.iloc[row_idx, col_idx]
-                        
-                        # Selezione formato: Data vs Standard
-                        fmt = date_fmt if df.columns[col_idx] == "Data" else cell_fmt
-                        
-                        # Gestione valori nulli
-                        if pd.isna(val): val = ""
-                        
-                        # Scrittura cella formattata
-                        # Nota: +1 sull'indice riga per saltare l'header
-                        if df.columns[col_idx] == "Data":
-                            worksheet.write_datetime(row_idx + 1, col_idx, val, fmt)
-                        else:
-                            worksheet.write(row_idx + 1, col_idx, val, fmt)
-
-    return output.getvalue()
\ No newline at end of file
+        formats = {
+            "header": workbook.add_format({
+                'bold': True, 'bg_color': '#D9E1F2', 'border': 1,
+                'align': 'center', 'valign': 'vcenter'
+            }),
+            "cell": workbook.add_format({
+                'border': 1, 'align': 'center', 'valign': 'vcenter'
+            }),
+            "date": workbook.add_format({
+                'num_format': 'dd/mm/yyyy', 'border': 1,
+                'align': 'center', 'valign': 'vcenter'
+            }),
+        }
+        _write_sheet(workbook, 'Rifornimenti', df_fuel, formats)
+        _write_sheet(workbook, 'Manutenzione', df_maint, formats)
+    finally:
+        workbook.close()
+
+    return output.getvalue()
+
+
+# =============================================================================
+# SCRITTURA FOGLI
+# =============================================================================
+
+def _write_sheet(workbook, sheet_name: str, df: pd.DataFrame, formats: dict) -> None:
+    """Header, larghezze (stimate su campione) e righe dati scritte in ordine, una volta per cella."""
+    worksheet = workbook.add_worksheet(sheet_name)
+
+    # A. Larghezza colonne: minimo 15 char per leggibilità date
+    for idx, width in enumerate(_estimate_widths(df)):
+        worksheet.set_column(idx, idx, max(15, width))
+
+    # B. Intestazioni con stile header
+    for col_num, value in enumerate(df.columns.values):
+        worksheet.write_string(0, col_num, str(value), formats["header"])
+
+    if df.empty:
+        return
+
+    # C. Preparazione per colonna: valori Python nativi (None per i nulli), writer e formato
+    columns = []
+    for col in df.columns:
+        series = df[col]
+        values = series.astype(object).where(series.notna(), None).tolist()
+        if col in DATE_COLUMNS:
+            writer, fmt = worksheet.write_datetime, formats["date"]
+        elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            writer, fmt = worksheet.write_number, formats["cell"]
+        else:
+            writer, fmt = _string_writer(worksheet), formats["cell"]
+        columns.append((values, writer, fmt))
+
+    # D. Righe in ordine crescente (requisito di constant_memory); celle nulle → blank formattata
+    write_blank = worksheet.write_blank
+    for row_idx in range(len(df)):
+        excel_row = row_idx + 1  # +1 per saltare l'header
+        for col_idx, (values, writer, fmt) in enumerate(columns):
+            val = values[row_idx]
+            if val is None:
+                write_blank(excel_row, col_idx, None, fmt)
+            else:
+                writer(excel_row, col_idx, val, fmt)
+
+
+def _string_writer(worksheet):
+    """write_string con conversione a str (colonne testo con valori misti)."""
+    write_string = worksheet.write_string
+    return lambda row, col, val, fmt: write_string(row, col, str(val), fmt)
+
+
+def _estimate_widths(df: pd.DataFrame) -> list:
+    """
+    Larghezza per colonna (caratteri + 4) calcolata su un campione di righe:
+    le prime WIDTH_SAMPLE_HEAD più WIDTH_SAMPLE_SPREAD distribuite uniformemente.
+    Sotto la dimensione del campione il risultato coincide con il calcolo su tutte le righe.
+    """
+    n = len(df)
+    if n > WIDTH_SAMPLE_HEAD + WIDTH_SAMPLE_SPREAD:
+        spread = np.linspace(WIDTH_SAMPLE_HEAD, n - 1, WIDTH_SAMPLE_SPREAD).astype(int)
+        sample = df.iloc[np.r_[np.arange(WIDTH_SAMPLE_HEAD), spread]]
+    else:
+        sample = df
+
+    widths = []
+    for col in df.columns:
+        max_len = sample[col].astype(object).map(lambda v: len(str(v))).max() if not sample.empty else 0
+        widths.append(max(max_len, len(str(col))) + 4)
+    return widths
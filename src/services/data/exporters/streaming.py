@@ -0,0 +1,138 @@
+import csv
+import io
+import json
+import tempfile
+from dataclasses import fields
+from typing import Callable, Iterator
+
+from sqlalchemy.orm import Session
+
+from src.database import crud
+
+# =============================================================================
+# EXPORT IN STREAMING (CSV / NDJSON)
+# =============================================================================
+# Alternativa all'export Excel per storici molto grandi: le righe vengono lette
+# a partizioni dal cursore lato server (crud.stream_*) e serializzate blocco per
+# blocco da un generatore: durante la generazione in memoria resta una sola
+# partizione alla volta (il download in Streamlit carica poi il file intero).
+# Le colonne CSV coincidono con quelle del file Excel, così il file resta
+# reimportabile dalla tab "Importazione Dati".
+# =============================================================================
+
+# Formato → (MIME type, estensione file)
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+}
+
+# Entità → (lettore a blocchi, colonne CSV come (intestazione, estrattore))
+_FUEL_COLUMNS = [
+    ("Data", lambda r: r.date.isoformat()),
+    ("Km", lambda r: r.total_km),
+    ("Prezzo", lambda r: r.price_per_liter),
+    ("Costo", lambda r: r.total_cost),
+    ("Litri", lambda r: r.liters),
+    ("Pieno", lambda r: "Sì" if r.is_full_tank else "No"),
+    ("Note", lambda r: r.notes),
+]
+_MAINT_COLUMNS = [
+    ("Data", lambda m: m.date.isoformat()),
+    ("Km", lambda m: m.total_km),
+    ("Tipo", lambda m: m.expense_type),
+    ("Costo", lambda m: m.cost),
+    ("Descrizione", lambda m: m.description),
+    ("Scadenza Km", lambda m: m.expiry_km),
+    ("Scadenza Data", lambda m: m.expiry_date.isoformat() if m.expiry_date else None),
+]
+ENTITIES = {
+    "fuel": (crud.stream_refuelings, _FUEL_COLUMNS),
+    "maintenance": (crud.stream_maintenances, _MAINT_COLUMNS),
+}
+
+
+def stream_export(db: Session, user_id: str, entity: str, fmt: str = "csv",
+                  chunk_size: int = crud.EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """
+    Genera il file di export a blocchi di byte UTF-8 (uno per partizione letta dal DB).
+
+    Args:
+        entity: 'fuel' (rifornimenti) o 'maintenance' (manutenzioni).
+        fmt: 'csv' (colonne come l'Excel) o 'ndjson' (un oggetto JSON per riga, campi del modello).
+
+    Note:
+        La sessione deve restare aperta finché il generatore non è esaurito.
+    """
+    if entity not in ENTITIES:
+        raise ValueError(f"Entità di export non supportata: {entity}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato di export non supportato: {fmt}")
+
+    # Validazione immediata; la lettura dal DB parte solo alla prima iterazione
+    reader, columns = ENTITIES[entity]
+    encode = _csv_chunks(columns) if fmt == "csv" else _ndjson_chunks
+    return encode(reader(db, user_id, chunk_size))
+
+
+def write_export(db: Session, user_id: str, entity: str, fmt: str = "csv",
+                 max_memory_mb: float = 8.0):
+    """
+    Consuma stream_export in un file temporaneo (su disco oltre max_memory_mb) e lo ritorna
+    riavvolto, pronto per st.download_button. Il chiamante è responsabile della chiusura.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=int(max_memory_mb * 1024 * 1024), mode="w+b")
+    try:
+        for chunk in stream_export(db, user_id, entity, fmt):
+            spool.write(chunk)
+    except Exception:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+
+# =============================================================================
+# SERIALIZZATORI
+# =============================================================================
+
+def _csv_chunks(columns: list) -> Callable[[Iterator[list]], Iterator[bytes]]:
+    """Header + una riga CSV per record; il buffer testuale viene riusato tra le partizioni."""
+    headers = [name for name, _ in columns]
+    getters = [get for _, get in columns]
+
+    def encode(chunks: Iterator[list]) -> Iterator[bytes]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(headers)
+        for chunk in chunks:
+            writer.writerows([get(r) for get in getters] for r in chunk)
+            yield _drain(buffer)
+        # Storico vuoto: il file contiene comunque l'intestazione
+        if buffer.tell():
+            yield _drain(buffer)
+
+    return encode
+
+
+def _ndjson_chunks(chunks: Iterator[list]) -> Iterator[bytes]:
+    """Un oggetto JSON per riga con i campi del DTO (user_id escluso, date in ISO 8601)."""
+    for chunk in chunks:
+        lines = [json.dumps(_record(r), ensure_ascii=False, default=_json_default) for r in chunk]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _record(dto) -> dict:
+    return {f.name: getattr(dto, f.name) for f in fields(dto) if f.name != "user_id"}
+
+
+def _json_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Tipo non serializzabile: {type(value).__name__}")
+
+
+def _drain(buffer: io.StringIO) -> bytes:
+    data = buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate(0)
+    return data
@@ -1,8 +1,9 @@
 import pandas as pd
+from bisect import bisect_left, bisect_right
 from datetime import date as date_type
 from sqlalchemy.orm import Session
 from src.database import crud
-from .utils import clean_column_names, parse_date, parse_float, parse_int
+from .utils import clean_column_names, parse_date, parse_typed_columns, clean_text
 from src.config import DEFAULTS
 
 # =============================================================================
@@ -70,6 +71,9 @@ def validate_fuel_logic(db: Session, user_id: str, df: pd.DataFrame) -> pd.DataF
     # Standardizzazione nomi colonne post-edit UI
     df = df.rename(columns=UI_REVERSE_MAP)
 
+    # Parsing tipizzato per colonna (vettoriale) prima della validazione business
+    df = parse_typed_columns(df, dates=['data'], floats=['prezzo', 'costo', 'litri'], ints=['km'])
+
     # 2. Pre-fetching Dati Database (Ottimizzazione N+1)
     settings = crud.get_settings(db, user_id)
     db_refuelings = crud.get_all_refuelings(db, user_id)
@@ -79,13 +83,15 @@ def validate_fuel_logic(db: Session, user_id: str, df: pd.DataFrame) -> pd.DataF
     date_map = {r.date: r for r in db_refuelings}
     # Ordinamento necessario per controlli sequenziali (Sandwich Check)
     sorted_history = sorted(db_refuelings, key=lambda x: (x.date, x.total_km))
+    # Indice delle date ordinate: ricerca binaria di precedente/successivo in O(log n)
+    history_dates = [r.date for r in sorted_history]
     
     processed_rows = []
     file_keys = set() 
 
     # 3. Iterazione e Validazione Righe
-    for _, row in df.iterrows():
-        res = _parse_single_row(row, settings, ref_map, date_map, sorted_history, file_keys)
+    for row in df.to_dict('records'):
+        res = _parse_single_row(row, settings, ref_map, date_map, sorted_history, history_dates, file_keys)
         
         if res:
             # Controllo Duplicati INTRA-FILE (stesso file, due righe uguali)
@@ -112,6 +118,11 @@ def validate_fuel_logic(db: Session, user_id: str, df: pd.DataFrame) -> pd.DataF
     ]
     combined = sorted(set(db_pts + file_pts), key=lambda x: (x[0], x[1]))
 
+    # Lookup O(1) del record DB di un punto (date, km): primo in ordine, come la vecchia scansione
+    db_point_map = {}
+    for r in sorted_history:
+        db_point_map.setdefault((r.date, r.total_km), r)
+
     file_partial_keys = {
         (r['Data'], r['Km'])
         for r in processed_rows
@@ -129,21 +140,15 @@ def validate_fuel_logic(db: Session, user_id: str, df: pd.DataFrame) -> pd.DataF
         d_km   = row['Km']
         d_date = row['Data']
 
-        # Predecessore immediato nella timeline combinata
-        prev_km   = None
-        prev_date = None
-        prev_is_full = True  # Default: assumiamo pieno se record DB senza info
-        for dt, km in combined:
-            if dt < d_date or (dt == d_date and km < d_km):
-                prev_km   = km
-                prev_date = dt
-
-        if prev_km is None:
+        # Predecessore immediato nella timeline combinata: ultimo punto < (data, km) (ricerca binaria)
+        pos = bisect_left(combined, (d_date, d_km))
+        if pos == 0:
             continue  # Primo record assoluto, nessun predecessore
+        prev_date, prev_km = combined[pos - 1]
 
         # Se il predecessore è un parziale (nel DB oppure nel file in import),
         # il delta km/L non è affidabile → skip.
-        prev_db_rec = next((r for r in sorted_history if r.date == prev_date and r.total_km == prev_km), None)
+        prev_db_rec = db_point_map.get((prev_date, prev_km))
         if prev_db_rec and not prev_db_rec.is_full_tank:
             continue
         if (prev_date, prev_km) in file_partial_keys:
@@ -190,13 +195,16 @@ def validate_fuel_logic(db: Session, user_id: str, df: pd.DataFrame) -> pd.DataF
     return res_df
 
 
-def _parse_single_row(row, settings, ref_map, date_map, sorted_history, file_keys):
-    """Analizza una singola riga determinando lo stato (Nuovo, Modifica, Errore)."""
+def _parse_single_row(row, settings, ref_map, date_map, sorted_history, history_dates, file_keys):
+    """
+    Analizza una singola riga determinando lo stato (Nuovo, Modifica, Errore).
+    La riga arriva già tipizzata da parse_typed_columns (data, km, prezzo, costo, litri).
+    """
     status, notes, db_id = "Nuovo", [], None
     
-    # 1. Parsing Tipo Dati
-    d_date = parse_date(row.get('data'))
-    d_km = parse_int(row.get('km'))
+    # 1. Valori tipizzati
+    d_date = row['data']
+    d_km = row['km']
     
     # Fast-fail su dati mancanti
     if not d_date and d_km == 0: return None
@@ -205,15 +213,15 @@ def _parse_single_row(row, settings, ref_map, date_map, sorted_history, file_key
     elif d_date > date_type.today():
         status, notes = "Errore", ["Data nel futuro"]
     
-    d_price = parse_float(row.get('prezzo'))
-    d_cost = parse_float(row.get('costo'))
-    d_liters = parse_float(row.get('litri'))
+    d_price = row['prezzo']
+    d_cost = row['costo']
+    d_liters = row['litri']
     
     # Inferenza litri se mancanti
     if d_price > 0 and d_cost > 0: 
         d_liters = d_cost / d_price
     
-    d_notes_user = str(row.get('note', '')).strip()
+    d_notes_user = str(clean_text(row.get('note')) or '').strip()
     
     # Normalizzazione booleano 'Pieno'
     raw_pieno = row.get('pieno')
@@ -257,7 +265,7 @@ def _parse_single_row(row, settings, ref_map, date_map, sorted_history, file_key
                 status, notes = "Errore", [f"Data già presente (ID: {date_map[d_date].id})"]
             else:
                 # Verifica coerenza chilometrica temporale
-                status = _sandwich_check(d_date, d_km, sorted_history, notes, status)
+                status = _sandwich_check(d_date, d_km, sorted_history, history_dates, notes, status)
 
     # 3. Check Valori Assoluti
     if status in ["Nuovo", "Modifica"]:
@@ -284,20 +292,18 @@ def _parse_single_row(row, settings, ref_map, date_map, sorted_history, file_key
     }
 
 
-def _sandwich_check(d_date, d_km, sorted_history, notes, current_status):
+def _sandwich_check(d_date, d_km, sorted_history, history_dates, notes, current_status):
     """
     Verifica la coerenza cronologica dei chilometri (Sandwich Logic).
     Il nuovo record deve avere Km > del precedente e Km < del successivo.
     KM identici al record precedente o successivo sono bloccati (odometro non può essere fermo).
+    history_dates è la lista delle date di sorted_history: precedente e successivo via bisect.
     """
-    prev_rec = None
-    next_rec = None
-
-    for r in sorted_history:
-        if r.date < d_date: prev_rec = r
-        elif r.date > d_date:
-            next_rec = r
-            break
+    # Precedente: ultimo record con data < d_date; successivo: primo con data > d_date
+    i_prev = bisect_left(history_dates, d_date)
+    i_next = bisect_right(history_dates, d_date)
+    prev_rec = sorted_history[i_prev - 1] if i_prev > 0 else None
+    next_rec = sorted_history[i_next] if i_next < len(sorted_history) else None
 
     # KM deve essere STRETTAMENTE maggiore del precedente
     if prev_rec and d_km <= prev_rec.total_km:
@@ -336,4 +342,26 @@ def save_row(db: Session, user_id: str, row):
                 row['Note_User']
             )
     except Exception as e: 
-        print(f"Save error: {e}")
\ No newline at end of file
+        print(f"Save error: {e}")
+
+
+def save_rows(db: Session, user_id: str, df: pd.DataFrame, on_progress=None) -> int:
+    """
+    Salvataggio massivo dello staging: righe nuove e modificate in un unico upsert
+    sulla chiave naturale (data, km), dentro una sola transazione (errore → rollback
+    di tutto l'import). Un record già presente viene aggiornato senza passare dal suo id.
+    on_progress(done, total) viene chiamato a ogni blocco scritto. Ritorna i record salvati.
+    """
+    rows = []
+    for row in df.to_dict('records'):
+        if row['Stato'] not in ["Modifica", "Nuovo", "OK", "Warning"]:
+            continue  # Errore / Invariato non vengono salvati (come save_row)
+        rows.append({
+            "date": parse_date(row['Data']), "total_km": int(row['Km']),
+            "price_per_liter": float(row['Prezzo']), "total_cost": float(row['Costo']),
+            "liters": float(row['Litri']), "is_full_tank": bool(row['Pieno']),
+            "notes": clean_text(row['Note_User'])
+        })
+
+    # Commit unico, rollback su errore e invalidazione cache gestiti da crud
+    return crud.upsert_refuelings(db, user_id, rows, on_progress=on_progress)
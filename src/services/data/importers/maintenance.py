@@ -1,8 +1,8 @@
 import pandas as pd
 from sqlalchemy.orm import Session
 
-from src.database import crud
-from .utils import clean_column_names, parse_date, parse_float, parse_int
+from src.database import crud, cache
+from .utils import clean_column_names, parse_date, parse_typed_columns, clean_text
 
 # =============================================================================
 # CONFIGURAZIONE & MAPPING
@@ -64,6 +64,9 @@ def validate_maintenance_logic(db: Session, user_id: str, df: pd.DataFrame) -> p
     df = df.rename(columns=UI_REVERSE_MAP) 
     df = df.loc[:, ~df.columns.duplicated()]
 
+    # Parsing tipizzato per colonna (vettoriale) prima della validazione business
+    df = parse_typed_columns(df, dates=['data'], floats=['costo'], ints=['km'])
+
     # 2. Recupero Storico e Mappe Lookup
     db_recs = crud.get_all_maintenances(db, user_id)
     # L'ordinamento è cruciale per i check di coerenza chilometrica
@@ -76,7 +79,7 @@ def validate_maintenance_logic(db: Session, user_id: str, df: pd.DataFrame) -> p
     file_keys = set() 
 
     # 3. Iterazione Rows
-    for _, row in df.iterrows():
+    for row in df.to_dict('records'):
         res = _parse_single_row(row, ref_map, id_map, file_keys, sorted_history)
         
         if res:
@@ -103,18 +106,19 @@ def _parse_single_row(row, ref_map, id_map, file_keys, sorted_history):
     """
     Core parsing: Identifica se la riga è un nuovo inserimento o un update.
     Implementa controlli di coerenza temporale (Sandwich Check).
+    La riga arriva già tipizzata da parse_typed_columns (data, km, costo).
     """
     status, notes = "Nuovo", []
     db_id = None
     
-    # 1. Parsing Base
-    d_date = parse_date(row.get('data'))
-    d_km = parse_int(row.get('km'))
+    # 1. Valori tipizzati
+    d_date = row['data']
+    d_km = row['km']
     
     if not d_date and d_km == 0: return None
     if not d_date: status, notes = "Errore", ["Data invalida"]
 
-    d_cost = parse_float(row.get('costo'))
+    d_cost = row['costo']
     d_type = str(row.get('tipo', 'Altro')).strip()
     d_desc = str(row.get('descrizione', '')).strip()
     
@@ -230,4 +234,49 @@ def save_row(db: Session, user_id: str, row):
                 float(row['Costo']), row['Descrizione']
             )
     except Exception as e:
-        print(f"[Maintenance Import Error] Riga fallita: {e}")
\ No newline at end of file
+        print(f"[Maintenance Import Error] Riga fallita: {e}")
+
+
+def save_rows(db: Session, user_id: str, df: pd.DataFrame, on_progress=None) -> int:
+    """
+    Salvataggio massivo dello staging: stesso routing di save_row, ma Update e Insert
+    viaggiano in executemany dentro un'unica transazione (errore → rollback di tutto l'import).
+    Le modifiche restano per id (possono cambiare data, km o tipo); le nuove righe sono un
+    upsert sulla chiave naturale (data, km, tipo), così un record già presente non viene duplicato.
+    on_progress(done, total) viene chiamato a ogni blocco scritto. Ritorna i record salvati.
+    """
+    creates, updates = [], []
+    for row in df.to_dict('records'):
+        is_update = row['Stato'] == "Modifica" and pd.notna(row['db_id'])
+        if not is_update and row['Stato'] not in ["Nuovo", "OK"]:
+            continue  # Errore / Invariato non vengono salvati (come save_row)
+
+        values = {
+            "date": parse_date(row['Data']),
+            "total_km": int(row['Km']),
+            "expense_type": row['Tipo'],
+            "cost": float(row['Costo']),
+            "description": clean_text(row['Descrizione'])
+        }
+        if is_update:
+            updates.append({"id": int(row['db_id']), **values})
+        else:
+            creates.append(values)
+
+    total = len(creates) + len(updates)
+    if total == 0:
+        return 0
+
+    def _progress(offset):
+        return (lambda done, _: on_progress(offset + done, total)) if on_progress else None
+
+    try:
+        crud.bulk_update_maintenances(db, user_id, updates, on_progress=_progress(0), commit=False)
+        crud.upsert_maintenances(db, user_id, creates, on_progress=_progress(len(updates)), commit=False)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    cache.bump_version(user_id, cache.MAINTENANCES)
+    return total
@@ -1,62 +1,186 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
 import pandas as pd
 from sqlalchemy.orm import Session
 
+from src.config import cfg
 from . import fuel, maintenance
 
 # =============================================================================
 # FILE UPLOAD ORCHESTRATOR
 # =============================================================================
 
-def parse_upload_file(db: Session, user_id: str, uploaded_file) -> dict:
+def parse_upload_file(db: Session, user_id: str, uploaded_file, streaming: Optional[bool] = None) -> dict:
     """
     Gestisce il parsing di file caricati dall'utente (CSV o Excel).
     Rileva automaticamente il formato e smista ai moduli competenti (fuel/maintenance).
-    
+    Il workbook Excel viene aperto una sola volta e tutti i fogli sono letti dallo stesso handle.
+
     Args:
         uploaded_file: Oggetto file-like fornito da Streamlit uploader.
-        
+        streaming: Lettura openpyxl read-only riga per riga (None = automatica sopra
+                   la soglia 'import.streaming_min_mb' di config.toml).
+
     Returns:
-        dict: Dizionario contenente i DataFrame processati o messaggi di errore globali.
+        dict: Dizionario contenente i DataFrame processati o messaggi di errore globali,
+              più 'stats' con modalità di lettura e tempi (picco di memoria solo con
+              'import.trace_memory' attivo).
     """
     results = {}
-    
+    stats = {}
+    results['stats'] = stats
+
     # 1. Handling CSV (Legacy Support)
     if uploaded_file.name.endswith('.csv'):
+        stats['mode'] = 'csv'
         try:
-            df = pd.read_csv(uploaded_file)
-            results['fuel'] = fuel.process_fuel_data(db, user_id, df)
+            with _measure_read(stats):
+                df = pd.read_csv(uploaded_file)
+            with _measure_time(stats, 'validate_seconds'):
+                results['fuel'] = fuel.process_fuel_data(db, user_id, df)
         except Exception as e:
             results['global_error'] = f"Errore CSV: {e}"
         return results
 
     # 2. Handling Excel (Multi-sheet)
     try:
-        xls = pd.ExcelFile(uploaded_file)
-        
-        # Mappa nomi fogli in minuscolo per ricerca case-insensitive
-        sheet_map = {s.lower().strip(): s for s in xls.sheet_names}
-        
-        # Euristica di rilevamento fogli (Sheet Sniffing)
-        fuel_sheet = next((s for k, s in sheet_map.items() if 'riforniment' in k or 'fuel' in k), None)
-        maint_sheet = next((s for k, s in sheet_map.items() if 'manutenzion' in k or 'maint' in k), None)
-        
-        # Fallback: Se c'è un solo foglio e non ho riconosciuto nomi, assumo siano Rifornimenti
-        if not fuel_sheet and not maint_sheet and len(xls.sheet_names) == 1:
-            fuel_sheet = xls.sheet_names[0]
+        use_streaming = _use_streaming(uploaded_file) if streaming is None else streaming
+        stats['mode'] = 'streaming' if use_streaming else 'pandas'
+
+        with _measure_read(stats):
+            frames = _read_workbook_streaming(uploaded_file) if use_streaming else _read_workbook(uploaded_file)
 
         # 3. Processing
-        if fuel_sheet:
-            df = pd.read_excel(uploaded_file, sheet_name=fuel_sheet)
-            results['fuel'] = fuel.process_fuel_data(db, user_id, df)
-            
-        if maint_sheet:
-            df = pd.read_excel(uploaded_file, sheet_name=maint_sheet)
-            results['maintenance'] = maintenance.process_maintenance_data(db, user_id, df)
+        with _measure_time(stats, 'validate_seconds'):
+            if 'fuel' in frames:
+                results['fuel'] = fuel.process_fuel_data(db, user_id, frames['fuel'])
+
+            if 'maintenance' in frames:
+                results['maintenance'] = maintenance.process_maintenance_data(db, user_id, frames['maintenance'])
 
-        if not results:
+        if 'fuel' not in results and 'maintenance' not in results:
             results['global_error'] = "Nessun foglio valido trovato (cerca 'Rifornimenti' o 'Manutenzione')."
 
     except Exception as e:
         results['global_error'] = f"Errore file: {e}"
 
-    return results
\ No newline at end of file
+    return results
+
+
+# =============================================================================
+# LETTURA WORKBOOK
+# =============================================================================
+
+def _detect_sheets(sheet_names: list) -> tuple:
+    """Euristica di rilevamento fogli (Sheet Sniffing): ritorna (foglio_rifornimenti, foglio_manutenzione)."""
+    # Mappa nomi fogli in minuscolo per ricerca case-insensitive
+    sheet_map = {s.lower().strip(): s for s in sheet_names}
+
+    fuel_sheet = next((s for k, s in sheet_map.items() if 'riforniment' in k or 'fuel' in k), None)
+    maint_sheet = next((s for k, s in sheet_map.items() if 'manutenzion' in k or 'maint' in k), None)
+
+    # Fallback: Se c'è un solo foglio e non ho riconosciuto nomi, assumo siano Rifornimenti
+    if not fuel_sheet and not maint_sheet and len(sheet_names) == 1:
+        fuel_sheet = sheet_names[0]
+    return fuel_sheet, maint_sheet
+
+
+def _read_workbook(uploaded_file) -> dict:
+    """Apre il workbook una volta (pd.ExcelFile) e legge i fogli riconosciuti dallo stesso handle."""
+    frames = {}
+    xls = pd.ExcelFile(uploaded_file)
+    try:
+        fuel_sheet, maint_sheet = _detect_sheets(xls.sheet_names)
+        if fuel_sheet:
+            frames['fuel'] = pd.read_excel(xls, sheet_name=fuel_sheet)
+        if maint_sheet:
+            frames['maintenance'] = pd.read_excel(xls, sheet_name=maint_sheet)
+    finally:
+        xls.close()
+    return frames
+
+
+def _read_workbook_streaming(uploaded_file) -> dict:
+    """
+    Lettura openpyxl read-only: le righe vengono consumate in streaming dall'XML
+    e costruite direttamente in DataFrame, senza la conversione cella per cella di pandas.
+    """
+    from openpyxl import load_workbook
+
+    frames = {}
+    wb = load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        fuel_sheet, maint_sheet = _detect_sheets(wb.sheetnames)
+        if fuel_sheet:
+            frames['fuel'] = _sheet_to_frame(wb[fuel_sheet])
+        if maint_sheet:
+            frames['maintenance'] = _sheet_to_frame(wb[maint_sheet])
+    finally:
+        wb.close()
+    return frames
+
+
+def _sheet_to_frame(ws) -> pd.DataFrame:
+    """Prima riga come header (celle vuote → 'Unnamed: i', come pandas), righe vuote scartate."""
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+
+    columns = [str(h) if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+    width = len(columns)
+    records = (
+        tuple(r[:width]) + (None,) * (width - len(r))
+        for r in rows if any(v is not None for v in r)
+    )
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def _use_streaming(uploaded_file) -> bool:
+    """Streaming automatico per file .xlsx sopra la soglia configurata."""
+    size = getattr(uploaded_file, 'size', None)
+    if not isinstance(size, int) or not uploaded_file.name.lower().endswith(('.xlsx', '.xlsm')):
+        return False
+    return size >= float(cfg("import.streaming_min_mb", 5.0)) * 1024 * 1024
+
+
+# =============================================================================
+# METRICHE DI PARSING
+# =============================================================================
+
+@contextmanager
+def _measure_time(stats: dict, key: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats[key] = time.perf_counter() - start
+
+
+@contextmanager
+def _measure_read(stats: dict):
+    """
+    Tempo della sola lettura del file. Con 'import.trace_memory' (solo debug) anche il
+    picco di memoria via tracemalloc, che però traccia l'intero processo: tutte le
+    sessioni ne pagano il costo e import concorrenti si falsano le misure a vicenda.
+    """
+    if not cfg("import.trace_memory", False):
+        with _measure_time(stats, 'read_seconds'):
+            yield
+        return
+
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    try:
+        with _measure_time(stats, 'read_seconds'):
+            yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        stats['peak_memory_mb'] = peak / (1024 * 1024)
+        if started:
+            tracemalloc.stop()
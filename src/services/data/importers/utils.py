@@ -1,7 +1,11 @@
 from datetime import datetime, date
 
+import numpy as np
 import pandas as pd
 
+# Formati testuali accettati per le date (stesso ordine di tentativo di parse_date)
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y")
+
 # =============================================================================
 # DATA CLEANING UTILS
 # =============================================================================
@@ -28,7 +32,7 @@ def parse_date(raw_date):
     
     # Parsing stringhe
     raw_str = str(raw_date).split(' ')[0] # Rimuove eventuali componenti orarie
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y"):
+    for fmt in DATE_FORMATS:
         try:
             return datetime.strptime(raw_str, fmt).date()
         except ValueError:
@@ -48,4 +52,93 @@ def parse_float(value) -> float:
 
 def parse_int(value) -> int:
     """Safe parsing per interi (es. chilometri)."""
-    return int(parse_float(value))
\ No newline at end of file
+    return int(parse_float(value))
+
+def clean_text(value):
+    """Testo opzionale per il DB: NaN/None della UI diventano None."""
+    if value is None or (not isinstance(value, str) and pd.isna(value)): return None
+    return value
+
+
+# =============================================================================
+# PARSING VETTORIALE (per colonna)
+# Stessi risultati delle funzioni scalari, ma calcolati sull'intera colonna:
+# i casi non coperti dal percorso vettoriale (pochi, es. '1_000') ricadono
+# sulla funzione scalare, così la semantica resta identica.
+# =============================================================================
+
+def parse_date_column(series: pd.Series) -> pd.Series:
+    """Equivalente colonnare di parse_date: Series object con datetime.date o None."""
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Series(
+            [d if pd.notna(d) else None for d in series.dt.date], index=series.index, dtype=object
+        )
+
+    # Lavoro posizionale: l'indice della UI (data_editor) può non essere un RangeIndex
+    raw_values = series.to_numpy(dtype=object)
+    out = np.full(len(raw_values), None, dtype=object)
+    notna = pd.notna(raw_values)
+
+    # 1. Oggetti data/datetime già tipizzati (es. celle data di Excel)
+    native = np.fromiter((isinstance(v, (datetime, date)) for v in raw_values), dtype=bool, count=len(raw_values))
+    for i in np.flatnonzero(native):
+        v = raw_values[i]
+        out[i] = v.date() if isinstance(v, datetime) else v
+
+    # 2. Stringhe: un pd.to_datetime per formato, solo sulle righe ancora da risolvere
+    pending = np.flatnonzero(notna & ~native)
+    if len(pending):
+        raw = pd.Series(raw_values[pending]).astype(str).str.split(" ", n=1).str[0]
+        for fmt in DATE_FORMATS:
+            if len(pending) == 0:
+                break
+            parsed = pd.to_datetime(raw, format=fmt, errors="coerce")
+            ok = parsed.notna().to_numpy()
+            out[pending[ok]] = list(parsed[ok].dt.date)
+            pending, raw = pending[~ok], raw[~ok]
+
+        # 3. Residui (es. anni fuori dal range di pandas): fallback scalare
+        for i in pending:
+            out[i] = parse_date(raw_values[i])
+    return pd.Series(out, index=series.index, dtype=object)
+
+
+def parse_float_column(series: pd.Series) -> pd.Series:
+    """Equivalente colonnare di parse_float: float64, virgola decimale e NaN → 0.0."""
+    if series.dtype in (np.float64, np.int64):
+        return series.astype(np.float64).fillna(0.0)
+
+    values = pd.to_numeric(
+        series.astype(str).str.replace(",", ".", regex=False), errors="coerce"
+    ).to_numpy(dtype=np.float64, copy=True)
+    missing = np.flatnonzero(np.isnan(values))
+    if len(missing):
+        # NaN/None → 0.0, testo non numerico → 0.0, casi limite ('1_000', 'nan') come parse_float
+        raw_values = series.to_numpy(dtype=object)
+        values[missing] = [parse_float(raw_values[i]) for i in missing]
+    return pd.Series(values, index=series.index, dtype=np.float64)
+
+
+def parse_int_column(series: pd.Series) -> pd.Series:
+    """Equivalente colonnare di parse_int: troncamento verso zero del valore float."""
+    values = parse_float_column(series)
+    if np.isfinite(values).all() and (values.abs() < 2 ** 63).all():
+        return np.trunc(values).astype(np.int64)
+    return values.map(int)  # Stesso comportamento (ed errori) di int(parse_float(v))
+
+
+def parse_typed_columns(df: pd.DataFrame, dates=(), floats=(), ints=()) -> pd.DataFrame:
+    """
+    Stadio di parsing tipizzato prima della validazione business.
+    Ritorna una copia con le colonne indicate convertite; le colonne assenti
+    vengono create col valore che la funzione scalare darebbe a None (None / 0.0 / 0).
+    """
+    typed = df.copy()
+    empty = pd.Series([None] * len(df), index=df.index, dtype=object)
+    for col in dates:
+        typed[col] = parse_date_column(df[col] if col in df.columns else empty)
+    for col in floats:
+        typed[col] = parse_float_column(df[col] if col in df.columns else empty)
+    for col in ints:
+        typed[col] = parse_int_column(df[col] if col in df.columns else empty)
+    return typed
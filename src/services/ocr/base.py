@@ -0,0 +1,26 @@
+"""
+src/services/ocr/base.py — Interfaccia comune dei motori OCR
+
+Un motore riceve il buffer dell'immagine già preparata e restituisce ReceiptData.
+Gli errori non vengono sollevati ma riportati in ReceiptData.raw_text (come fa
+engine.analyze_receipt), così la pipeline può passare al motore successivo.
+"""
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+
+from .models import ReceiptData
+
+
+class OcrEngine(ABC):
+    """Interfaccia di un motore OCR: da buffer immagine a ReceiptData (istanziabile solo se completa)."""
+
+    name: str = ""
+
+    @abstractmethod
+    def is_available(self) -> bool:
+        """True se il motore può essere usato (dipendenze, chiavi, binari)."""
+
+    @abstractmethod
+    def analyze(self, file_buffer) -> ReceiptData:
+        """Estrae i dati; un esito senza total_cost conta come lettura fallita."""
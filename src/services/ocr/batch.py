@@ -0,0 +1,194 @@
+"""
+src/services/ocr/batch.py — Scansione di molti scontrini in parallelo
+
+Espone:
+  - TokenBucket(rate, burst)                  → limitatore di richieste thread-safe
+  - ReceiptUpload(name, data)                 → immagine da scansionare
+  - scan_receipts(uploads)                    → BatchScanResult in ordine di completamento
+  - scan_and_stage(db, user_id, uploads)      → scansiona e salva ogni esito in 'receipt_scans'
+  - staged_fuel_frame(scans)                  → DataFrame nel formato del foglio Rifornimenti
+
+Strategia:
+  Le immagini passano da pipeline.process_receipt_image (preparazione, cache, motori)
+  su un pool di thread limitato: le chiamate OCR sono I/O di rete o subprocess
+  Tesseract, quindi i thread lavorano in parallelo nonostante il GIL.
+  Prima di ogni scansione un token bucket condiviso impone il ritmo massimo
+  ([ocr.batch] rate_per_minute, con raffica iniziale 'burst') per restare nei
+  rate limit del provider. Gli esiti vengono restituiti appena pronti e scritti
+  subito nello staging dal thread chiamante (la sessione DB non è condivisa).
+"""
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Callable, Iterable, Iterator, List, Optional
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from src.config import cfg
+from src.database import crud
+from .models import ReceiptData
+from .pipeline import process_receipt_image
+
+
+# =============================================================================
+# RATE LIMIT
+# =============================================================================
+
+class TokenBucket:
+    """Token bucket: 'rate' token al secondo, al più 'burst' accumulati."""
+
+    def __init__(self, rate: float, burst: int = 1, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Attende un token. Ritorna i secondi di attesa."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            self._sleep(delay)
+            waited += delay
+
+
+# =============================================================================
+# SCANSIONE
+# =============================================================================
+
+@dataclass(frozen=True)
+class ReceiptUpload:
+    """Immagine già letta in memoria (i file di Streamlit non vanno condivisi tra thread)."""
+    name: str
+    data: bytes
+
+
+@dataclass
+class BatchScanResult:
+    upload: ReceiptUpload
+    data: ReceiptData
+    seconds: float
+    waited: float = 0.0     # attesa imposta dal rate limit
+
+    @property
+    def ok(self) -> bool:
+        return self.data.total_cost > 0
+
+
+def _scan_one(upload: ReceiptUpload, bucket: Optional[TokenBucket]) -> BatchScanResult:
+    waited = bucket.acquire() if bucket else 0.0
+    start = time.perf_counter()
+    try:
+        data = process_receipt_image(BytesIO(upload.data))
+    except Exception as e:
+        # Un'immagine problematica non deve interrompere il batch
+        data = ReceiptData(raw_text=f"❌ ERRORE IMPREVISTO: {e}")
+    return BatchScanResult(upload, data, time.perf_counter() - start, waited)
+
+
+def scan_receipts(
+    uploads: Iterable[ReceiptUpload],
+    max_workers: Optional[int] = None,
+    rate_per_minute: Optional[float] = None,
+    burst: Optional[int] = None,
+) -> Iterator[BatchScanResult]:
+    """
+    Scansiona le immagini in parallelo e restituisce gli esiti appena completati.
+    I parametri None usano [ocr.batch]; rate_per_minute = 0 disattiva il limite.
+    """
+    uploads = list(uploads)
+    if not uploads:
+        return
+    max_workers = int(max_workers or cfg("ocr.batch.max_workers", 4))
+    rate = cfg("ocr.batch.rate_per_minute", 30) if rate_per_minute is None else rate_per_minute
+    burst = int(burst or cfg("ocr.batch.burst", 5))
+    bucket = TokenBucket(rate / 60.0, burst) if rate else None
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(uploads)), thread_name_prefix="ocr-batch") as pool:
+        pending = {pool.submit(_scan_one, u, bucket) for u in uploads}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def scan_and_stage(
+    db: Session,
+    user_id: str,
+    uploads: Iterable[ReceiptUpload],
+    batch_id: Optional[str] = None,
+    on_result: Optional[Callable[[BatchScanResult, int, int], None]] = None,
+    **scan_options,
+) -> str:
+    """
+    Scansiona le immagini e salva ogni esito nello staging appena disponibile:
+    un'interruzione a metà non perde le scansioni già concluse.
+
+    Args:
+        on_result: callback (esito, completati, totale) per la barra di avanzamento.
+
+    Returns:
+        str: batch_id delle righe scritte.
+    """
+    uploads = list(uploads)
+    batch_id = batch_id or uuid.uuid4().hex
+    for done, result in enumerate(scan_receipts(uploads, **scan_options), start=1):
+        rd = result.data
+        crud.create_receipt_scan(
+            db, user_id, batch_id, result.upload.name,
+            date_obj=rd.date,
+            price_per_liter=rd.price_per_liter,
+            total_cost=rd.total_cost,
+            liters=rd.liters,
+            station_name=rd.station_name,
+            engine=rd.scan_stats.get("engine"),
+            error=None if result.ok else (rd.raw_text or "Totale non trovato"),
+            scan_ms=result.seconds * 1000,
+        )
+        if on_result:
+            on_result(result, done, len(uploads))
+    return batch_id
+
+
+# =============================================================================
+# CONVERSIONE PER L'IMPORTER
+# =============================================================================
+
+FUEL_IMPORT_COLUMNS = ['data', 'km', 'prezzo', 'costo', 'litri', 'pieno', 'note']
+
+
+def staged_fuel_frame(scans: Iterable) -> pd.DataFrame:
+    """
+    Scansioni riuscite → righe del foglio Rifornimenti (input di fuel.process_fuel_data).
+    I km non compaiono sugli scontrini: restano 0 e vanno inseriti in revisione.
+    """
+    rows: List[dict] = [
+        {
+            'data': s.date,
+            'km': 0,
+            'prezzo': s.price_per_liter,
+            'costo': s.total_cost,
+            'litri': s.liters,
+            'pieno': True,
+            'note': s.station_name or "",
+        }
+        for s in scans if not s.error and (s.total_cost or 0) > 0
+    ]
+    return pd.DataFrame(rows, columns=FUEL_IMPORT_COLUMNS)
@@ -0,0 +1,254 @@
+"""
+src/services/ocr/cache.py — Cache dei risultati OCR per immagine
+
+Espone:
+  - get_ocr_cache()            → istanza condivisa configurata da [ocr.cache]
+  - OcrCache.lookup(image)     → (ReceiptData | None, livello: "memory" | "sqlite" | None)
+  - OcrCache.store(image, rd)  → memorizza un risultato valido
+
+Strategia:
+  La chiave è lo SHA-256 dei byte dell'immagine già normalizzata da preprocessing
+  (rotazione, grigi, ritaglio, resize): lo stesso scontrino ricaricato o un rerun del
+  dialog producono la stessa chiave e non richiamano il modello.
+  Opzionalmente (perceptual = true) si confronta anche un dHash a 64 bit, così una
+  foto ricompressa o leggermente diversa dello stesso scontrino trova il risultato
+  entro 'perceptual_max_distance' bit di differenza.
+  Due livelli: LRU in memoria (numero di voci) e tabella SQLite persistente,
+  limitata in righe (escono per prime le voci usate meno di recente).
+  Si memorizzano solo letture riuscite: errori e risposte vuote vengono ritentati.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict
+from datetime import date
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from src.config import cfg
+from .models import ReceiptData
+
+logger = logging.getLogger(__name__)
+
+# Campi di ReceiptData persistiti (le metriche della singola scansione restano fuori)
+_PERSISTED_FIELDS = ("date", "total_cost", "price_per_liter", "liters", "station_name", "raw_text")
+
+
+# =============================================================================
+# CHIAVI
+# =============================================================================
+
+def image_key(image: bytes) -> str:
+    """SHA-256 esadecimale dei byte dell'immagine normalizzata."""
+    return hashlib.sha256(image).hexdigest()
+
+
+def perceptual_hash(image: bytes) -> Optional[int]:
+    """dHash a 64 bit (gradiente orizzontale su miniatura 9x8 in grigi), None se non decodificabile."""
+    try:
+        from PIL import Image
+        with Image.open(io.BytesIO(image)) as img:
+            small = img.convert("L").resize((9, 8), Image.LANCZOS)
+            px = list(small.getdata())
+    except Exception:
+        return None
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = px[row * 9 + col], px[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return bits
+
+
+def _hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _to_signed64(value: int) -> int:
+    """SQLite INTEGER è con segno: il dHash senza segno viene riportato nell'intervallo int64."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def _to_unsigned64(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+# =============================================================================
+# SERIALIZZAZIONE
+# =============================================================================
+
+def _dumps(data: ReceiptData) -> str:
+    payload = {k: v for k, v in asdict(data).items() if k in _PERSISTED_FIELDS}
+    if payload["date"] is not None:
+        payload["date"] = payload["date"].isoformat()
+    return json.dumps(payload, ensure_ascii=False)
+
+
+def _loads(text: str) -> ReceiptData:
+    payload = json.loads(text)
+    if payload.get("date"):
+        payload["date"] = date.fromisoformat(payload["date"])
+    return ReceiptData(**payload)
+
+
+# =============================================================================
+# CACHE A DUE LIVELLI
+# =============================================================================
+
+class OcrCache:
+    """LRU in memoria (chiave → JSON del risultato) con livello SQLite opzionale."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        sqlite_path: Optional[str] = None,
+        sqlite_max_entries: int = 5000,
+        perceptual: bool = False,
+        perceptual_max_distance: int = 4,
+    ):
+        self.max_entries = max_entries
+        self.sqlite_max_entries = sqlite_max_entries
+        self.perceptual = perceptual
+        self.perceptual_max_distance = perceptual_max_distance
+        self._lock = threading.Lock()
+        self._items: OrderedDict[str, Tuple[Optional[int], str]] = OrderedDict()
+        self._stats = {"hits": 0, "sqlite_hits": 0, "misses": 0}
+        self._conn = self._open_sqlite(sqlite_path) if sqlite_path else None
+
+    # -- API ------------------------------------------------------------------
+
+    def lookup(self, image: bytes) -> Tuple[Optional[ReceiptData], Optional[str]]:
+        """Risultato cachato per l'immagine (copia indipendente) e livello che l'ha fornito."""
+        key = image_key(image)
+        phash = perceptual_hash(image) if self.perceptual else None
+
+        with self._lock:
+            text = self._memory_get(key, phash)
+            if text is not None:
+                self._stats["hits"] += 1
+                return _loads(text), "memory"
+
+            row = self._sqlite_get(key, phash)
+            if row is None:
+                self._stats["misses"] += 1
+                return None, None
+            found_key, found_phash, text = row
+            self._stats["sqlite_hits"] += 1
+            self._memory_put(found_key, found_phash, text)
+            return _loads(text), "sqlite"
+
+    def store(self, image: bytes, data: ReceiptData) -> None:
+        key = image_key(image)
+        phash = perceptual_hash(image) if self.perceptual else None
+        text = _dumps(data)
+        with self._lock:
+            self._memory_put(key, phash, text)
+            self._sqlite_put(key, phash, text)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "entries": len(self._items)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM ocr_cache")
+
+    # -- Memoria (chiamate con il lock) -----------------------------------------
+
+    def _memory_get(self, key: str, phash: Optional[int]) -> Optional[str]:
+        entry = self._items.get(key)
+        if entry is None and phash is not None:
+            key = next((k for k, (h, _) in self._items.items()
+                        if h is not None and _hamming(h, phash) <= self.perceptual_max_distance), None)
+            entry = self._items.get(key) if key else None
+        if entry is None:
+            return None
+        self._items.move_to_end(key)
+        return entry[1]
+
+    def _memory_put(self, key: str, phash: Optional[int], text: str) -> None:
+        self._items[key] = (phash, text)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    # -- SQLite (chiamate con il lock) -------------------------------------------
+
+    def _open_sqlite(self, path: str) -> Optional[sqlite3.Connection]:
+        try:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            conn = sqlite3.connect(path, check_same_thread=False)
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS ocr_cache ("
+                    " key TEXT PRIMARY KEY, phash INTEGER, result TEXT NOT NULL, last_used REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS ix_ocr_cache_last_used ON ocr_cache (last_used)")
+            return conn
+        except (OSError, sqlite3.Error) as e:
+            # Cache persistente non disponibile: si prosegue con la sola memoria
+            logger.warning("OCR cache: SQLite %s non disponibile (%s)", path, e)
+            return None
+
+    def _sqlite_get(self, key: str, phash: Optional[int]):
+        if self._conn is None:
+            return None
+        try:
+            row = self._conn.execute("SELECT key, phash, result FROM ocr_cache WHERE key = ?", (key,)).fetchone()
+            if row is None and phash is not None:
+                row = next((r for r in self._conn.execute(
+                    "SELECT key, phash, result FROM ocr_cache WHERE phash IS NOT NULL")
+                    if _hamming(_to_unsigned64(r[1]), phash) <= self.perceptual_max_distance), None)
+            if row is None:
+                return None
+            with self._conn:
+                self._conn.execute("UPDATE ocr_cache SET last_used = ? WHERE key = ?", (time.time(), row[0]))
+            found_phash = _to_unsigned64(row[1]) if row[1] is not None else None
+            return row[0], found_phash, row[2]
+        except sqlite3.Error as e:
+            logger.warning("OCR cache: lettura SQLite fallita (%s)", e)
+            return None
+
+    def _sqlite_put(self, key: str, phash: Optional[int], text: str) -> None:
+        if self._conn is None:
+            return
+        try:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ocr_cache (key, phash, result, last_used) VALUES (?, ?, ?, ?)",
+                    (key, _to_signed64(phash) if phash is not None else None, text, time.time()),
+                )
+                # Limite righe: via le voci usate meno di recente
+                self._conn.execute(
+                    "DELETE FROM ocr_cache WHERE key IN ("
+                    " SELECT key FROM ocr_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.sqlite_max_entries,),
+                )
+        except sqlite3.Error as e:
+            logger.warning("OCR cache: scrittura SQLite fallita (%s)", e)
+
+
+@lru_cache(maxsize=1)
+def get_ocr_cache() -> OcrCache:
+    """Istanza condivisa dal processo Streamlit, configurata da [ocr.cache] di config.toml."""
+    return OcrCache(
+        max_entries=int(cfg("ocr.cache.memory_entries", 256)),
+        sqlite_path=cfg("ocr.cache.sqlite_path", ".cache/ocr.sqlite3") or None,
+        sqlite_max_entries=int(cfg("ocr.cache.sqlite_max_entries", 5000)),
+        perceptual=bool(cfg("ocr.cache.perceptual", False)),
+        perceptual_max_distance=int(cfg("ocr.cache.perceptual_max_distance", 4)),
+    )
+
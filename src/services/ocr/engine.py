@@ -1,10 +1,12 @@
 import base64
 import json
+import threading
 import streamlit as st
 from datetime import datetime
-from openai import OpenAI, APIConnectionError, RateLimitError, AuthenticationError, APIError
+from functools import lru_cache
 from typing import Optional
 from .models import ReceiptData
+from .resilience import CircuitOpenError, ResiliencePolicy, policy_from_config
 from src.demo import is_demo_mode, mock_analyze_receipt
 
 
@@ -12,20 +14,78 @@ from src.demo import is_demo_mode, mock_analyze_receipt
 # =============================================================================
 # CONFIGURAZIONE CLIENT OPENAI
 # =============================================================================
-# Recupera la chiave dai secrets. Se non c'è, il client sarà None.
-_api_key = st.secrets.get("openai", {}).get("api_key")
-client = OpenAI(api_key=_api_key) if _api_key else None
+# Client costruito al primo utilizzo (get_client): importare questo modulo non
+# carica openai/httpx né legge i secrets, costo pagato solo da chi scansiona.
+# 'client' resta l'attributo di modulo su cui agiscono i test (patch / None).
+_UNSET = object()
+client = _UNSET
+_client_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _api_key() -> Optional[str]:
+    """Chiave OpenAI dai secrets (risolta una volta, al primo accesso)."""
+    try:
+        return st.secrets.get("openai", {}).get("api_key")
+    except Exception:
+        # secrets.toml assente o illeggibile: OCR OpenAI semplicemente non configurato
+        return None
+
+
+def get_client():
+    """Client OpenAI condiviso, creato alla prima richiesta. None se la chiave manca."""
+    global client
+    if client is _UNSET:
+        with _client_lock:
+            if client is _UNSET:
+                key = _api_key()
+                if key:
+                    from openai import OpenAI
+                    # Retry disattivati nell'SDK: backoff, deadline e breaker sono gestiti da resilience.py
+                    client = OpenAI(api_key=key, max_retries=0)
+                else:
+                    client = None
+    return client
+
 
 def is_openai_enabled() -> bool:
     """
     Restituisce True se OpenAI è configurato correttamente e pronto all'uso.
     Utile per nascondere/mostrare componenti UI condizionali.
+    Controlla solo la configurazione: il client non viene costruito.
     """
-    return client is not None
+    if client is not _UNSET:
+        return client is not None
+    return bool(_api_key())
+
+def _is_transient(exc: BaseException) -> bool:
+    """Errori per cui un nuovo tentativo ha senso: rete, timeout, 429 temporanei, 5xx."""
+    from openai import APIConnectionError, APIError, APIStatusError, RateLimitError
+
+    if isinstance(exc, RateLimitError):
+        # Credito esaurito: il 429 non si risolve ritentando
+        return getattr(exc, "code", None) != "insufficient_quota"
+    if isinstance(exc, APIStatusError):
+        return exc.status_code >= 500
+    return isinstance(exc, (APIConnectionError, APIError))
+
+
+@lru_cache(maxsize=1)
+def get_resilience_policy() -> ResiliencePolicy:
+    """Policy condivisa per le chiamate OpenAI (contatori e breaker a livello di processo)."""
+    return policy_from_config("openai", _is_transient)
+
+
+def resilience_stats() -> dict:
+    """Tentativi, errori, retry, chiamate saltate e stato del circuit breaker OpenAI."""
+    return get_resilience_policy().stats()
+
 
 def analyze_receipt(file_buffer) -> ReceiptData:
     """
     Invia l'immagine dello scontrino a OpenAI GPT-4o e restituisce dati strutturati.
+    Errori transitori ritentati con backoff entro la deadline; con il circuit breaker
+    aperto ritorna subito un errore di rete (la pipeline passa al motore locale).
     
     Args:
         file_buffer: Oggetto file-like (bytes) caricato da Streamlit.
@@ -38,58 +98,22 @@ def analyze_receipt(file_buffer) -> ReceiptData:
         return mock_analyze_receipt()
 
     # 1. Controllo Pre-Flight
-    if not client:
+    openai_client = get_client()
+    if not openai_client:
         return ReceiptData(raw_text="ERRORE: API Key OpenAI mancante in .streamlit/secrets.toml")
 
+    # Import già pagato da get_client: qui servono solo le classi d'errore
+    from openai import APIConnectionError, APIError, AuthenticationError, RateLimitError
+
     try:
-        base64_image = _encode_image_to_base64(file_buffer)
-
-        system_prompt = """
-        Sei un motore OCR intelligente specializzato in scontrini carburante italiani.
-        Analizza l'immagine fornita ed estrai i dati nel seguente formato JSON rigoroso:
-        {
-            "total_cost": float o null (Costo totale in Euro),
-            "price_per_liter": float o null (Prezzo al litro),
-            "date": "YYYY-MM-DD" o null,
-            "station_name": string o null (Es. "Eni Station", "Q8")
-        }
-        Regole:
-        - Fai molta attenzione alla data: negli scontrini italiani il formato è solitamente DD-MM-YY o DD-MM-YYYY (giorno-mese-anno). Non confondere il giorno con l'anno! Ad esempio, se leggi '20-01-26' o '20-01-2026', la data corretta è il 20 gennaio 2026, quindi dovrai restituire '2026-01-20', non scambiando i valori in modo scorretto.
-        - Se hai Totale e Litri ma manca il Prezzo/L, calcolalo (Totale / Litri).
-        - Ignora punti fedeltà o altri prodotti non carburante se possibile.
-        - Restituisci SOLO il JSON, nessun markdown.
-        """
-
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Estrai i dati da questo scontrino."},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{base64_image}"
-                            },
-                        },
-                    ],
-                },
-            ],
-            temperature=0.0, # Determinismo massimo
-            response_format={ "type": "json_object" } # Forza output JSON
-        )
-
-        content = response.choices[0].message.content
-        # Strip eventuali backtick markdown in caso di formato errato
-        content = content.replace("```json", "").replace("```", "").strip()
-        
-        data_dict = json.loads(content)
-        return _map_json_to_model(data_dict)
+        return get_resilience_policy().call(lambda timeout: _request_receipt(openai_client, file_buffer, timeout))
+
+    # --- GESTIONE ERRORI SPECIFICI (dopo retry e backoff) ---
+
+    except CircuitOpenError as e:
+        # Upstream escluso dal breaker: nessuna chiamata, la pipeline passa al motore locale
+        return ReceiptData(raw_text=f"🌐 ERRORE RETE: OpenAI non risponde dopo errori ripetuti, nuovo tentativo tra {e.retry_in:.0f} s.")
 
-    # --- GESTIONE ERRORI SPECIFICI ---
-    
     except AuthenticationError:
         return ReceiptData(raw_text="⛔ ERRORE AUTH: La tua API Key di OpenAI non è valida o è scaduta.")
 
@@ -112,6 +136,55 @@ def analyze_receipt(file_buffer) -> ReceiptData:
 # HELPER FUNCTIONS
 # =============================================================================
 
+def _request_receipt(openai_client, file_buffer, timeout: float) -> ReceiptData:
+    """Singolo tentativo: chiamata GPT-4o con timeout e parsing. Le eccezioni risalgono al retry."""
+    base64_image = _encode_image_to_base64(file_buffer)
+
+    system_prompt = """
+    Sei un motore OCR intelligente specializzato in scontrini carburante italiani.
+    Analizza l'immagine fornita ed estrai i dati nel seguente formato JSON rigoroso:
+    {
+        "total_cost": float o null (Costo totale in Euro),
+        "price_per_liter": float o null (Prezzo al litro),
+        "date": "YYYY-MM-DD" o null,
+        "station_name": string o null (Es. "Eni Station", "Q8")
+    }
+    Regole:
+    - Fai molta attenzione alla data: negli scontrini italiani il formato è solitamente DD-MM-YY o DD-MM-YYYY (giorno-mese-anno). Non confondere il giorno con l'anno! Ad esempio, se leggi '20-01-26' o '20-01-2026', la data corretta è il 20 gennaio 2026, quindi dovrai restituire '2026-01-20', non scambiando i valori in modo scorretto.
+    - Se hai Totale e Litri ma manca il Prezzo/L, calcolalo (Totale / Litri).
+    - Ignora punti fedeltà o altri prodotti non carburante se possibile.
+    - Restituisci SOLO il JSON, nessun markdown.
+    """
+
+    response = openai_client.chat.completions.create(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "Estrai i dati da questo scontrino."},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/jpeg;base64,{base64_image}"
+                        },
+                    },
+                ],
+            },
+        ],
+        temperature=0.0, # Determinismo massimo
+        response_format={ "type": "json_object" }, # Forza output JSON
+        timeout=timeout, # Tempo residuo della deadline complessiva
+    )
+
+    content = response.choices[0].message.content
+    # Strip eventuali backtick markdown in caso di formato errato
+    content = content.replace("```json", "").replace("```", "").strip()
+    
+    data_dict = json.loads(content)
+    return _map_json_to_model(data_dict)
+
 def _encode_image_to_base64(file_buffer) -> str:
     """Legge il buffer e lo converte in stringa base64 utf-8."""
     file_buffer.seek(0)
@@ -0,0 +1,109 @@
+"""
+src/services/ocr/engines.py — Registro dei motori OCR e ordine di fallback
+
+Espone:
+  - OcrEngine (da base.py)            → interfaccia: name, is_available(), analyze(buffer)
+  - OpenAIEngine                      → adattatore di engine.analyze_receipt (GPT-4o)
+  - register_engine(engine)           → aggiunge/sostituisce un motore nel registro
+  - available_engines(order)          → nomi dei motori utilizzabili, nell'ordine dato
+  - is_ocr_available()                → almeno un motore pronto (per la UI)
+  - analyze_with_engines(buffer)      → (ReceiptData, nome motore) col primo esito valido
+
+Ordine di fallback in [ocr] engines di config.toml: i motori non disponibili
+(chiave mancante, Tesseract non installato) vengono saltati; se un motore non
+trova il totale si passa al successivo. Se nessuno riesce viene restituito
+l'errore del primo motore tentato, il più informativo per l'utente.
+"""
+from __future__ import annotations
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from src.config import cfg
+from src.demo import is_demo_mode, mock_analyze_receipt
+from . import engine as openai_engine
+from .base import OcrEngine
+from .local_engine import TesseractEngine
+from .models import ReceiptData
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ORDER = ("openai", "tesseract")
+
+NO_ENGINE_MESSAGE = (
+    "ERRORE: nessun motore OCR disponibile. API Key OpenAI mancante in "
+    ".streamlit/secrets.toml e Tesseract non installato."
+)
+
+
+class OpenAIEngine(OcrEngine):
+    """GPT-4o Vision (engine.py). Risolto a ogni chiamata: i test possono sostituire il client."""
+
+    name = "openai"
+
+    def is_available(self) -> bool:
+        return openai_engine.is_openai_enabled()
+
+    def analyze(self, file_buffer) -> ReceiptData:
+        return openai_engine.analyze_receipt(file_buffer)
+
+
+_ENGINES: Dict[str, OcrEngine] = {
+    "openai": OpenAIEngine(),
+    "tesseract": TesseractEngine(),
+}
+
+
+def register_engine(engine: OcrEngine) -> None:
+    """Aggiunge (o sostituisce, a parità di nome) un motore selezionabile in [ocr] engines."""
+    _ENGINES[engine.name] = engine
+
+
+def get_engine(name: str) -> Optional[OcrEngine]:
+    return _ENGINES.get(name)
+
+
+def _configured_order(order: Optional[Sequence[str]]) -> List[str]:
+    return list(order if order is not None else cfg("ocr.engines", list(DEFAULT_ORDER)))
+
+
+def available_engines(order: Optional[Sequence[str]] = None) -> List[str]:
+    names = []
+    for name in _configured_order(order):
+        engine = _ENGINES.get(name)
+        if engine is None:
+            logger.warning("OCR: motore '%s' in [ocr] engines non registrato", name)
+        elif engine.is_available():
+            names.append(name)
+    return names
+
+
+def is_ocr_available() -> bool:
+    """True se almeno un motore dell'ordine configurato è pronto."""
+    return bool(available_engines())
+
+
+def analyze_with_engines(
+    file_buffer, order: Optional[Sequence[str]] = None
+) -> Tuple[ReceiptData, Optional[str]]:
+    """
+    Prova i motori nell'ordine configurato fino al primo che trova il totale.
+
+    Returns:
+        (ReceiptData, nome del motore che l'ha prodotto; None se nessuno disponibile)
+    """
+    # Demo Mode: risposta simulata, nessun motore reale
+    if is_demo_mode():
+        return mock_analyze_receipt(), None
+
+    first_failure: Optional[Tuple[ReceiptData, str]] = None
+    for name in available_engines(order):
+        result = _ENGINES[name].analyze(file_buffer)
+        if result.total_cost > 0:
+            return result, name
+        logger.info("OCR: il motore '%s' non ha estratto il totale (%s)", name, result.raw_text)
+        first_failure = first_failure or (result, name)
+
+    if first_failure:
+        return first_failure
+    return ReceiptData(raw_text=NO_ENGINE_MESSAGE), None
@@ -0,0 +1,207 @@
+"""
+src/services/ocr/local_engine.py — Motore OCR locale (Tesseract + OpenCV)
+
+Espone:
+  - TesseractEngine              → motore offline, nessun costo e nessuna rete
+  - parse_receipt_text(text)     → estrazione regex dal testo grezzo → ReceiptData
+
+Pipeline:
+  1. Decodifica in scala di grigi, ingrandimento delle foto piccole (Tesseract
+     lavora meglio con caratteri alti ~30 px), riduzione rumore e soglia di Otsu
+  2. pytesseract.image_to_string con lingua e page segmentation di [ocr.tesseract]
+  3. Post-processing regex: totale, prezzo/L, litri, data (DD-MM-YY[YY]) e
+     distributore (marchi noti, altrimenti la prima riga di intestazione)
+
+cv2 e pytesseract sono importati al primo utilizzo: la loro assenza (o quella del
+binario tesseract) rende il motore "non disponibile", senza errori all'avvio.
+"""
+from __future__ import annotations
+
+import importlib.util
+import logging
+import re
+import shutil
+from datetime import date
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+from src.config import cfg
+from .base import OcrEngine
+from .models import ReceiptData
+
+logger = logging.getLogger(__name__)
+
+# Altezza minima (px) sotto cui l'immagine viene ingrandita prima dell'OCR
+_MIN_OCR_HEIGHT = 1400
+
+# Intervallo plausibile del prezzo al litro (€/L): filtra importi e quantità
+_PRICE_RANGE = (0.5, 4.0)
+
+# Marchi dei distributori italiani (regex → nome mostrato)
+_STATIONS = (
+    (r"\bENI\b|\bAGIP\b|ENILIVE", "Eni"),
+    (r"\bQ8\b|KUWAIT", "Q8"),
+    (r"TAMOIL", "Tamoil"),
+    (r"\bESSO\b", "Esso"),
+    (r"\bSHELL\b", "Shell"),
+    (r"TOTALERG|\bERG\b", "TotalErg"),
+    (r"\bIP\b|ITALIANA\s+PETROLI|\bAPI\b", "IP"),
+    (r"REPSOL", "Repsol"),
+    (r"BEYFIN", "Beyfin"),
+    (r"EG\s+ITALIA", "EG"),
+)
+
+_NUM = r"(\d{1,4}[.,]\d{2,3})"
+_TOTAL_RE = re.compile(r"(?:TOTALE|IMPORTO(?:\s+PAGATO)?|TOT\.)\s*(?:COMPLESSIVO\s*)?(?:EURO|EUR|€)?\s*[:=]?\s*" + _NUM)
+_PRICE_LABEL_RE = re.compile(r"(?:PREZZO(?:\s+UNIT(?:ARIO|\.)?)?|P\.\s*UNIT\.?)\s*(?:EURO|EUR|€)?\s*(?:/\s*L[TI]?)?\s*[:=]?\s*" + _NUM)
+_PRICE_UNIT_RE = re.compile(r"(\d[.,]\d{3})\s*(?:EURO|EUR|€)?\s*/\s*L")
+_LITERS_LABEL_RE = re.compile(r"(?:LITRI|QUANTIT[AÀ]'?|QT[AÀ]'?)\s*[:=]?\s*" + _NUM)
+_LITERS_UNIT_RE = re.compile(_NUM + r"\s*(?:L|LT|LITRI)\b(?!\s*/)")
+_DATE_RE = re.compile(r"\b(\d{1,2})[/\-.](\d{1,2})[/\-.](\d{4}|\d{2})\b")
+
+
+# =============================================================================
+# MOTORE
+# =============================================================================
+
+class TesseractEngine(OcrEngine):
+    """Motore OCR locale: OpenCV per la binarizzazione, Tesseract per il testo."""
+
+    name = "tesseract"
+
+    def is_available(self) -> bool:
+        return _tesseract_available()
+
+    def analyze(self, file_buffer) -> ReceiptData:
+        try:
+            import cv2
+            import numpy as np
+            import pytesseract
+        except ImportError:
+            return ReceiptData(raw_text="ERRORE OCR LOCALE: pytesseract/opencv non installati.")
+
+        file_buffer.seek(0)
+        image = cv2.imdecode(np.frombuffer(file_buffer.read(), np.uint8), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            return ReceiptData(raw_text="ERRORE OCR LOCALE: immagine non leggibile.")
+
+        cmd = cfg("ocr.tesseract.cmd", "")
+        if cmd:
+            pytesseract.pytesseract.tesseract_cmd = cmd
+        options = f"--oem 1 --psm {int(cfg('ocr.tesseract.psm', 6))}"
+
+        try:
+            text = pytesseract.image_to_string(
+                _binarize(image, cv2),
+                lang=cfg("ocr.tesseract.lang", "ita"),
+                config=options,
+                timeout=float(cfg("ocr.tesseract.timeout_seconds", 10)),
+            )
+        except RuntimeError as e:
+            # pytesseract segnala il timeout con RuntimeError
+            return ReceiptData(raw_text=f"ERRORE OCR LOCALE: Tesseract non ha risposto in tempo ({e}).")
+        except Exception as e:
+            return ReceiptData(raw_text=f"ERRORE OCR LOCALE: {e}")
+
+        return parse_receipt_text(text)
+
+
+@lru_cache(maxsize=1)
+def _tesseract_available() -> bool:
+    """Moduli Python e binario tesseract presenti (verificato una volta per processo)."""
+    if importlib.util.find_spec("cv2") is None or importlib.util.find_spec("pytesseract") is None:
+        return False
+    return shutil.which(cfg("ocr.tesseract.cmd", "") or "tesseract") is not None
+
+
+def _binarize(image, cv2):
+    """Scala di grigi → ingrandimento se piccola → denoise → soglia di Otsu."""
+    height = image.shape[0]
+    if height < _MIN_OCR_HEIGHT:
+        scale = _MIN_OCR_HEIGHT / height
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    image = cv2.GaussianBlur(image, (3, 3), 0)
+    _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+# =============================================================================
+# POST-PROCESSING REGEX
+# =============================================================================
+
+def parse_receipt_text(text: str) -> ReceiptData:
+    """
+    Estrae i campi dal testo OCR di uno scontrino carburante.
+    Con due valori tra totale, prezzo/L e litri il terzo viene ricavato.
+    """
+    rd = ReceiptData()
+    upper = (text or "").upper()
+
+    rd.total_cost = _first_number(_TOTAL_RE.finditer(upper)) or 0.0
+    rd.price_per_liter = _price(upper) or 0.0
+    rd.liters = _first_number(_LITERS_LABEL_RE.finditer(upper)) or _first_number(_LITERS_UNIT_RE.finditer(upper)) or 0.0
+    rd.date = _date(upper)
+    rd.station_name = _station(text or "")
+
+    # Valori derivati (stessa logica del mapping GPT-4o)
+    if rd.total_cost > 0 and rd.price_per_liter > 0:
+        rd.liters = round(rd.total_cost / rd.price_per_liter, 2)
+    elif rd.total_cost <= 0 and rd.price_per_liter > 0 and rd.liters > 0:
+        rd.total_cost = round(rd.price_per_liter * rd.liters, 2)
+    elif rd.price_per_liter <= 0 and rd.total_cost > 0 and rd.liters > 0:
+        rd.price_per_liter = round(rd.total_cost / rd.liters, 3)
+
+    rd.raw_text = ("Analisi Tesseract Completata" if rd.total_cost > 0
+                   else "ERRORE OCR LOCALE: totale non trovato nello scontrino.")
+    return rd
+
+
+def _to_float(value: str) -> Optional[float]:
+    try:
+        return float(value.replace(",", "."))
+    except ValueError:
+        return None
+
+
+def _first_number(matches: Iterable[re.Match]) -> Optional[float]:
+    for m in matches:
+        value = _to_float(m.group(1))
+        if value:
+            return value
+    return None
+
+
+def _price(upper: str) -> Optional[float]:
+    """Prezzo/L: etichetta o unità €/L, altrimenti il primo X.XXX plausibile."""
+    for regex in (_PRICE_LABEL_RE, _PRICE_UNIT_RE):
+        for m in regex.finditer(upper):
+            value = _to_float(m.group(1))
+            if value and _PRICE_RANGE[0] <= value <= _PRICE_RANGE[1]:
+                return value
+    candidates: List[float] = [v for v in map(_to_float, re.findall(r"\b\d[.,]\d{3}\b", upper))
+                               if v and _PRICE_RANGE[0] <= v <= _PRICE_RANGE[1]]
+    return candidates[0] if candidates else None
+
+
+def _date(upper: str) -> Optional[date]:
+    """Prima data valida in formato italiano (giorno-mese-anno)."""
+    for day, month, year in _DATE_RE.findall(upper):
+        year_n = int(year) + (2000 if len(year) == 2 else 0)
+        try:
+            return date(year_n, int(month), int(day))
+        except ValueError:
+            continue
+    return None
+
+
+def _station(text: str) -> Optional[str]:
+    """Marchio noto nelle prime righe, altrimenti la prima riga alfabetica dell'intestazione."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    header = "\n".join(lines[:8]).upper()
+    for pattern, name in _STATIONS:
+        if re.search(pattern, header):
+            return name
+    for line in lines[:3]:
+        if sum(c.isalpha() for c in line) >= 3:
+            return line.title()
+    return None
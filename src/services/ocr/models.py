@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import date
 from typing import Optional
 
@@ -13,4 +13,6 @@ class ReceiptData:
     price_per_liter: float = 0.0
     liters: float = 0.0
     station_name: Optional[str] = None
-    raw_text: str = ""  # Utile per debugging
\ No newline at end of file
+    raw_text: str = ""  # Utile per debugging
+    # Metriche della scansione (byte originali/inviati/risparmiati, latenze in ms)
+    scan_stats: dict = field(default_factory=dict)
@@ -1,14 +1,56 @@
+import logging
+import time
+from io import BytesIO
+
+from src.config import cfg
+from src.demo import is_demo_mode
 from .models import ReceiptData
-# Importiamo la funzione dal NUOVO engine
-from .engine import analyze_receipt 
+from .engines import analyze_with_engines
+from .preprocessing import prepare_receipt_image
+from .cache import get_ocr_cache
+
+logger = logging.getLogger(__name__)
 
 def process_receipt_image(uploaded_file) -> ReceiptData:
     """
     Entry point della pipeline OCR.
-    Usa OpenAI GPT-4o per l'estrazione.
+    Prepara la foto (rotazione, grigi, ritaglio, resize, JPEG) e la passa ai motori OCR
+    nell'ordine di [ocr] engines (GPT-4o, Tesseract locale) fino al primo esito valido.
+    Le letture riuscite sono cachate per immagine normalizzata ([ocr.cache]):
+    uno scontrino già scansionato non richiama il modello.
+    Le metriche della scansione sono in ReceiptData.scan_stats.
     """
     if not uploaded_file:
         return ReceiptData()
-    
-    # Delega diretta all'engine AI
-    return analyze_receipt(uploaded_file)
\ No newline at end of file
+
+    start = time.perf_counter()
+    uploaded_file.seek(0)
+    prepared = prepare_receipt_image(uploaded_file.read())
+
+    # In demo le letture sono simulate: non vanno nella cache persistente
+    cache = get_ocr_cache() if cfg("ocr.cache.enabled", True) and not is_demo_mode() else None
+    result, cache_tier = cache.lookup(prepared.data) if cache else (None, None)
+    engine_name = None
+
+    if result is None:
+        # Delega ai motori OCR con l'immagine ridotta
+        result, engine_name = analyze_with_engines(BytesIO(prepared.data))
+        # Solo letture valide: errori (chiave, rete, quota) vanno ritentati
+        if cache and result.total_cost > 0:
+            cache.store(prepared.data, result)
+
+    result.scan_stats = {
+        "original_bytes": prepared.original_bytes,
+        "sent_bytes": prepared.output_bytes,
+        "bytes_saved": prepared.bytes_saved,
+        "preprocess_ms": prepared.seconds * 1000,
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "cache": cache_tier,
+        "engine": engine_name,
+    }
+    logger.info(
+        "Scansione scontrino: %d → %d byte (-%d), preparazione %.0f ms, totale %.0f ms, cache %s, motore %s",
+        prepared.original_bytes, prepared.output_bytes, prepared.bytes_saved,
+        result.scan_stats["preprocess_ms"], result.scan_stats["total_ms"], cache_tier or "miss", engine_name,
+    )
+    return result
@@ -0,0 +1,158 @@
+"""
+src/services/ocr/preprocessing.py — Preparazione della foto scontrino prima dell'OCR
+
+Espone:
+  - prepare_receipt_image(raw)  → PreprocessResult (JPEG ridotto + metriche)
+
+Pipeline (Pillow):
+  1. Rotazione secondo il tag EXIF (le foto da smartphone sono spesso salvate ruotate)
+  2. Scala di grigi (il colore non serve all'estrazione del testo)
+  3. Ritaglio sul contenuto: scontrino chiaro su sfondo più scuro, individuato
+     con soglia di Otsu + proiezioni di riga/colonna
+  4. Ridimensionamento al lato massimo configurato
+  5. Ricompressione JPEG con qualità configurabile
+
+Parametri in [ocr.preprocess] di config.toml. Se il buffer non è un'immagine
+decodificabile i byte originali vengono inviati invariati.
+"""
+from __future__ import annotations
+
+import io
+import time
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from src.config import cfg
+
+# Frazione minima di pixel "carta" perché una riga/colonna appartenga allo scontrino
+_CONTENT_FILL = 0.25
+# Il ritaglio viene scartato se lascia meno di questa frazione dell'area (soglia sbagliata)
+_MIN_CROP_AREA = 0.15
+# Margine aggiunto attorno al ritaglio (frazione del lato)
+_CROP_MARGIN = 0.02
+# Lato della miniatura su cui si calcola il ritaglio
+_ANALYSIS_EDGE = 512
+
+
+@dataclass(frozen=True)
+class PreprocessResult:
+    """Immagine pronta per l'OCR e metriche della trasformazione."""
+    data: bytes
+    original_bytes: int
+    seconds: float
+    size: Optional[Tuple[int, int]] = None   # (larghezza, altezza) finale; None se non decodificata
+    applied: bool = False                    # False → inviati i byte originali
+
+    @property
+    def output_bytes(self) -> int:
+        return len(self.data)
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.original_bytes - self.output_bytes
+
+
+def prepare_receipt_image(
+    raw: bytes,
+    max_edge: Optional[int] = None,
+    quality: Optional[int] = None,
+    grayscale: Optional[bool] = None,
+    crop: Optional[bool] = None,
+) -> PreprocessResult:
+    """
+    Riduce la foto dello scontrino per l'upload. I parametri None usano [ocr.preprocess].
+
+    Returns:
+        PreprocessResult: JPEG elaborato, oppure i byte originali se la preparazione
+        è disattivata, l'input non è un'immagine o il risultato non sarebbe più piccolo.
+    """
+    start = time.perf_counter()
+    if not cfg("ocr.preprocess.enabled", True):
+        return PreprocessResult(raw, len(raw), time.perf_counter() - start)
+
+    max_edge = int(max_edge or cfg("ocr.preprocess.max_edge", 1600))
+    quality = int(quality or cfg("ocr.preprocess.jpeg_quality", 80))
+    grayscale = cfg("ocr.preprocess.grayscale", True) if grayscale is None else grayscale
+    crop = cfg("ocr.preprocess.crop", True) if crop is None else crop
+
+    try:
+        with Image.open(io.BytesIO(raw)) as src:
+            rotated = _exif_orientation(src) not in (None, 1)
+            img = ImageOps.exif_transpose(src)
+            img.load()
+    except Exception:
+        return PreprocessResult(raw, len(raw), time.perf_counter() - start)
+
+    img = img.convert("L") if grayscale else img.convert("RGB")
+    if crop:
+        img = _crop_to_content(img)
+    if max(img.size) > max_edge:
+        img.thumbnail((max_edge, max_edge), Image.LANCZOS)
+
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, optimize=True)
+    data = out.getvalue()
+
+    # Già piccola e dritta: la ricompressione non porterebbe vantaggi
+    if len(data) >= len(raw) and not rotated:
+        return PreprocessResult(raw, len(raw), time.perf_counter() - start, img.size)
+    return PreprocessResult(data, len(raw), time.perf_counter() - start, img.size, applied=True)
+
+
+# =============================================================================
+# HELPER
+# =============================================================================
+
+def _exif_orientation(img: Image.Image) -> Optional[int]:
+    try:
+        return img.getexif().get(0x0112)
+    except Exception:
+        return None
+
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    """Soglia di Otsu sull'istogramma a 256 livelli."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    total = gray.size
+    weight_bg = np.cumsum(hist)
+    weight_fg = total - weight_bg
+    cum_mean = np.cumsum(hist * np.arange(256))
+    mean_bg = cum_mean / np.maximum(weight_bg, 1)
+    mean_fg = (cum_mean[-1] - cum_mean) / np.maximum(weight_fg, 1)
+    between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between))
+
+
+def _content_span(fill: np.ndarray) -> Optional[Tuple[int, int]]:
+    idx = np.flatnonzero(fill >= _CONTENT_FILL)
+    return (int(idx[0]), int(idx[-1]) + 1) if idx.size else None
+
+
+def _crop_to_content(img: Image.Image) -> Image.Image:
+    """Ritaglia sulla regione chiara (carta) calcolata su una miniatura; invariata se incerta."""
+    thumb = img.convert("L")
+    thumb.thumbnail((_ANALYSIS_EDGE, _ANALYSIS_EDGE))
+    gray = np.asarray(thumb, dtype=np.uint8)
+    paper = gray > _otsu_threshold(gray)
+
+    rows, cols = _content_span(paper.mean(axis=1)), _content_span(paper.mean(axis=0))
+    if rows is None or cols is None:
+        return img
+
+    h, w = gray.shape
+    top, bottom = rows
+    left, right = cols
+    if (bottom - top) * (right - left) < _MIN_CROP_AREA * h * w:
+        return img
+
+    # Da coordinate miniatura a coordinate originali, con margine
+    sx, sy = img.width / w, img.height / h
+    mx, my = _CROP_MARGIN * img.width, _CROP_MARGIN * img.height
+    box = (
+        max(0, int(left * sx - mx)), max(0, int(top * sy - my)),
+        min(img.width, int(right * sx + mx)), min(img.height, int(bottom * sy + my)),
+    )
+    return img.crop(box) if box != (0, 0, img.width, img.height) else img
@@ -0,0 +1,219 @@
+"""
+src/services/ocr/resilience.py — Retry con backoff, deadline e circuit breaker
+
+Espone:
+  - CircuitBreaker                → closed → open (dopo N errori) → half-open (1 prova) → closed
+  - ResiliencePolicy.call(func)   → esegue func(timeout) con retry tenacity e breaker
+  - CircuitOpenError              → sollevata senza chiamare l'upstream finché il breaker è aperto
+  - policy_from_config(name, ...) → policy con i parametri di [ocr.resilience]
+
+Strategia:
+  Solo gli errori transitori (decisi dal chiamante: rate limit, rete, 5xx) vengono
+  ritentati, con backoff esponenziale e jitter completo per non sincronizzare i
+  client. Ogni chiamata ha una deadline complessiva: nessun tentativo parte se il
+  backoff la supererebbe, e func riceve il tempo residuo da usare come timeout.
+  Una chiamata che esaurisce i tentativi su errori transitori conta come fallimento
+  del breaker; raggiunta la soglia l'upstream non viene più chiamato per
+  'breaker_reset_seconds' e la pipeline passa subito al motore successivo.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+from tenacity import (
+    RetryCallState, Retrying, retry_if_exception, stop_after_attempt, stop_any,
+    stop_before_delay, wait_random_exponential,
+)
+
+from src.config import cfg
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Upstream escluso dal circuit breaker: retry_in secondi alla prossima prova."""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name}: circuito aperto, nuova prova tra {retry_in:.0f} s")
+        self.retry_in = retry_in
+
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitBreaker:
+    """Breaker a conteggio di fallimenti consecutivi, thread-safe."""
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_running = False
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._state = HALF_OPEN
+            self._trial_running = False
+        return self._state
+
+    def retry_in(self) -> float:
+        with self._lock:
+            return max(0.0, self.reset_seconds - (self._clock() - self._opened_at))
+
+    def allow(self) -> bool:
+        """True se la chiamata può partire. In half-open passa una sola chiamata di prova."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state, self._failures, self._trial_running = CLOSED, 0, False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    self.times_opened += 1
+                self._state, self._opened_at, self._trial_running = OPEN, self._clock(), False
+
+    def release_trial(self) -> None:
+        """Prova in half-open conclusa senza esito sull'upstream (es. errore non transitorio)."""
+        with self._lock:
+            self._trial_running = False
+
+    @property
+    def consecutive_failures(self) -> int:
+        return self._failures
+
+
+# =============================================================================
+# POLICY
+# =============================================================================
+
+class ResiliencePolicy:
+    """Retry (tenacity) + deadline + circuit breaker + contatori per un upstream."""
+
+    def __init__(
+        self,
+        name: str,
+        is_transient: Callable[[BaseException], bool],
+        max_attempts: int = 3,
+        deadline_seconds: float = 30.0,
+        backoff_base_seconds: float = 0.5,
+        backoff_max_seconds: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.name = name
+        self.is_transient = is_transient
+        self.max_attempts = max(1, max_attempts)
+        self.deadline_seconds = deadline_seconds
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.breaker = breaker or CircuitBreaker()
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "attempts": 0, "retries": 0, "successes": 0,
+                          "failures": 0, "short_circuits": 0}
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[key] += n
+
+    def call(self, func: Callable[[float], T]) -> T:
+        """
+        Esegue func(timeout_residuo) con retry sugli errori transitori.
+
+        Raises:
+            CircuitOpenError: breaker aperto, upstream non chiamato.
+            L'ultima eccezione di func se i tentativi o la deadline si esauriscono.
+        """
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("short_circuits")
+            raise CircuitOpenError(self.name, self.breaker.retry_in())
+
+        start = time.monotonic()
+
+        def _attempt() -> T:
+            self._count("attempts")
+            remaining = self.deadline_seconds - (time.monotonic() - start)
+            return func(max(1.0, remaining))
+
+        def _before_sleep(state: RetryCallState) -> None:
+            self._count("retries")
+            logger.warning("%s: tentativo %d fallito (%s), nuovo tentativo tra %.1f s",
+                           self.name, state.attempt_number, state.outcome.exception(),
+                           state.next_action.sleep if state.next_action else 0)
+
+        retrying = Retrying(
+            stop=stop_any(stop_after_attempt(self.max_attempts), stop_before_delay(self.deadline_seconds)),
+            wait=wait_random_exponential(multiplier=self.backoff_base_seconds, max=self.backoff_max_seconds),
+            retry=retry_if_exception(self.is_transient),
+            before_sleep=_before_sleep,
+            sleep=self._sleep,
+            reraise=True,
+        )
+        try:
+            result = retrying(_attempt)
+        except Exception as e:
+            self._count("failures")
+            if self.is_transient(e):
+                self.breaker.record_failure()
+            else:
+                # Errore dell'input o della configurazione: l'upstream ha risposto
+                self.breaker.release_trial()
+            raise
+        self._count("successes")
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> dict:
+        """Contatori cumulativi e stato corrente del breaker."""
+        with self._lock:
+            counters = dict(self._counters)
+        return {**counters, "breaker_state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "breaker_opened": self.breaker.times_opened}
+
+
+def policy_from_config(name: str, is_transient: Callable[[BaseException], bool]) -> ResiliencePolicy:
+    """Policy con i parametri di [ocr.resilience] di config.toml."""
+    return ResiliencePolicy(
+        name,
+        is_transient,
+        max_attempts=int(cfg("ocr.resilience.max_attempts", 3)),
+        deadline_seconds=float(cfg("ocr.resilience.deadline_seconds", 30)),
+        backoff_base_seconds=float(cfg("ocr.resilience.backoff_base_seconds", 0.5)),
+        backoff_max_seconds=float(cfg("ocr.resilience.backoff_max_seconds", 8)),
+        breaker=CircuitBreaker(
+            failure_threshold=int(cfg("ocr.resilience.breaker_failures", 5)),
+            reset_seconds=float(cfg("ocr.resilience.breaker_reset_seconds", 60)),
+        ),
+    )
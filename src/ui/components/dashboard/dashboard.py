@@ -1,9 +1,11 @@
 import streamlit as st
 import streamlit.components.v1 as components
+import numpy as np
 import pandas as pd
-from src.database.core import get_db
-from src.database import crud
-from src.services.business.calculations import calculate_stats, check_partial_accumulation
+from src.database.core import db_session
+from src.database import async_crud, crud
+from src.services.business.calculations import check_partial_accumulation
+from src.services.business.columnar import RefuelingColumns, full_to_full_kml
 from src.services.business.analysis import filter_data_by_date
 from src.services.business import gamification
 from src.ui.components.dashboard import kpi, charts
@@ -19,22 +21,15 @@ def render():
     # 2. Recupero Dati Essenziali
     user = st.session_state["user"]
     
+    # Riepilogo utente (una query, condivisa con sidebar e impostazioni tramite cache):
+    # km, scadenze e promemoria per avvisi e health score
+    with db_session() as db:
+        overview = crud.get_user_snapshot(db, user.id)
+
     # --- STARTUP CHECK (Pop-up automatico one-shot) ---
-    startup_alerts.check_and_show_alerts(user.id)
-    
-    db = next(get_db())
-    records = crud.get_all_refuelings(db, user.id)
-    settings = crud.get_settings(db, user.id)
-    
-    # Recupero ultimo KM noto per calcoli salute
-    last_km = max(r.total_km for r in records) if records else 0
-    
-    # --- CALCOLO HEALTH SCORE ---
-    health_score, health_issues = gamification.calculate_car_health_score(db, user.id, last_km)
-    
-    db.close()
+    startup_alerts.check_and_show_alerts(user.id, overview)
 
-    if not records:
+    if not overview.refuelings_count:
         st.markdown("""
         <div style="
             background: linear-gradient(135deg, rgba(99,110,250,0.12), rgba(0,204,150,0.08));
@@ -58,33 +53,34 @@ def render():
         """, unsafe_allow_html=True)
         return
 
+    # Storico e impostazioni in parallelo (async), cachati per versione dei dati
+    snapshot = async_crud.load_dashboard_snapshot(user.id)
+    records = snapshot.refuelings
+    settings = snapshot.settings
+
+    # --- CALCOLO HEALTH SCORE (scadenze, promemoria e ultimo KM dal riepilogo) ---
+    health_score, health_issues = gamification.score_car_health(
+        overview.next_deadlines, overview.active_reminders, overview.max_km)
 
     # 2. Preparazione DataFrame Base (Rifornimenti)
-    records_asc = sorted(records, key=lambda x: x.date)
-    chart_data = []
-    
+    # Costruito direttamente dalle colonne NumPy (ordine cronologico), senza loop sugli oggetti ORM
+    cols = RefuelingColumns.from_records(records)
+    efficiency = full_to_full_kml(cols)
+
+    df = pd.DataFrame({
+        "Data": pd.to_datetime(cols.dates),
+        "Prezzo": cols.price,
+        "Costo": cols.total_cost,
+        "Litri": cols.liters,
+        "Efficienza": efficiency
+    })
+
     # Calcolo medie (necessarie ora per il Tab Funzionalità)
-    valid_efficiency_values = []
-    
-    for r in records_asc:
-        stats = calculate_stats(r, records)
-        eff = stats["km_per_liter"]
-        
-        if eff:
-            valid_efficiency_values.append(eff)
-            
-        chart_data.append({
-            "Data": pd.to_datetime(r.date),
-            "Prezzo": r.price_per_liter,
-            "Costo": r.total_cost,
-            "Litri": r.liters,
-            "Efficienza": eff
-        })
-    df = pd.DataFrame(chart_data)
+    valid_efficiency_values = efficiency[~np.isnan(efficiency) & (efficiency != 0)]
 
     # Dati per Calcolatori e KPI
     last_record = df.iloc[-1]
-    avg_kml = sum(valid_efficiency_values) / len(valid_efficiency_values) if valid_efficiency_values else 0
+    avg_kml = float(valid_efficiency_values.mean()) if len(valid_efficiency_values) else 0
     last_price = last_record['Prezzo']
 
     # 3. Header e Info (Con TAB)
@@ -1,14 +1,20 @@
 import streamlit as st
 import pandas as pd
 from datetime import date
-from src.database.core import get_db
+from sqlalchemy.exc import IntegrityError
+from src.database.core import db_session
 from src.database import crud
 from src.ui.components.fuel import grids, kpi, forms
 from src.services.business import fuel_logic
 from src.services.ocr import process_receipt_image
-from src.services.ocr.engine import is_openai_enabled
+from src.services.ocr.engines import is_ocr_available
+from src.services.ocr import batch as ocr_batch
+from src.config import cfg
 from src.demo import is_demo_mode
 
+# Vincolo unique (utente, data, km) violato da un inserimento o da una modifica
+_DUPLICATE_MSG = "⚠️ Esiste già un rifornimento con questa data e questi km."
+
 @st.fragment
 def render():
     """Vista Principale: Gestione Rifornimenti (Refactored)."""
@@ -23,9 +29,16 @@ def render():
     if "selected_record_id" not in st.session_state:
         st.session_state.selected_record_id = None
 
-    db = next(get_db())
+    # Sessione del run: chiusa (connessione restituita al pool) anche su rerun/eccezioni
+    with db_session() as db:
+        _render_page(db, user)
+
+
+def _render_page(db, user):
+    """Corpo della vista Rifornimenti, sulla sessione del run corrente."""
     all_records = crud.get_all_refuelings(db, user.id)
-    last_record = crud.get_last_refueling(db, user.id)
+    # Ultimo rifornimento dal riepilogo utente (stessa voce di cache della sidebar)
+    last_record = crud.get_user_snapshot(db, user.id).last_refueling
     settings = crud.get_settings(db, user.id)
     
     # Setup Defaults
@@ -65,14 +78,17 @@ def render():
             st.button("🚀 SCANSIONA SCONTRINO CON AI (Demo)", disabled=True, width='stretch',
                       help="Funzionalità non disponibile in modalità Demo.")
             st.warning("🔒 Modalità Demo: Modifiche disabilitate per sicurezza.")
-        elif is_openai_enabled():
+        elif is_ocr_available():
             # CASO POSITIVO: Mostra il bottone normale
             if st.button("🚀 SCANSIONA SCONTRINO CON AI", type="primary", width='stretch'):
                 _open_ocr_dialog()
+            # Arretrati: più scontrini insieme, revisionati poi dall'importazione
+            if st.button("📚 Scansiona più scontrini", width='stretch'):
+                _open_ocr_batch_dialog(user.id)
         else:
             # CASO NEGATIVO: Mostra bottone disabilitato o avviso
-            st.button("🚀 SCANSIONA SCONTRINO (Non disponibile)", disabled=True, width='stretch', help="Funzionalità disabilitata: API Key OpenAI mancante.")
-            st.caption("⚠️ Configura la chiave OpenAI nei settings per abilitare l'AI.")
+            st.button("🚀 SCANSIONA SCONTRINO (Non disponibile)", disabled=True, width='stretch', help="Funzionalità disabilitata: API Key OpenAI mancante e Tesseract non installato.")
+            st.caption("⚠️ Configura la chiave OpenAI nei settings oppure installa Tesseract per abilitare la scansione.")
 
 
         # === B. CALCOLO DEFAULTS ===
@@ -118,7 +134,11 @@ def render():
                             st.session_state.ocr_draft = {}
                             
                             st.rerun()
+                        except IntegrityError:
+                            db.rollback()  # La sessione del run resta utilizzabile
+                            st.error(_DUPLICATE_MSG)
                         except Exception as e:
+                            db.rollback()
                             st.error(f"Errore DB: {e}")
 
     st.write("") 
@@ -133,8 +153,6 @@ def render():
     # TAB B: Modifica/Elimina
     with tab_manage:
         _render_management_tab(db, user, all_records, years, def_idx, settings)
-    
-    db.close()
 
 # --- Helper Functions Locali (per pulizia render principale) ---
 
@@ -192,6 +210,52 @@ def _open_ocr_dialog():
                     _show_ocr_error(data.raw_text)
 
 
+@st.dialog("📚 Scansione Multipla Scontrini")
+def _open_ocr_batch_dialog(user_id: str):
+    """
+    Scansione in blocco: le immagini sono analizzate in parallelo (con limite di ritmo)
+    e ogni esito è salvato subito nello staging. La revisione (km inclusi) e il
+    salvataggio avvengono in Impostazioni → Importazione Dati.
+    """
+    max_files = int(cfg("ocr.batch.max_files", 50))
+    st.caption(f"Carica fino a {max_files} foto di scontrini: verranno lette in parallelo.")
+
+    files = st.file_uploader(
+        "Foto degli scontrini",
+        type=['png', 'jpg', 'jpeg'],
+        accept_multiple_files=True,
+        key="ocr_batch_upl",
+        label_visibility="collapsed",
+    )
+    if not files:
+        return
+    if len(files) > max_files:
+        st.warning(f"Selezionati {len(files)} file: verranno analizzati solo i primi {max_files}.")
+        files = files[:max_files]
+
+    if st.button(f"✨ Analizza {len(files)} scontrini", type="primary", width='stretch'):
+        # Byte letti nel thread UI: gli oggetti UploadedFile non vanno condivisi col pool
+        uploads = [ocr_batch.ReceiptUpload(f.name, f.getvalue()) for f in files]
+        prog_bar = st.progress(0)
+        status_text = st.empty()
+        failed = []
+
+        def _on_result(result, done, total):
+            prog_bar.progress(done / total)
+            status_text.caption(f"Analizzati {done}/{total} · ultimo: {result.upload.name}")
+            if not result.ok:
+                failed.append(result.upload.name)
+
+        with db_session() as db:
+            ocr_batch.scan_and_stage(db, user_id, uploads, on_result=_on_result)
+
+        n_ok = len(uploads) - len(failed)
+        st.success(f"✅ {n_ok} scontrini letti e pronti per la revisione.")
+        if failed:
+            st.warning(f"⚠️ Non letti ({len(failed)}): {', '.join(failed)}")
+        st.info("Completa i **km** e conferma in **Impostazioni → Importazione Dati**.")
+
+
 def _show_ocr_error(raw_text: str):
     """
     Interpreta il raw_text del backend OCR e mostra un messaggio d'errore
@@ -351,7 +415,12 @@ def _handle_edit_flow(db, user_id, rec, settings):
                 "liters": new_liters, "is_full_tank": edit_data['full'], "notes": edit_data['notes']
             }
             
-            crud.update_refueling(db, user_id, rec.id, changes)
+            try:
+                crud.update_refueling(db, user_id, rec.id, changes)
+            except IntegrityError:
+                db.rollback()
+                st.error(_DUPLICATE_MSG)
+                return
             st.success("Record aggiornato!")
             st.session_state.active_operation = None
             st.rerun()
@@ -1,5 +1,5 @@
 import pandas as pd
-from src.services.business.calculations import calculate_stats
+from src.services.business.calculations import calculate_all_stats
 
 # ==========================================
 # SEZIONE: RIFORNIMENTI (Fuel Grid)
@@ -10,15 +10,16 @@ def build_fuel_dataframe(records: list) -> pd.DataFrame:
     Costruisce il DataFrame per la visualizzazione dello storico rifornimenti.
     
     Logica applicata:
-    1. Calcolo metriche puntuali (Delta Km, Km/L) tramite service dedicato.
+    1. Calcolo metriche puntuali (Delta Km, Km/L) tramite service dedicato (passata unica).
     2. Formattazione visuale (es. aggiunta simboli, decimali).
     3. Mantenimento oggetto originale (_obj) per operazioni CRUD.
     """
     data_list = []
     
-    for r in records:
-        # Calcolo metriche avanzate (es. Full-to-Full)
-        stats = calculate_stats(r, records)
+    # Calcolo metriche avanzate (es. Full-to-Full) per tutti i record in una sola passata
+    all_stats = calculate_all_stats(records)
+
+    for r, stats in zip(records, all_stats):
         
         # Formattazione Dati
         kml_str = f"{stats['km_per_liter']:.2f}" if stats['km_per_liter'] else "-"
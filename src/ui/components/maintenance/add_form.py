@@ -1,7 +1,6 @@
 import streamlit as st
 from datetime import date
 from src.database import crud
-from src.database.core import get_db
 from src.ui.components.maintenance import dialogs, forms
 from src.config import DEFAULTS
 from src.demo import is_demo_mode
@@ -12,11 +11,9 @@ def render_add_form(db, user):
     with st.container(border=True):
         st.markdown("##### ✨ Nuovo Intervento")
         with st.form("new_maint_form", clear_on_submit=False): 
-            last_km = crud.get_max_km(db, user.id)
-            # Carica le categorie personalizzate dall'utente
-            _db_settings = next(get_db())
-            settings = crud.get_settings(_db_settings, user.id)
-            _db_settings.close()
+            last_km = crud.get_user_snapshot(db, user.id).max_km
+            # Carica le categorie personalizzate dall'utente (stessa sessione del run)
+            settings = crud.get_settings(db, user.id)
             maint_cats = settings.maintenance_types or DEFAULTS.SETTINGS.MAINTENANCE_TYPES
             data = forms.render_maintenance_inputs(date.today(), last_km, maint_cats[0], 0.0, "", cat_opts=maint_cats)
             
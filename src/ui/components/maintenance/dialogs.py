@@ -1,25 +1,34 @@
 import streamlit as st
 from datetime import date
+from sqlalchemy.exc import IntegrityError
 from src.database import crud
 from src.ui.components.maintenance import forms
 from src.demo import is_demo_mode
 
+# Vincolo unique (utente, data, km, tipo) violato: usato anche dal form di modifica in tabs.py
+DUPLICATE_MSG = "⚠️ Esiste già un intervento dello stesso tipo con questa data e questi km."
+
 def perform_save(db, user_id, data, clear_form=True):
     """Helper per il salvataggio fisico (Centralizzato)."""
-    crud.create_maintenance(
-        db, user_id,
-        data['date'],
-        data['km'],
-        data['type'],
-        data['cost'],
-        data['desc'],
-        expiry_km=data['expiry_km'],
-        expiry_date=data['expiry_date']
-    )
+    try:
+        crud.create_maintenance(
+            db, user_id,
+            data['date'],
+            data['km'],
+            data['type'],
+            data['cost'],
+            data['desc'],
+            expiry_km=data['expiry_km'],
+            expiry_date=data['expiry_date']
+        )
+    except IntegrityError:
+        # Vincolo unique (data, km, tipo): intervento già registrato
+        db.rollback()
+        st.error(DUPLICATE_MSG)
+        return
     st.success("✅ Salvato!")
     if clear_form:
         st.session_state.show_add_form = False
-    st.cache_data.clear()
     st.rerun()
 
 @st.dialog("✅ Registra Esecuzione")
@@ -28,7 +37,7 @@ def render_resolve_dialog(db, user, origin_record):
     st.write(f"Stai registrando l'esecuzione di: **{origin_record.expense_type}**")
     st.caption("Inserisci i dati dell'intervento effettuato oggi. La vecchia scadenza verrà archiviata.")
     
-    last_km = crud.get_max_km(db, user.id)
+    last_km = crud.get_user_snapshot(db, user.id).max_km
     
     with st.form("resolve_maint_form"):
         # TIPO (Disabilitato)
@@ -65,25 +74,29 @@ def render_resolve_dialog(db, user, origin_record):
                 return
 
             # ESECUZIONE
-            # A. Archiviazione Vecchia
-            crud.update_maintenance(db, user.id, origin_record.id, {"expiry_km": None, "expiry_date": None})
-            
-            # B. Creazione Nuova
+            # A. Creazione Nuova (prima: se è un duplicato la vecchia scadenza resta attiva)
             final_exp_km = new_exp_km if new_exp_km > 0 else None
             
-            crud.create_maintenance(
-                db, user.id,
-                m_date,
-                m_km,
-                origin_record.expense_type,
-                m_cost,
-                m_desc,
-                expiry_km=final_exp_km,
-                expiry_date=new_exp_date
-            )
+            try:
+                crud.create_maintenance(
+                    db, user.id,
+                    m_date,
+                    m_km,
+                    origin_record.expense_type,
+                    m_cost,
+                    m_desc,
+                    expiry_km=final_exp_km,
+                    expiry_date=new_exp_date
+                )
+            except IntegrityError:
+                db.rollback()
+                st.error(DUPLICATE_MSG)
+                return
+            
+            # B. Archiviazione Vecchia
+            crud.update_maintenance(db, user.id, origin_record.id, {"expiry_km": None, "expiry_date": None})
             
             st.success("Operazione completata!")
-            st.cache_data.clear()
             st.rerun()
 
 @st.dialog("❌ Rimuovi Scadenza")
@@ -96,7 +109,6 @@ def render_remove_deadline_dialog(db, user, origin_record):
     if col1.button("Sì, Rimuovi", type="primary", width='stretch', disabled=is_demo_mode()):
         crud.update_maintenance(db, user.id, origin_record.id, {"expiry_km": None, "expiry_date": None})
         st.success("Scadenza rimossa.")
-        st.cache_data.clear()
         st.rerun()
         
     if col2.button("Annulla", width='stretch'):
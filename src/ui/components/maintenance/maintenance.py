@@ -1,6 +1,6 @@
 import streamlit as st
 from datetime import date
-from src.database.core import get_db
+from src.database.core import db_session
 from src.database import crud
 from src.services.business import maintenance_logic
 from src.services.business.prediction import calculate_daily_usage_rate
@@ -15,7 +15,13 @@ def render():
     _init_session_state()
     user = st.session_state["user"]
 
-    db = next(get_db())
+    # Sessione del run: chiusa (connessione restituita al pool) anche su rerun/eccezioni
+    with db_session() as db:
+        _render_page(db, user)
+
+
+def _render_page(db, user):
+    """Corpo della vista Manutenzioni, sulla sessione del run corrente."""
     records = crud.get_all_maintenances(db, user.id)
     refuelings = crud.get_all_refuelings(db, user.id)
     
@@ -76,8 +82,6 @@ def render():
         )
         reminders_ui.render_tab(db, user, last_km)
 
-    db.close()
-
 def _init_session_state():
     if "show_add_form" not in st.session_state: st.session_state.show_add_form = False
     if "active_operation" not in st.session_state: st.session_state.active_operation = None
@@ -1,8 +1,9 @@
 import streamlit as st
+from sqlalchemy.exc import IntegrityError
 from src.services.business import maintenance_logic
 from src.ui.components.maintenance import grids, forms
+from src.ui.components.maintenance.dialogs import DUPLICATE_MSG
 from src.database import crud
-from src.database.core import get_db
 from src.config import DEFAULTS
 from datetime import date
 from src.demo import is_demo_mode
@@ -69,10 +70,8 @@ def render_management_tab(db, user, all_records):
 
 def _handle_edit(db, user_id, rec):
     st.markdown(f"**Modifica:** {rec.date.strftime('%d/%m/%Y')}")
-    # Carica le categorie personalizzate dell'utente
-    _db = next(get_db())
-    settings = crud.get_settings(_db, user_id)
-    _db.close()
+    # Carica le categorie personalizzate dell'utente (stessa sessione del run)
+    settings = crud.get_settings(db, user_id)
     maint_cats = settings.maintenance_types or DEFAULTS.SETTINGS.MAINTENANCE_TYPES
     with st.form("edit_maint_form"):
         d_edit = forms.render_maintenance_inputs(
@@ -96,10 +95,15 @@ def _handle_edit(db, user_id, rec):
                     "description": d_edit['desc'], "expiry_km": d_edit['expiry_km'],
                     "expiry_date": d_edit['expiry_date']
                 }
-                crud.update_maintenance(db, user_id, rec.id, changes)
+                try:
+                    crud.update_maintenance(db, user_id, rec.id, changes)
+                except IntegrityError:
+                    # Vincolo unique (data, km, tipo): la modifica sovrapporrebbe un altro intervento
+                    db.rollback()
+                    st.error(DUPLICATE_MSG)
+                    return
                 st.success("Aggiornato!")
                 st.session_state.active_operation = None
-                st.cache_data.clear()
                 st.rerun()
             
     if st.button("Annulla", width="stretch"):
@@ -112,7 +116,6 @@ def _handle_delete(db, user_id, rec_id, rec_type):
         crud.delete_maintenance(db, user_id, rec_id)
         st.success("Eliminato.")
         st.session_state.active_operation = None
-        st.cache_data.clear()
         st.rerun()
     if c2.button("No", width="stretch"):
         st.session_state.active_operation = None; st.rerun()
@@ -1,9 +1,7 @@
-import time
-
 import pandas as pd
 import streamlit as st
 
-from src.database.core import get_db
+from src.database.core import db_session
 from src.database import crud
 from src.services.data.importers import fuel, maintenance
 from src.demo import is_demo_mode
@@ -61,16 +59,15 @@ def render_staging_table(user_id: str, df: pd.DataFrame, error_msg: str, data_ty
     if data_type == 'fuel':
         cols_cfg = _get_fuel_config()
         validate_func = fuel.validate_fuel_logic
-        save_func = fuel.save_row
+        save_func = fuel.save_rows
     else:
         # Carica le categorie manutenzione personalizzate dell'utente
-        _db_cfg = next(get_db())
-        settings = crud.get_settings(_db_cfg, user_id)
-        _db_cfg.close()
+        with db_session() as db:
+            settings = crud.get_settings(db, user_id)
         maint_opts = settings.maintenance_types or DEFAULTS.SETTINGS.MAINTENANCE_TYPES
         cols_cfg = _get_maintenance_config(maint_opts)
         validate_func = maintenance.validate_maintenance_logic
-        save_func = maintenance.save_row
+        save_func = maintenance.save_rows
 
     # 4. Rendering Data Editor
     # Utilizziamo una key univoca per evitare conflitti di stato tra i tab
@@ -121,44 +118,36 @@ def _handle_revalidate(user_id, df, data_type, validate_func):
     Esegue la logica di validazione backend sul DataFrame modificato dalla UI.
     Aggiorna lo stato di sessione e forza un rerun.
     """
-    db = next(get_db())
-    try:
+    with db_session() as db:
         new_df = validate_func(db, user_id, df)
         
-        # Aggiornamento puntuale dello stato di sessione
-        if "import_results" in st.session_state:
-            res = st.session_state.import_results
-            res[data_type] = (new_df, None)
-            st.session_state.import_results = res
-        
-        st.rerun()
-    finally:
-        db.close()
+    # Aggiornamento puntuale dello stato di sessione
+    if "import_results" in st.session_state:
+        res = st.session_state.import_results
+        res[data_type] = (new_df, None)
+        st.session_state.import_results = res
+    
+    st.rerun()
 
 
 def _handle_save(user_id, df, data_type, save_func):
     """
-    Itera sulle righe del DataFrame ed esegue il salvataggio atomico per riga.
-    Fornisce feedback visivo tramite Progress Bar.
+    Salva l'intero DataFrame in un'unica transazione (executemany a blocchi).
+    Fornisce feedback visivo tramite Progress Bar aggiornata a ogni blocco.
     Al termine mostra un toast di riepilogo e chiude il componente di staging.
+    In caso di errore nessuna riga viene salvata (rollback dell'intero import).
     """
-    db = next(get_db())
     prog_bar = st.progress(0)
     status_text = st.empty()
 
-    try:
-        total = len(df)
-        success_count = 0
-
-        # Loop di persistenza con enumerate per progress bar corretta
-        for i, (_, row) in enumerate(df.iterrows()):
-            save_func(db, user_id, row)
+    def _on_progress(done, total):
+        prog_bar.progress(done / total)
+        status_text.caption(f"Salvataggio record {done}/{total}...")
 
-            prog = (i + 1) / total
-            prog_bar.progress(prog)
-            status_text.caption(f"Elaborazione riga {i + 1}/{total}...")
-            time.sleep(0.01)
-            success_count += 1
+    try:
+        # Persistenza massiva: invalidazione cache unica gestita dall'importer
+        with db_session() as db:
+            success_count = save_func(db, user_id, df, on_progress=_on_progress)
 
         # Rimozione dati processati dallo staging area (chiude il componente)
         if "import_results" in st.session_state:
@@ -166,9 +155,6 @@ def _handle_save(user_id, df, data_type, save_func):
             if not st.session_state.import_results:
                 st.session_state.import_results = {}
 
-        # Invalidazione cache per riflettere i nuovi dati nelle dashboard
-        st.cache_data.clear()
-
         # Toast di conferma (persiste dopo il rerun, visibile ~4 secondi)
         label_map = {'fuel': 'Rifornimenti', 'maintenance': 'Manutenzioni'}
         section = label_map.get(data_type, data_type)
@@ -178,11 +164,10 @@ def _handle_save(user_id, df, data_type, save_func):
         )
 
     except Exception as e:
-        st.error(f"Errore critico durante il salvataggio: {e}")
+        st.error(f"Errore critico durante il salvataggio (nessun record importato): {e}")
     finally:
         # Sempre: rimuovi il flag anti-click e forza chiusura del componente
         st.session_state.pop(f'import_saving_{data_type}', None)
-        db.close()
         st.rerun()
 
 
@@ -2,7 +2,7 @@ import re
 
 import streamlit as st
 
-from src.database.core import get_db
+from src.database.core import db_session
 from src.services.data import exporters
 from src.utils.constants import CAR_BRANDS, PLATE_CONFIG
 
@@ -125,13 +125,11 @@ def _generate_and_download(user, owner, plate, model, year_filter):
     """
     try:
         with st.spinner("Creazione PDF in corso..."):
-            db = next(get_db())
-            
-            # Chiamata al servizio di export
-            pdf_bytes = exporters.generate_maintenance_report(
-                db, user.id, owner, plate, model, year_filter
-            )
-            db.close()
+            # Chiamata al servizio di export (cachato: stessi dati e parametri → PDF già generato)
+            with db_session() as db:
+                pdf_bytes = exporters.get_maintenance_report(
+                    db, user.id, owner, plate, model, year_filter
+                )
             
             # Costruzione nome file sanitizzato
             year_suffix = f"_{year_filter}" if year_filter else "_FULL"
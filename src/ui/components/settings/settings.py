@@ -1,11 +1,13 @@
 import streamlit as st
 from datetime import datetime
-from src.database.core import get_db
+from src.database.core import db_session
 from src.database import crud
-from src.config import DEFAULTS
-from src.services.data.exporters import reports, templates
+from src.config import DEFAULTS, cfg
+from src.services.data import exporters
+from src.services.data.exporters import streaming, templates
 # Importiamo i nuovi moduli refattorizzati
-from src.services.data.importers import manager
+from src.services.data.importers import manager, fuel as fuel_importer
+from src.services.ocr import batch as ocr_batch
 from src.ui.components.settings import export_dialog, data_staging
 from src.demo import is_demo_mode
 
@@ -18,19 +20,21 @@ def render():
 
     tab_config, tab_export, tab_import, tab_pdf = st.tabs(["🔧 Configurazioni", "📤 Esportazione Dati", "📥 Importazione Dati", "📄 Libretto Service"])
     
-    with tab_config:
-        _render_config_tab(user)
+    # Una sessione per il run, condivisa dai tab e chiusa anche su rerun/eccezioni
+    with db_session() as db:
+        with tab_config:
+            _render_config_tab(db, user)
 
-    with tab_export:
-        _render_export_tab(user)
-        
-    with tab_import:
-        _render_import_tab(user)
-        
-    with tab_pdf:    
-        _render_pdf_tab(user)
+        with tab_export:
+            _render_export_tab(db, user)
+            
+        with tab_import:
+            _render_import_tab(db, user)
+            
+        with tab_pdf:    
+            _render_pdf_tab(db, user)
 
-def _render_export_tab(user):
+def _render_export_tab(db, user):
     
     st.markdown("""
     In questa sezione puoi scaricare una copia completa dei tuoi dati.
@@ -46,11 +50,12 @@ def _render_export_tab(user):
     
     st.divider()
 
-    db = next(get_db())
-    
-    # Calcolo statistiche rapide per l'anteprima
-    n_fuels = len(crud.get_all_refuelings(db, user.id))
-    n_maints = len(crud.get_all_maintenances(db, user.id))
+    # Statistiche rapide per l'anteprima dallo snapshot utente (COUNT, senza caricare lo storico)
+    overview = crud.get_user_snapshot(db, user.id)
+    n_fuels = overview.refuelings_count
+    n_maints = overview.maintenances_count
+    xlsx_max_rows = int(cfg("export.xlsx_max_rows", 100000))
+    too_large = (n_fuels + n_maints) > xlsx_max_rows
     
     col1, col2 = st.columns(2)
     col1.metric("Rifornimenti da esportare", n_fuels)
@@ -60,12 +65,15 @@ def _render_export_tab(user):
     
     if n_fuels == 0 and n_maints == 0:
         st.info("ℹ️ Nessun dato da esportare. Aggiungi prima dei rifornimenti o delle manutenzioni.")
+    elif too_large:
+        st.warning(f"⚠️ Lo storico supera le {xlsx_max_rows} righe: il file Excel non è disponibile. "
+                   "Usa l'esportazione CSV / NDJSON qui sotto.")
     elif st.button("📦 Genera File Excel", type="primary",
                    disabled=(n_fuels == 0),
                    help="Aggiungi almeno un rifornimento per abilitare l'esportazione." if n_fuels == 0 else None):
         try:
-            # Generazione in RAM
-            excel_data = reports.generate_excel_report(db, user.id)
+            # Generazione in RAM (cachata finché i dati non cambiano)
+            excel_data = exporters.get_excel_report(db, user.id)
             
             # Nome file con data odierna
             filename = f"fuelpytracker_backup_{datetime.now().strftime('%Y%m%d')}.xlsx"
@@ -82,8 +90,44 @@ def _render_export_tab(user):
             
         except Exception as e:
             st.error(f"Errore durante la generazione: {e}")
-    
-    db.close()
+
+    if n_fuels or n_maints:
+        with st.expander("🗄️ Esportazione CSV / NDJSON (storici molto grandi)", expanded=too_large):
+            _render_stream_export(db, user, n_fuels, n_maints)
+
+def _render_stream_export(db, user, n_fuels: int, n_maints: int):
+    """
+    Export in streaming: le righe sono lette a blocchi dal DB e scritte su file temporaneo.
+    Il limite di memoria vale solo durante la costruzione del file: download_button ne legge
+    l'intero contenuto in byte e lo tiene nel media storage della sessione.
+    """
+    st.caption("Un file per tipologia di dato. Il CSV ha le stesse colonne del file Excel "
+               "(quello dei rifornimenti è reimportabile); l'NDJSON contiene un oggetto JSON per riga.")
+
+    c_entity, c_fmt = st.columns(2)
+    entity_labels = {"fuel": f"Rifornimenti ({n_fuels})", "maintenance": f"Manutenzioni ({n_maints})"}
+    entity = c_entity.radio("Dati", list(entity_labels), format_func=entity_labels.get,
+                            horizontal=True, key="stream_export_entity")
+    fmt = c_fmt.radio("Formato", list(streaming.EXPORT_FORMATS), format_func=str.upper,
+                      horizontal=True, key="stream_export_fmt")
+
+    if st.button("📦 Genera File", key="stream_export_btn",
+                 disabled=(n_fuels if entity == "fuel" else n_maints) == 0):
+        try:
+            mime, ext = streaming.EXPORT_FORMATS[fmt]
+            with st.spinner("Esportazione in corso..."):
+                export_file = streaming.write_export(db, user.id, entity, fmt)
+            with export_file:
+                st.download_button(
+                    label="📥 Clicca qui per scaricare",
+                    data=export_file,
+                    file_name=f"fuelpytracker_{entity}_{datetime.now().strftime('%Y%m%d')}.{ext}",
+                    mime=mime,
+                    key="dl_stream_btn"
+                )
+            st.success("File generato con successo! Clicca sopra per scaricare.")
+        except Exception as e:
+            st.error(f"Errore durante la generazione: {e}")
 
 @st.dialog("Conferma Eliminazione")
 def show_delete_dialog(index, label_name, session_key: str, editing_key: str):
@@ -162,9 +206,8 @@ def _render_category_editor(session_key: str, editing_key: str, add_placeholder:
                     if b2.form_submit_button("❌", key=f"d_{session_key}_{i}", help="Elimina", width='stretch', disabled=is_demo_mode()):
                         show_delete_dialog(i, label, session_key, editing_key)
 
-def _render_config_tab(user):
+def _render_config_tab(db, user):
     """Gestisce i parametri globali dell'app per l'utente specifico."""
-    db = next(get_db())
     settings = crud.get_settings(db, user.id)
     
     # --- 1. GESTIONE STATO LOCALE (Labels) ---
@@ -328,10 +371,8 @@ def _render_config_tab(user):
             
             st.success("✅ Configurazioni salvate con successo!")
             st.rerun()
-    
-    db.close()
 
-def _render_import_tab(user):
+def _render_import_tab(db, user):
     st.subheader("Caricamento Dati (Multi-Scheda)")
 
     st.markdown("""
@@ -370,6 +411,13 @@ def _render_import_tab(user):
         st.warning("🔒 Modalità Demo: Modifiche disabilitate per sicurezza.")
         return
 
+    # Stato per i risultati multipli
+    if "import_results" not in st.session_state:
+        st.session_state.import_results = {}
+
+    # --- Scontrini scansionati in blocco (staging 'receipt_scans') ---
+    _render_receipt_staging(db, user)
+
     # Usiamo un contatore nella sessione per creare una chiave dinamica.
     # Quando incrementiamo il contatore, Streamlit resetta il widget file_uploader.
     if "uploader_key" not in st.session_state:
@@ -381,26 +429,35 @@ def _render_import_tab(user):
         key=f"uploader_{st.session_state['uploader_key']}" # Chiave dinamica
     )
     
-    # Stato per i risultati multipli
-    if "import_results" not in st.session_state:
-        st.session_state.import_results = {}
-
     if uploaded:
         # Se i risultati sono vuoti (primo caricamento), processiamo usando il nuovo Manager
         if not st.session_state.import_results:
-            db = next(get_db())
             # USIAMO IL NUOVO MANAGER
             results = manager.parse_upload_file(db, user.id, uploaded)
-            db.close()
+
+            # Metriche di lettura separate dai risultati (che contengono solo i fogli da rivedere)
+            st.session_state.import_stats = results.pop('stats', None)
             
             # Check errore globale (es. file corrotto o nessun foglio valido)
             if 'global_error' in results:
                 st.error(f"❌ {results['global_error']}")
             else:
                 st.session_state.import_results = results
-    else:
+                st.session_state.import_source = 'file'
+
+        stats = st.session_state.get('import_stats')
+        if stats and st.session_state.import_results:
+            caption = (
+                f"📄 Lettura file ({stats.get('mode')}): {stats.get('read_seconds', 0):.2f}s · "
+                f"validazione {stats.get('validate_seconds', 0):.2f}s"
+            )
+            if 'peak_memory_mb' in stats:  # solo con import.trace_memory attivo
+                caption += f" · picco memoria {stats['peak_memory_mb']:.1f} MB"
+            st.caption(caption)
+    elif st.session_state.get('import_source') != 'receipts':
         # Reset implicito (se clicchi la X del widget)
         st.session_state.import_results = {}
+        st.session_state.import_stats = None
 
     # --- RENDER RISULTATI (Dinamico tramite componente esterno) ---
     results = st.session_state.import_results
@@ -422,14 +479,51 @@ def _render_import_tab(user):
         
         # --- PULSANTE RESET LOGICA ---
         if st.button("🔄 Pulisci tutto e carica altro file", type="secondary"):
-            # 1. Puliamo i risultati
+            # 1. Puliamo i risultati (gli scontrini scansionati restano in staging)
             st.session_state.import_results = {}
+            st.session_state.import_source = None
             # 2. Incrementiamo la chiave per forzare la distruzione del widget uploader
             st.session_state["uploader_key"] += 1
             # 3. Ricarichiamo la pagina
             st.rerun()
 
-def _render_pdf_tab(user):
+def _render_receipt_staging(db, user):
+    """
+    Scontrini della scansione multipla in attesa: caricati nella tabella di revisione
+    Rifornimenti, dove si completano i km. Dopo l'importazione lo staging viene svuotato.
+    """
+    # Revisione conclusa con il salvataggio (data_staging rimuove i risultati 'fuel')
+    if st.session_state.get('import_source') == 'receipts' and 'fuel' not in st.session_state.import_results:
+        crud.delete_receipt_scans(db, user.id)
+        st.session_state.import_source = None
+
+    scans = crud.get_receipt_scans(db, user.id)
+    if not scans:
+        return
+
+    ok = [s for s in scans if not s.error]
+    reviewing = st.session_state.get('import_source') == 'receipts'
+    st.info(
+        f"📸 **{len(ok)} scontrini scansionati** pronti da importare"
+        + (f" ({len(scans) - len(ok)} non letti)" if len(ok) < len(scans) else "")
+        + ". Nella revisione inserisci i km di ogni rifornimento."
+    )
+    c1, c2 = st.columns([3, 1])
+    if c1.button("📋 Rivedi scontrini scansionati", disabled=not ok or reviewing, width='stretch'):
+        frame = ocr_batch.staged_fuel_frame(ok)
+        st.session_state.import_results = {'fuel': fuel_importer.process_fuel_data(db, user.id, frame)}
+        st.session_state.import_stats = None
+        st.session_state.import_source = 'receipts'
+        st.rerun()
+    if c2.button("🗑️ Scarta", width='stretch'):
+        crud.delete_receipt_scans(db, user.id)
+        if reviewing:
+            st.session_state.import_results = {}
+            st.session_state.import_source = None
+        st.rerun()
+
+
+def _render_pdf_tab(db, user):
     st.subheader("Libretto Manutenzione Digitale")
     
     st.info(
@@ -438,9 +532,7 @@ def _render_pdf_tab(user):
     )
     
     # 1. Recupero Anni Disponibili dal DB
-    db = next(get_db())
     all_maints = crud.get_all_maintenances(db, user.id)
-    db.close()
     
     # Guard: nessuna manutenzione registrata
     if not all_maints:
@@ -1,11 +1,9 @@
 import streamlit as st
 import os
-from datetime import date
-from sqlalchemy import or_
 from src.services.auth.auth_service import sign_out
 from src.auth.session_handler import clear_session
 from src.assets.styles import apply_sidebar_css
-from src.database.core import get_db
+from src.database.core import db_session
 from src.database import crud
 
 def _render_user_profile(current_user):
@@ -29,30 +27,12 @@ def _check_urgent_deadlines(user_id):
     Verifica scadenze scadute (ROSSO) e mostra warning nella sidebar.
     """
     try:
-        # Apriamo una sessione veloce solo per il check
-        db = next(get_db())
+        # Sessione veloce solo per il check (chiusa anche se la query fallisce)
+        with db_session() as db:
+            # Scadenze superate (Km o Data) dallo snapshot utente: una query, cachata
+            expired_count = crud.get_user_snapshot(db, user_id).overdue_deadlines
         
-        # 1. Recupera dati necessari
-        max_km = crud.get_max_km(db, user_id)
-        today = date.today()
-        
-        # 2. Query maintenance con scadenze impostate
-        active_m = db.query(crud.Maintenance).filter(
-            crud.Maintenance.user_id == user_id,
-            or_(crud.Maintenance.expiry_km != None, crud.Maintenance.expiry_date != None)
-        ).all()
-        
-        expired_count = 0
-        for m in active_m:
-            is_exp_km = (m.expiry_km is not None and m.expiry_km < max_km)
-            is_exp_date = (m.expiry_date is not None and m.expiry_date < today)
-            
-            if is_exp_km or is_exp_date:
-                expired_count += 1
-        
-        db.close()
-        
-        # 3. Visualizza Warning se necessario
+        # Visualizza Warning se necessario
         if expired_count > 0:
             st.warning(f"**{expired_count} Scadenze Passate!**")
             # Pulsante rapido per andare alla pagina (aggiorna lo stato della nav)
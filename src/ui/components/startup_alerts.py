@@ -1,7 +1,7 @@
 import streamlit as st
 from datetime import date
 from src.database import crud
-from src.database.core import get_db
+from src.database.core import db_session
 from src.demo import is_demo_mode
 
 @st.dialog("⚠️ Avvisi Veicolo")
@@ -18,10 +18,11 @@ def _show_alert_dialog(overdue_list):
         st.session_state.nav_radio_account = None
         st.rerun()
 
-def check_and_show_alerts(user_id):
+def check_and_show_alerts(user_id, snapshot=None):
     """
     Da chiamare all'inizio di main.py o della dashboard.
     Esegue il controllo solo una volta per sessione.
+    Con uno snapshot (crud.get_user_snapshot) già caricato non esegue altre query.
     """
     if "startup_alert_shown" in st.session_state:
         return
@@ -30,15 +31,26 @@ def check_and_show_alerts(user_id):
     if is_demo_mode():
         return
 
-    db = next(get_db())
-    
     # 1. Recupero Dati per Check
     # (Logica semplificata: controlliamo solo i Reminder per ora, estendibile a scadenze bollo/rev)
-    refuelings = crud.get_all_refuelings(db, user_id)
-    current_km = max(r.total_km for r in refuelings) if refuelings else 0
-    active_rems = crud.get_active_reminders(db, user_id)
-    today = date.today()
-    
+    if snapshot is None:
+        with db_session() as db:
+            snapshot = crud.get_user_snapshot(db, user_id)
+
+    # Il conteggio dei promemoria scaduti arriva già dalla query: messaggi solo se serve
+    overdue_msgs = []
+    if snapshot.overdue_reminders:
+        overdue_msgs = _overdue_messages(snapshot.active_reminders, snapshot.max_km, date.today())
+
+    # 2. Mostra Dialog se necessario
+    if overdue_msgs:
+        _show_alert_dialog(overdue_msgs)
+        
+    # 3. Segna come visto
+    st.session_state.startup_alert_shown = True
+
+def _overdue_messages(active_rems, current_km, today):
+    """Messaggi per i promemoria scaduti (Km o giorni)."""
     overdue_msgs = []
     
     for rem in active_rems:
@@ -54,11 +66,4 @@ def check_and_show_alerts(user_id):
                 diff = days_passed - rem.frequency_days
                 overdue_msgs.append(f"**{rem.title}**: Scaduto da {diff} giorni")
 
-    db.close()
-
-    # 2. Mostra Dialog se necessario
-    if overdue_msgs:
-        _show_alert_dialog(overdue_msgs)
-        
-    # 3. Segna come visto
-    st.session_state.startup_alert_shown = True
\ No newline at end of file
+    return overdue_msgs
\ No newline at end of file
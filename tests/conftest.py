@@ -1,6 +1,7 @@
 import sys
 import os
 import pytest
+import streamlit as st
 from unittest.mock import patch
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
@@ -30,6 +31,9 @@ def db_session():
     Fixture che fornisce una sessione DB pulita per ogni singolo test.
     Ciclo di vita: Setup -> Test -> Teardown (Rollback/Drop).
     """
+    # 0. Cache isolata: ogni test parte senza risultati cachati da test precedenti
+    st.cache_data.clear()
+
     # 1. Creazione Engine e Tabelle
     engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
     Base.metadata.create_all(bind=engine)
@@ -42,4 +46,31 @@ def db_session():
     
     # 3. Pulizia risorse
     db.close()
-    Base.metadata.drop_all(bind=engine)
\ No newline at end of file
+    Base.metadata.drop_all(bind=engine)
+
+@pytest.fixture(autouse=True)
+def ocr_cache(monkeypatch):
+    """
+    Cache OCR solo in memoria e vuota per ogni test: nessun file in .cache/
+    e nessun risultato che passa da un test all'altro.
+    """
+    from src.services.ocr import pipeline
+    from src.services.ocr.cache import OcrCache
+
+    instance = OcrCache(max_entries=32)
+    monkeypatch.setattr(pipeline, "get_ocr_cache", lambda: instance)
+    return instance
+
+
+@pytest.fixture(autouse=True)
+def ocr_resilience(monkeypatch):
+    """
+    Policy OpenAI nuova per ogni test (breaker chiuso, contatori a zero) e backoff
+    senza attese reali: i test sugli errori transitori restano istantanei.
+    """
+    from src.services.ocr import engine
+    from src.services.ocr.resilience import CircuitBreaker, ResiliencePolicy
+
+    policy = ResiliencePolicy("openai", engine._is_transient, breaker=CircuitBreaker(), sleep=lambda s: None)
+    monkeypatch.setattr(engine, "get_resilience_policy", lambda: policy)
+    return policy
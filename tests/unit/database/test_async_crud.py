@@ -0,0 +1,171 @@
+"""
+Tests per async_crud.py e async_core.py — letture concorrenti della dashboard
+
+Copre: conversione URL verso i driver async, letture async equivalenti a crud.py,
+       default delle impostazioni senza scritture, query eseguite in parallelo,
+       cache dello snapshot per versione dei dati, fallback sincrono.
+
+Esecuzione: pytest tests/unit/database/test_async_crud.py -v
+"""
+
+import asyncio
+import time
+from datetime import date, timedelta
+
+import pytest
+import streamlit as st
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from src.config import DEFAULTS
+from src.database import async_core, async_crud, crud
+from src.database.async_core import build_async_engine, run_async, to_async_url
+from src.database.dto import DashboardSnapshot
+from src.database.models import AppSettings, Base, Refueling
+
+USER_ID = "test-user-uuid"
+
+
+@pytest.fixture
+def async_db(tmp_path):
+    """
+    Database SQLite su file condiviso tra sessione sincrona (seed) e factory async:
+    ogni AsyncSession apre la propria connessione, come sul pool Postgres.
+    """
+    st.cache_data.clear()
+    url = f"sqlite:///{tmp_path / 'fuel.sqlite3'}"
+    engine = create_engine(url)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    async_engine = build_async_engine(url)
+    factory = async_sessionmaker(async_engine, expire_on_commit=False)
+    yield db, factory
+
+    db.close()
+    run_async(async_engine.dispose())
+    engine.dispose()
+
+
+def _seed(db):
+    today = date.today()
+    crud.create_refueling(db, USER_ID, today - timedelta(days=10), 10000, 1.8, 50.0, 27.7, True)
+    crud.create_refueling(db, USER_ID, today, 10600, 1.9, 60.0, 31.5, True)
+    crud.create_refueling(db, "other-user", today, 99999, 1.9, 60.0, 31.5, True)
+
+
+# =============================================================================
+# TESTS: Engine asincrono
+# =============================================================================
+
+class TestAsyncUrl:
+
+    def test_postgres_uses_asyncpg_and_moves_sslmode(self):
+        url, connect_args = to_async_url("postgresql://u:p@db.example.com:5432/fuel?sslmode=require")
+        assert url == "postgresql+asyncpg://u:p@db.example.com:5432/fuel"
+        assert connect_args == {"ssl": "require"}
+
+    def test_sqlite_uses_aiosqlite(self):
+        assert to_async_url("sqlite:///data.db") == ("sqlite+aiosqlite:///data.db", {})
+
+    def test_unsupported_backend(self):
+        with pytest.raises(ValueError):
+            to_async_url("mysql://u:p@localhost/fuel")
+
+    def test_pgbouncer_uses_unique_prepared_statement_names(self, monkeypatch):
+        monkeypatch.setattr(async_core, "_pool_mode", lambda: "pgbouncer")
+        connect_args = async_core.async_engine_options("postgresql://u:p@db.example.com/fuel")["connect_args"]
+
+        assert connect_args["statement_cache_size"] == 0
+        name_func = connect_args["prepared_statement_name_func"]
+        first, second = name_func(), name_func()
+        assert first != second and first.startswith("__asyncpg_")
+
+
+# =============================================================================
+# TESTS: Repository asincrono
+# =============================================================================
+
+class TestAsyncRepository:
+
+    def test_snapshot_matches_sync_reads(self, async_db):
+        db, factory = async_db
+        _seed(db)
+
+        snap = run_async(async_crud.fetch_dashboard_snapshot(factory, USER_ID))
+
+        assert snap.refuelings == crud.get_all_refuelings(db, USER_ID)
+        assert [r.total_km for r in snap.refuelings] == [10600, 10000]
+
+    def test_missing_settings_defaults_without_insert(self, async_db):
+        db, factory = async_db
+
+        snap = run_async(async_crud.fetch_dashboard_snapshot(factory, USER_ID))
+
+        assert snap.settings.id is None
+        assert snap.settings.max_accumulated_partial_cost == DEFAULTS.SETTINGS.MAX_ACCUMULATED_PARTIAL_COST
+        assert snap.settings.maintenance_types == list(DEFAULTS.SETTINGS.MAINTENANCE_TYPES)
+        assert db.execute(select(func.count()).select_from(AppSettings)).scalar() == 0
+        assert snap.refuelings == []
+
+    def test_stored_settings_read(self, async_db):
+        db, factory = async_db
+        crud.update_settings(db, USER_ID, 5.0, 120.0, 33.0, ["A"], ["B"])
+
+        settings = run_async(async_crud.fetch_dashboard_snapshot(factory, USER_ID)).settings
+        assert (settings.max_accumulated_partial_cost, settings.reminder_types) == (33.0, ["A"])
+        assert settings == async_crud.settings_to_dto(USER_ID, crud.get_settings(db, USER_ID))
+
+    def test_queries_run_concurrently(self, monkeypatch):
+        """Il caricamento dura quanto la lettura più lenta, non la somma."""
+        def slow(seconds):
+            async def read(session, user_id):
+                await asyncio.sleep(seconds)
+                return []
+            return read
+
+        for name in ("get_all_refuelings", "get_settings"):
+            monkeypatch.setattr(async_crud, name, slow(0.3))
+
+        class _Session:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+        start = time.perf_counter()
+        run_async(async_crud.fetch_dashboard_snapshot(_Session, USER_ID))
+        assert time.perf_counter() - start < 0.5   # seriale: 0.6 s
+
+
+# =============================================================================
+# TESTS: Snapshot per la UI
+# =============================================================================
+
+class TestLoadDashboardSnapshot:
+
+    def test_cached_until_data_version_changes(self, async_db, monkeypatch):
+        db, factory = async_db
+        _seed(db)
+        monkeypatch.setattr(async_core, "get_async_session_factory", lambda: factory)
+
+        first = async_crud.load_dashboard_snapshot(USER_ID)
+        # Scrittura senza bump di versione: lo snapshot cachato non la vede
+        db.add(Refueling(user_id=USER_ID, date=date.today(), total_km=10700, price_per_liter=1.9,
+                         total_cost=19.0, liters=10.0))
+        db.commit()
+        assert async_crud.load_dashboard_snapshot(USER_ID) == first
+
+        crud.create_refueling(db, USER_ID, date.today() + timedelta(days=1), 11000, 1.9, 40.0, 21.0, True)
+        refreshed = async_crud.load_dashboard_snapshot(USER_ID)
+        assert len(refreshed.refuelings) == 4 and refreshed.refuelings[0].total_km == 11000
+
+    def test_sync_fallback_when_disabled(self, monkeypatch):
+        st.cache_data.clear()
+        snap = DashboardSnapshot(refuelings=[], settings=None)
+        monkeypatch.setattr(async_crud, "cfg", lambda key, fallback=None: False if key == "database.async.enabled" else fallback)
+        monkeypatch.setattr(async_crud, "_load_snapshot_sync", lambda user_id: snap)
+
+        assert async_crud.load_dashboard_snapshot("fallback-user") == snap
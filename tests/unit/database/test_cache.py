@@ -0,0 +1,90 @@
+"""
+Tests per database/cache.py
+
+Copre: invalidazione per (utente, entità) al posto del clear globale,
+contatori hit/miss delle letture cachate, notifica dei bump ai listener.
+Usa DB SQLite in memoria (via conftest.py).
+
+Esecuzione: pytest tests/unit/database/test_cache.py -v
+"""
+
+from datetime import date
+from src.database import crud, cache
+
+USER_ID = "cache-user-uuid"
+OTHER_USER = "cache-other-uuid"
+
+
+def _add_refueling(db, user_id, km=50000, day=date(2025, 1, 1)):
+    return crud.create_refueling(db=db, user_id=user_id,
+        date_obj=day, total_km=km, price_per_liter=1.80,
+        total_cost=90.0, liters=50.0, is_full_tank=True)
+
+
+class TestVersionedCache:
+
+    def test_write_bumps_only_user_entity_version(self, db_session):
+        before_user = cache.get_version(USER_ID, cache.REFUELINGS)
+        before_other = cache.get_version(OTHER_USER, cache.REFUELINGS)
+        before_maint = cache.get_version(USER_ID, cache.MAINTENANCES)
+
+        _add_refueling(db_session, USER_ID)
+
+        assert cache.get_version(USER_ID, cache.REFUELINGS) == before_user + 1
+        assert cache.get_version(OTHER_USER, cache.REFUELINGS) == before_other
+        assert cache.get_version(USER_ID, cache.MAINTENANCES) == before_maint
+
+    def test_new_data_visible_after_write(self, db_session):
+        _add_refueling(db_session, USER_ID)
+        assert len(crud.get_all_refuelings(db_session, USER_ID)) == 1
+
+        _add_refueling(db_session, USER_ID, km=51000, day=date(2025, 2, 1))
+        assert len(crud.get_all_refuelings(db_session, USER_ID)) == 2
+
+    def test_other_user_write_keeps_cache_warm(self, db_session):
+        """Una scrittura di un altro utente NON deve invalidare la cache dell'utente corrente."""
+        _add_refueling(db_session, USER_ID)
+        crud.get_all_refuelings(db_session, USER_ID)   # miss: popola la cache
+        cache.reset_stats()
+
+        _add_refueling(db_session, OTHER_USER)
+        crud.get_all_refuelings(db_session, USER_ID)   # deve essere un hit
+
+        stats = cache.cache_stats()[cache.REFUELINGS]
+        assert stats == {"hits": 1, "misses": 0, "hit_rate": 1.0}
+
+    def test_maintenance_write_keeps_refuelings_cached(self, db_session):
+        _add_refueling(db_session, USER_ID)
+        crud.get_all_refuelings(db_session, USER_ID)
+        cache.reset_stats()
+
+        crud.create_maintenance(db_session, USER_ID, date(2025, 1, 5), 50100, "Tagliando", 200.0)
+        crud.get_all_refuelings(db_session, USER_ID)
+        assert len(crud.get_all_maintenances(db_session, USER_ID)) == 1
+
+        stats = cache.cache_stats()
+        assert stats[cache.REFUELINGS]["hits"] == 1
+        assert stats[cache.MAINTENANCES]["misses"] == 1
+
+    def test_hit_miss_counters(self, db_session):
+        _add_refueling(db_session, USER_ID)
+        cache.reset_stats()
+
+        for _ in range(3):
+            crud.get_max_km(db_session, USER_ID)
+
+        stats = cache.cache_stats()[cache.REFUELINGS]
+        assert stats["misses"] == 1
+        assert stats["hits"] == 2
+        assert stats["hit_rate"] == 2 / 3
+
+    def test_bump_listeners_notified_once(self, db_session, monkeypatch):
+        seen = []
+        listener = lambda user_id, entities: seen.append((user_id, entities))
+        monkeypatch.setattr(cache, "_bump_listeners", [])
+        cache.on_version_bump(listener)
+        cache.on_version_bump(listener)   # registrazione idempotente
+
+        _add_refueling(db_session, USER_ID)
+
+        assert seen == [(USER_ID, (cache.REFUELINGS,))]
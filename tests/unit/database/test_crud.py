@@ -1,14 +1,22 @@
 """
 Tests per database/crud.py
 
-Copre: create/read/update/delete per Refueling, Maintenance, Reminder.
+Copre: create/read/update/delete per Refueling, Maintenance, Reminder,
+       letture cachate restituite come DTO immutabili,
+       query per scrittura singola (RETURNING, nessun refresh dopo il commit).
 Usa DB SQLite in memoria (via conftest.py).
 
 Esecuzione: pytest tests/unit/database/test_crud.py -v
 """
 
+import dataclasses
+import pickle
 from datetime import date
+
+import pytest
+
 from src.database import crud
+from src.database.dto import RefuelingDTO, MaintenanceDTO, ReminderDTO
 
 USER_ID = "test-user-uuid"
 OTHER_USER = "other-user-uuid"
@@ -272,4 +280,357 @@ class TestReminderCrud:
 
         reminders = crud.get_active_reminders(db_session, USER_ID)
         assert len(reminders) == 1
-        assert reminders[0].title == "Olio"
\ No newline at end of file
+        assert reminders[0].title == "Olio"
+
+# =============================================================================
+# TESTS: Read model (DTO)
+# =============================================================================
+
+class TestReadModels:
+
+    def test_reads_return_frozen_dtos(self, db_session):
+        """Le letture cachate restituiscono DTO, non istanze ORM legate alla sessione."""
+        crud.create_refueling(db=db_session, user_id=USER_ID,
+            date_obj=date(2025, 1, 1), total_km=50000,
+            price_per_liter=1.80, total_cost=90.0, liters=50.0, is_full_tank=True)
+        crud.create_maintenance(db=db_session, user_id=USER_ID,
+            date_obj=date(2025, 1, 2), total_km=50100, expense_type="Tagliando", cost=200.0)
+        crud.create_reminder(db=db_session, user_id=USER_ID,
+            title="Olio", frequency_km=10000, frequency_days=None,
+            current_km=50000, current_date=date(2025, 1, 1))
+
+        fuel = crud.get_all_refuelings(db_session, USER_ID)[0]
+        assert isinstance(fuel, RefuelingDTO)
+        assert isinstance(crud.get_last_refueling(db_session, USER_ID), RefuelingDTO)
+        assert isinstance(crud.get_all_maintenances(db_session, USER_ID)[0], MaintenanceDTO)
+        assert isinstance(crud.get_active_reminders(db_session, USER_ID)[0], ReminderDTO)
+
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            fuel.total_km = 1
+        assert not hasattr(fuel, "__dict__")  # __slots__: nessun dict per istanza
+
+    def test_dto_pickle_roundtrip(self, db_session):
+        """Il DTO sopravvive al pickling di st.cache_data con gli stessi attributi."""
+        crud.create_refueling(db=db_session, user_id=USER_ID,
+            date_obj=date(2025, 1, 1), total_km=50000,
+            price_per_liter=1.80, total_cost=90.0, liters=50.0, is_full_tank=False, notes="x")
+
+        rec = crud.get_all_refuelings(db_session, USER_ID)[0]
+        assert pickle.loads(pickle.dumps(rec)) == rec
+        assert (rec.date, rec.total_km, rec.liters, rec.is_full_tank, rec.notes) == \
+               (date(2025, 1, 1), 50000, 50.0, False, "x")
+
+    def test_last_refueling_empty(self, db_session):
+        assert crud.get_last_refueling(db_session, USER_ID) is None
+
+
+# =============================================================================
+# TESTS: Scritture massive
+# =============================================================================
+
+def _bulk_row(i):
+    return {"date": date(2024, 1, 1 + i), "total_km": 40000 + i * 500, "price_per_liter": 1.8,
+            "total_cost": 90.0, "liters": 50.0, "is_full_tank": True, "notes": None}
+
+
+class TestBulkWrites:
+
+    def test_bulk_create_progress_per_chunk(self, db_session):
+        progress = []
+        n = crud.bulk_create_refuelings(db_session, USER_ID, [_bulk_row(i) for i in range(5)],
+                                        chunk_size=2, on_progress=lambda d, t: progress.append((d, t)))
+        assert n == 5
+        assert progress == [(2, 5), (4, 5), (5, 5)]
+        assert len(crud.get_all_refuelings(db_session, USER_ID)) == 5
+
+    def test_bulk_create_invalidates_cache_once(self, db_session):
+        from src.database import cache
+        before = cache.get_version(USER_ID, cache.REFUELINGS)
+        crud.bulk_create_refuelings(db_session, USER_ID, [_bulk_row(i) for i in range(5)], chunk_size=2)
+        assert cache.get_version(USER_ID, cache.REFUELINGS) == before + 1
+
+    def test_bulk_create_failure_rolls_back_batch(self, db_session):
+        rows = [_bulk_row(i) for i in range(4)]
+        rows[3]["total_km"] = None  # NOT NULL violato nell'ultimo blocco
+        with pytest.raises(Exception):
+            crud.bulk_create_refuelings(db_session, USER_ID, rows, chunk_size=2)
+        assert crud.get_all_refuelings(db_session, USER_ID) == []
+
+    def test_bulk_update_only_touches_own_records(self, db_session):
+        mine = crud.create_refueling(db_session, USER_ID, date(2025, 1, 1), 50000, 1.8, 90.0, 50.0, True)
+        other = crud.create_refueling(db_session, OTHER_USER, date(2025, 1, 1), 50000, 1.8, 90.0, 50.0, True)
+
+        crud.bulk_update_refuelings(db_session, USER_ID, [
+            {"id": mine.id, "total_cost": 95.0, "notes": "bulk"},
+            {"id": other.id, "total_cost": 1.0, "notes": "hack"},
+        ])
+        assert crud.get_all_refuelings(db_session, USER_ID)[0].total_cost == 95.0
+        assert crud.get_all_refuelings(db_session, OTHER_USER)[0].total_cost == 90.0
+
+    def test_bulk_maintenances_create_and_update(self, db_session):
+        crud.bulk_create_maintenances(db_session, USER_ID, [
+            {"date": date(2024, 5, 1), "total_km": 60000, "expense_type": "Gomme", "cost": 400.0, "description": None}
+        ])
+        rec = crud.get_all_maintenances(db_session, USER_ID)[0]
+        crud.bulk_update_maintenances(db_session, USER_ID, [{"id": rec.id, "cost": 420.0, "description": "4 gomme"}])
+        rec = crud.get_all_maintenances(db_session, USER_ID)[0]
+        assert (rec.cost, rec.description) == (420.0, "4 gomme")
+
+    def test_upsert_inserts_new_and_updates_known_keys(self, db_session, statements):
+        from src.database import cache
+        crud.bulk_create_refuelings(db_session, USER_ID, [_bulk_row(0), _bulk_row(1)])
+        crud.bulk_create_refuelings(db_session, OTHER_USER, [_bulk_row(0)])
+        before = cache.get_version(USER_ID, cache.REFUELINGS)
+        statements.clear()
+
+        rows = [{**_bulk_row(1), "total_cost": 99.0, "notes": "ricaricato"}, _bulk_row(2)]
+        assert crud.upsert_refuelings(db_session, USER_ID, rows) == 2
+
+        assert statements == []                          # nessuna lettura dello storico / degli id
+        assert cache.get_version(USER_ID, cache.REFUELINGS) == before + 1
+        records = crud.get_all_refuelings(db_session, USER_ID)
+        assert [(r.total_km, r.total_cost, r.notes) for r in records] == [
+            (41000, 90.0, None), (40500, 99.0, "ricaricato"), (40000, 90.0, None)]
+        assert crud.get_all_refuelings(db_session, OTHER_USER)[0].total_cost == 90.0
+
+    def test_upsert_maintenances_key_includes_type(self, db_session):
+        base = {"date": date(2024, 5, 1), "total_km": 60000, "cost": 400.0, "description": None}
+        crud.upsert_maintenances(db_session, USER_ID, [{**base, "expense_type": "Gomme"}])
+        crud.upsert_maintenances(db_session, USER_ID, [
+            {**base, "expense_type": "Gomme", "cost": 420.0},
+            {**base, "expense_type": "Tagliando", "cost": 200.0},
+        ])
+        recs = sorted(crud.get_all_maintenances(db_session, USER_ID), key=lambda m: m.expense_type)
+        assert [(m.expense_type, m.cost) for m in recs] == [("Gomme", 420.0), ("Tagliando", 200.0)]
+
+    def test_upsert_without_unique_index_falls_back_row_by_row(self, db_session):
+        """Migrazione 0002 in attesa (indice assente): stesso risultato, senza ON CONFLICT."""
+        from sqlalchemy import text
+        db_session.execute(text("DROP INDEX uq_refuelings_user_date_km"))
+        crud.bulk_create_refuelings(db_session, USER_ID, [_bulk_row(0)])
+
+        rows = [{**_bulk_row(0), "total_cost": 99.0}, _bulk_row(1)]
+        assert crud.upsert_refuelings(db_session, USER_ID, rows) == 2
+
+        records = crud.get_all_refuelings(db_session, USER_ID)
+        assert [(r.total_km, r.total_cost) for r in records] == [(40500, 90.0), (40000, 99.0)]
+
+    def test_natural_key_is_unique(self, db_session):
+        from sqlalchemy.exc import IntegrityError
+        crud.create_refueling(db_session, USER_ID, date(2025, 1, 1), 50000, 1.8, 90.0, 50.0, True)
+        with pytest.raises(IntegrityError):
+            crud.create_refueling(db_session, USER_ID, date(2025, 1, 1), 50000, 1.9, 95.0, 50.0, True)
+
+
+# =============================================================================
+# TESTS: Letture in streaming (Export)
+# =============================================================================
+
+class TestStreamingReads:
+
+    def test_partitions_in_chronological_order(self, db_session):
+        rows = [_bulk_row(i) for i in range(5)][::-1]
+        crud.bulk_create_refuelings(db_session, USER_ID, rows)
+        crud.bulk_create_refuelings(db_session, OTHER_USER, [_bulk_row(0)])
+
+        parts = list(crud.stream_refuelings(db_session, USER_ID, chunk_size=2))
+
+        assert [len(p) for p in parts] == [2, 2, 1]
+        flat = [r for p in parts for r in p]
+        assert all(isinstance(r, RefuelingDTO) and r.user_id == USER_ID for r in flat)
+        assert [r.date for r in flat] == sorted(r.date for r in flat)
+
+    def test_stream_maintenances_empty(self, db_session):
+        assert list(crud.stream_maintenances(db_session, USER_ID)) == []
+
+
+# =============================================================================
+# TESTS: Snapshot utente (bootstrap pagine)
+# =============================================================================
+
+@pytest.fixture
+def statements(db_session):
+    """Elenco delle SELECT eseguite sulla sessione di test."""
+    from sqlalchemy import event
+    executed = []
+
+    def _count(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            executed.append(statement)
+
+    event.listen(db_session.bind, "before_cursor_execute", _count)
+    yield executed
+    event.remove(db_session.bind, "before_cursor_execute", _count)
+
+
+class TestUserSnapshot:
+
+    def _seed(self, db):
+        today = date.today()
+        crud.create_refueling(db, USER_ID, date(2024, 1, 10), 10000, 1.8, 50.0, 27.7, True)
+        crud.create_refueling(db, USER_ID, date(2024, 2, 10), 10800, 1.9, 60.0, 31.5, True)
+        crud.create_refueling(db, OTHER_USER, date(2024, 3, 1), 99000, 1.9, 60.0, 31.5, True)
+        # Scadenze: superata a km, superata a data, futura, nessuna scadenza
+        crud.create_maintenance(db, USER_ID, date(2024, 1, 1), 9000, "Tagliando", 200.0, expiry_km=10500)
+        crud.create_maintenance(db, USER_ID, date(2024, 1, 1), 9000, "Bollo", 150.0, expiry_date=date(2024, 1, 31))
+        crud.create_maintenance(db, USER_ID, date(2024, 1, 1), 9000, "Revisione", 80.0,
+                                expiry_date=today.replace(year=today.year + 1))
+        crud.create_maintenance(db, USER_ID, date(2024, 1, 1), 9000, "Gomme", 300.0)
+        # Promemoria: scaduto a km, scaduto a giorni, in regola
+        crud.create_reminder(db, USER_ID, "Olio", 500, None, 10000, today)
+        crud.create_reminder(db, USER_ID, "Pressione", None, 30, 10800, date(2024, 1, 1))
+        crud.create_reminder(db, USER_ID, "Liquidi", 5000, 365, 10800, today)
+
+    def test_single_round_trip(self, db_session, statements):
+        self._seed(db_session)
+        statements.clear()
+
+        snap = crud.get_user_snapshot(db_session, USER_ID)
+
+        assert len(statements) == 1 and statements[0].lstrip().upper().startswith("WITH")
+        assert snap.max_km == 10800
+        assert snap.last_refueling.date == date(2024, 2, 10)
+        assert (snap.refuelings_count, snap.maintenances_count, snap.active_reminders_count) == (2, 4, 3)
+        assert (snap.overdue_deadlines, snap.overdue_reminders) == (2, 2)
+        # Prossime scadenze: per data (più vicina prima), poi quelle solo a km
+        assert [m.expense_type for m in snap.next_deadlines] == ["Bollo", "Revisione", "Tagliando"]
+        assert [r.title for r in snap.active_reminders] == ["Olio", "Pressione", "Liquidi"]
+
+    def test_matches_individual_reads(self, db_session):
+        self._seed(db_session)
+        snap = crud.get_user_snapshot(db_session, USER_ID)
+
+        assert snap.max_km == crud.get_max_km(db_session, USER_ID)
+        assert snap.last_refueling == crud.get_last_refueling(db_session, USER_ID)
+        assert snap.refuelings_count == len(crud.get_all_refuelings(db_session, USER_ID))
+        assert snap.maintenances_count == len(crud.get_all_maintenances(db_session, USER_ID))
+        assert snap.active_reminders == crud.get_active_reminders(db_session, USER_ID)
+        assert ({m.id for m in snap.next_deadlines}
+                == {m.id for m in crud.get_all_active_deadlines(db_session, USER_ID)})
+
+    def test_overdue_reminders_match_startup_alerts(self, db_session):
+        """Il conteggio SQL usa la stessa regola dei messaggi di avviso."""
+        from src.ui.components.startup_alerts import _overdue_messages
+
+        self._seed(db_session)
+        snap = crud.get_user_snapshot(db_session, USER_ID)
+        assert snap.overdue_reminders == len(_overdue_messages(snap.active_reminders, snap.max_km, date.today()))
+
+    def test_empty_user(self, db_session):
+        snap = crud.get_user_snapshot(db_session, USER_ID)
+        assert snap.max_km == 0 and snap.last_refueling is None
+        assert snap.next_deadlines == [] and snap.active_reminders == []
+        assert (snap.refuelings_count, snap.overdue_deadlines, snap.overdue_reminders) == (0, 0, 0)
+
+    def test_cached_until_any_entity_changes(self, db_session, statements):
+        self._seed(db_session)
+        crud.get_user_snapshot(db_session, USER_ID)
+        statements.clear()
+
+        assert crud.get_user_snapshot(db_session, USER_ID).maintenances_count == 4
+        assert statements == []
+
+        crud.delete_maintenance(db_session, USER_ID, crud.get_all_maintenances(db_session, USER_ID)[0].id)
+        statements.clear()
+        assert crud.get_user_snapshot(db_session, USER_ID).maintenances_count == 3
+        assert len(statements) == 1
+
+        crud.delete_reminder(db_session, USER_ID, crud.get_active_reminders(db_session, USER_ID)[0].id)
+        statements.clear()
+        assert crud.get_user_snapshot(db_session, USER_ID).active_reminders_count == 2
+        assert len(statements) == 1
+
+
+# =============================================================================
+# TESTS: Scritture singole (RETURNING, nessun refresh)
+# =============================================================================
+
+@pytest.fixture
+def app_session(db_session):
+    """Sessione configurata come quelle dell'app (expire_on_commit=False) + statement eseguiti."""
+    from sqlalchemy import event
+    db_session.expire_on_commit = False
+    executed = []
+
+    def _record(conn, cursor, statement, params, context, executemany):
+        executed.append(statement.lstrip().split(None, 1)[0].upper())
+
+    event.listen(db_session.bind, "before_cursor_execute", _record)
+    yield db_session, executed
+    event.remove(db_session.bind, "before_cursor_execute", _record)
+
+
+class TestWriteRoundTrips:
+    """
+    Query per scrittura: un solo statement (INSERT/UPDATE ... RETURNING), nessuna SELECT.
+    Con commit + refresh: create = INSERT + SELECT, update = SELECT + UPDATE + SELECT.
+    """
+
+    def _create_all(self, db):
+        ref = crud.create_refueling(db, USER_ID, date(2025, 1, 1), 50000, 1.8, 90.0, 50.0, True)
+        maint = crud.create_maintenance(db, USER_ID, date(2025, 1, 1), 50000, "Tagliando", 200.0)
+        rem = crud.create_reminder(db, USER_ID, "Olio", 1000, None, 50000, date(2025, 1, 1))
+        return ref, maint, rem
+
+    def test_creates_populate_id_and_defaults_in_one_statement(self, app_session):
+        db, executed = app_session
+
+        ref, maint, rem = self._create_all(db)
+
+        assert executed == ["INSERT", "INSERT", "INSERT"]
+        assert ref.id and maint.id and rem.id
+        assert rem.is_active is True                      # default lato client, restituito da RETURNING
+        # Nessuna ricarica all'accesso dopo il commit
+        assert (ref.total_km, maint.expense_type, rem.title) == (50000, "Tagliando", "Olio")
+        assert executed == ["INSERT", "INSERT", "INSERT"]
+
+    @pytest.mark.parametrize("write", ["refueling", "maintenance", "reminder"])
+    def test_updates_are_a_single_statement(self, app_session, write):
+        db, executed = app_session
+        ref, maint, rem = self._create_all(db)
+        executed.clear()
+
+        if write == "refueling":
+            assert crud.update_refueling(db, USER_ID, ref.id, {"total_cost": 95.0}).total_cost == 95.0
+        elif write == "maintenance":
+            assert crud.update_maintenance(db, USER_ID, maint.id, {"cost": 250.0}) is True
+        else:
+            assert crud.update_reminder(db, USER_ID, rem.id, "Olio motore", 1500, None, "") is True
+
+        assert executed == ["UPDATE"]
+
+    def test_updates_refresh_instances_in_session(self, app_session):
+        db, _ = app_session
+        ref, maint, _ = self._create_all(db)
+
+        crud.update_refueling(db, USER_ID, ref.id, {"notes": "Aggiornato"})
+        crud.update_maintenance(db, USER_ID, maint.id, {"cost": 250.0})
+
+        assert ref.notes == "Aggiornato" and maint.cost == 250.0
+
+    def test_update_wrong_user_returns_none(self, app_session):
+        db, executed = app_session
+        ref, _, _ = self._create_all(db)
+        executed.clear()
+
+        assert crud.update_refueling(db, OTHER_USER, ref.id, {"total_cost": 999.0}) is None
+        assert executed == ["UPDATE"]
+        assert crud.get_all_refuelings(db, USER_ID)[0].total_cost == 90.0
+
+    def test_update_settings_insert_then_update(self, app_session):
+        db, executed = app_session
+
+        first = crud.update_settings(db, USER_ID, 5.0, 120.0, 33.0, ["A"], ["B"])
+        assert executed == ["UPDATE", "INSERT"]          # nessuna riga: UPDATE a vuoto + INSERT
+        executed.clear()
+
+        second = crud.update_settings(db, USER_ID, 6.0, 130.0, 40.0, ["A", "C"], ["B"])
+        assert executed == ["UPDATE"]
+        assert second.id == first.id and second.reminder_types == ["A", "C"]
+        assert crud.get_settings(db, USER_ID).max_total_cost == 130.0
+
+    def test_expiring_session_still_returns_loaded_object(self, db_session):
+        """Sessioni con expire_on_commit=True: l'oggetto è ricaricato e resta usabile dopo close()."""
+        ref = crud.create_refueling(db_session, USER_ID, date(2025, 1, 1), 50000, 1.8, 90.0, 50.0, True)
+        db_session.close()
+        assert ref.total_km == 50000 and ref.id is not None
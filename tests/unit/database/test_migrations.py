@@ -0,0 +1,168 @@
+"""
+Tests per database/migrations.py e per gli indici composti dei modelli
+
+Copre: creazione idempotente degli indici su installazioni esistenti,
+       vincoli unique sulle chiavi naturali (rinviati se esistono duplicati pregressi),
+       piani di esecuzione (EXPLAIN QUERY PLAN su SQLite) delle query calde di crud.
+
+Esecuzione: pytest tests/unit/database/test_migrations.py -v
+"""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import create_engine, event, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from src.database import crud
+from src.database.migrations import MIGRATIONS, run_migrations, schema_migrations
+from src.database.models import Base, Refueling
+
+USER_ID = "test-user-uuid"
+
+COMPOSITE_INDEXES = {
+    "refuelings": {"ix_refuelings_user_date", "ix_refuelings_user_km"},
+    "maintenances": {"ix_maintenances_user_date", "ix_maintenances_user_km"},
+    "reminder_history": {"ix_reminder_history_user_date"},
+}
+
+NATURAL_KEY_INDEXES = {
+    "refuelings": {"uq_refuelings_user_date_km"},
+    "maintenances": {"uq_maintenances_user_date_km_type"},
+}
+
+
+def _index_names(engine, table):
+    return {ix["name"] for ix in inspect(engine).get_indexes(table)}
+
+
+# =============================================================================
+# TESTS: Runner
+# =============================================================================
+
+class TestRunMigrations:
+
+    @pytest.fixture
+    def legacy_engine(self, tmp_path):
+        """Schema 'vecchio': tabelle esistenti ma senza indici composti e vincoli unique."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            for names in (*COMPOSITE_INDEXES.values(), *NATURAL_KEY_INDEXES.values()):
+                for name in names:
+                    conn.execute(text(f"DROP INDEX {name}"))
+        yield engine
+        engine.dispose()
+
+    def test_creates_missing_indexes(self, legacy_engine):
+        applied = run_migrations(legacy_engine)
+
+        assert applied == [m_id for m_id, _ in MIGRATIONS]
+        for table, names in (*COMPOSITE_INDEXES.items(), *NATURAL_KEY_INDEXES.items()):
+            assert names <= _index_names(legacy_engine, table)
+
+    def test_natural_key_duplicates_defer_migration_without_data_loss(self, legacy_engine, caplog):
+        """Duplicati pregressi: nessun record eliminato, vincolo non creato, step ritentato al riavvio."""
+        row = {"user_id": USER_ID, "date": date(2024, 1, 1), "total_km": 1000,
+               "price_per_liter": 1.8, "liters": 50.0}
+        with legacy_engine.begin() as conn:
+            ids = [conn.execute(Refueling.__table__.insert().values(**row, total_cost=cost)).inserted_primary_key[0]
+                   for cost in (90.0, 91.0)]
+            conn.execute(Refueling.__table__.insert().values(**{**row, "total_km": 1500}, total_cost=95.0))
+
+        assert run_migrations(legacy_engine) == ["0001_composite_user_indexes"]
+
+        assert f"id: {ids[0]},{ids[1]}" in caplog.text
+        assert "uq_refuelings_user_date_km" not in _index_names(legacy_engine, "refuelings")
+        # La tabella senza conflitti riceve comunque il proprio vincolo
+        assert NATURAL_KEY_INDEXES["maintenances"] <= _index_names(legacy_engine, "maintenances")
+        with legacy_engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(Refueling)).scalar() == 3
+
+        # Duplicato risolto a mano: al riavvio lo step viene applicato
+        with legacy_engine.begin() as conn:
+            conn.execute(Refueling.__table__.delete().where(Refueling.id == ids[1]))
+        assert run_migrations(legacy_engine) == ["0002_natural_key_unique"]
+        with legacy_engine.connect() as conn, pytest.raises(IntegrityError):
+            conn.execute(Refueling.__table__.insert().values(**row, total_cost=99.0))
+
+    def test_is_idempotent(self, legacy_engine):
+        run_migrations(legacy_engine)
+        assert run_migrations(legacy_engine) == []
+
+    def test_step_recorded_by_concurrent_run_is_not_an_error(self, legacy_engine, monkeypatch):
+        """Un altro worker registra lo step mentre questo lo applica: nessun IntegrityError."""
+        def step_raced_by_other_worker(conn):
+            conn.execute(schema_migrations.insert().values(id="0099_raced", applied_at=datetime(2024, 1, 1)))
+
+        monkeypatch.setattr("src.database.migrations.MIGRATIONS",
+                            [*MIGRATIONS, ("0099_raced", step_raced_by_other_worker)])
+
+        assert run_migrations(legacy_engine) == [m_id for m_id, _ in MIGRATIONS]
+        with legacy_engine.connect() as conn:
+            assert conn.execute(select(func.count()).select_from(schema_migrations)).scalar() == len(MIGRATIONS) + 1
+
+    def test_fresh_schema_does_not_fail(self, tmp_path):
+        """Su un DB nuovo create_all ha già creato gli indici: lo step non deve esplodere."""
+        engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+        Base.metadata.create_all(bind=engine)
+        assert run_migrations(engine) == [m_id for m_id, _ in MIGRATIONS]
+        engine.dispose()
+
+
+# =============================================================================
+# TESTS: Piani di esecuzione
+# =============================================================================
+
+def _query_plans(db_session, call):
+    """Esegue call() catturando le SELECT emesse e ne ritorna i piani (EXPLAIN QUERY PLAN)."""
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    engine = db_session.get_bind()
+    event.listen(engine, "before_cursor_execute", _capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+
+    conn = db_session.connection().connection.driver_connection
+    return [
+        " | ".join(row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {stmt}", params).fetchall())
+        for stmt, params in captured
+    ]
+
+
+class TestQueryPlans:
+
+    @pytest.fixture(autouse=True)
+    def _data(self, db_session):
+        for i in range(5):
+            crud.create_refueling(db=db_session, user_id=USER_ID,
+                date_obj=date(2025, 1, 1 + i), total_km=50000 + i * 500,
+                price_per_liter=1.80, total_cost=90.0, liters=50.0, is_full_tank=True)
+        crud.log_reminder_execution(db_session, USER_ID, crud.create_reminder(
+            db=db_session, user_id=USER_ID, title="Olio", frequency_km=10000, frequency_days=None,
+            current_km=50000, current_date=date(2025, 1, 1)).id, date(2025, 2, 1), 51000)
+
+    @pytest.mark.parametrize("name, call, index", [
+        ("get_all_refuelings", lambda db: crud.get_all_refuelings(db, USER_ID), "ix_refuelings_user_date"),
+        ("get_last_refueling", lambda db: crud.get_last_refueling(db, USER_ID), "ix_refuelings_user_date"),
+        ("get_max_km", lambda db: crud.get_max_km(db, USER_ID), "ix_refuelings_user_km"),
+        # Il vincolo unique (user_id, date, total_km) ha lo stesso prefisso: il planner può preferirlo
+        ("get_neighbors", lambda db: crud.get_neighbors(db, USER_ID, date(2025, 1, 3)),
+         ("ix_refuelings_user_date", "uq_refuelings_user_date_km")),
+        ("get_all_maintenances", lambda db: crud.get_all_maintenances(db, USER_ID), "ix_maintenances_user_date"),
+        ("get_reminder_history", lambda db: crud.get_reminder_history(db, USER_ID), "ix_reminder_history_user_date"),
+    ])
+    def test_hot_queries_use_composite_index(self, db_session, name, call, index):
+        plans = _query_plans(db_session, lambda: call(db_session))
+        accepted = index if isinstance(index, tuple) else (index,)
+
+        assert plans, f"{name}: nessuna SELECT catturata"
+        for plan in plans:
+            assert any(ix in plan for ix in accepted), f"{name}: indice non usato → {plan}"
+            assert "TEMP B-TREE" not in plan, f"{name}: sort esplicito → {plan}"
@@ -0,0 +1,111 @@
+"""
+Tests per database/pool.py
+
+Copre: scelta del pool da [database.pool], gauge in-use/overflow,
+       latenza di checkout e conteggio timeout.
+Usa un file SQLite temporaneo (il pool in memoria resta quello di default).
+
+Esecuzione: pytest tests/unit/database/test_pool.py -v
+"""
+
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from src.database import pool as db_pool
+
+
+def _cfg_with(**values):
+    """Fake di cfg(): legge 'database.pool.<chiave>' da values, altrimenti fallback."""
+    def fake(key_path, fallback=None):
+        return values.get(key_path.rsplit(".", 1)[-1], fallback)
+    return fake
+
+
+@pytest.fixture
+def db_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'pool.db'}"
+
+
+# =============================================================================
+# TESTS: Configurazione
+# =============================================================================
+
+class TestEngineOptions:
+
+    def test_queue_mode_uses_configured_sizes(self, db_url):
+        with patch.object(db_pool, "cfg", _cfg_with(mode="queue", size=3, max_overflow=2,
+                                                     recycle_seconds=60, timeout_seconds=1)):
+            opts = db_pool.engine_options(db_url)
+
+        assert opts["poolclass"] is db_pool.TimedQueuePool
+        assert (opts["pool_size"], opts["max_overflow"], opts["pool_recycle"]) == (3, 2, 60)
+        assert opts["pool_timeout"] == 1.0
+
+    def test_pgbouncer_mode_disables_app_pool(self, db_url):
+        with patch.object(db_pool, "cfg", _cfg_with(mode="pgbouncer")):
+            opts = db_pool.engine_options(db_url)
+        assert opts == {"poolclass": db_pool.TimedNullPool, "pool_pre_ping": False}
+
+    def test_invalid_mode_falls_back_to_queue(self, db_url):
+        with patch.object(db_pool, "cfg", _cfg_with(mode="boh")):
+            assert db_pool.engine_options(db_url)["poolclass"] is db_pool.TimedQueuePool
+
+    def test_sqlite_memory_keeps_dialect_default(self):
+        assert db_pool.engine_options("sqlite:///:memory:") == {}
+
+
+# =============================================================================
+# TESTS: Gauge e latenza
+# =============================================================================
+
+class TestPoolStats:
+
+    def test_in_use_and_overflow_gauges(self, db_url):
+        with patch.object(db_pool, "cfg", _cfg_with(mode="queue", size=1, max_overflow=1)):
+            engine = db_pool.build_engine(db_url)
+
+        c1 = engine.connect()
+        c2 = engine.connect()
+        stats = db_pool.pool_stats(engine)
+        assert stats["in_use"] == 2
+        assert stats["overflow"] == 1
+        assert stats["checkouts"] == 2
+        assert stats["avg_checkout_ms"] >= 0.0
+
+        c1.close()
+        c2.close()
+        stats = db_pool.pool_stats(engine)
+        assert stats["in_use"] == 0
+        assert stats["peak_in_use"] == 2
+        engine.dispose()
+
+    def test_connections_are_reused(self, db_url):
+        with patch.object(db_pool, "cfg", _cfg_with(mode="queue", size=2)):
+            engine = db_pool.build_engine(db_url)
+
+        for _ in range(5):
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+        stats = db_pool.pool_stats(engine)
+        assert stats["checkouts"] == 5
+        assert stats["idle"] == 1  # una sola connessione fisica riusata
+        engine.dispose()
+
+    def test_timeout_is_counted(self, db_url):
+        with patch.object(db_pool, "cfg", _cfg_with(mode="queue", size=1, max_overflow=0,
+                                                     timeout_seconds=0.05)):
+            engine = db_pool.build_engine(db_url)
+
+        held = engine.connect()
+        with pytest.raises(PoolTimeoutError):
+            engine.connect()
+        assert db_pool.pool_stats(engine)["timeouts"] == 1
+        held.close()
+
+        # Dopo dispose() il pool ricreato mantiene gli stessi contatori
+        engine.dispose()
+        assert db_pool.pool_stats(engine)["timeouts"] == 1
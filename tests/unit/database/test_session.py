@@ -0,0 +1,122 @@
+"""
+Tests per database/session.py — sessioni per script run e rilevamento dei leak
+
+Copre: riuso della sessione nei blocchi annidati, chiusura e ritorno al pool
+       anche su eccezioni di controllo (rerun/stop), conteggio delle sessioni
+       aperte in parallelo, leak per thread terminato, per età e per garbage collection.
+
+Esecuzione: pytest tests/unit/database/test_session.py -v
+"""
+
+import gc
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from src.database.session import SessionProvider
+
+
+class _Rerun(BaseException):
+    """Come RerunException/StopException di Streamlit: non deriva da Exception."""
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sessions.sqlite3'}")
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def provider(engine):
+    return SessionProvider(engine, autoflush=False)
+
+
+# =============================================================================
+# TESTS: Scope per run
+# =============================================================================
+
+class TestRunScope:
+
+    def test_nested_blocks_share_session(self, provider, engine):
+        with provider.session() as outer:
+            outer.execute(text("SELECT 1"))
+            with provider.session() as inner:
+                assert inner is outer
+            # L'uscita dal blocco annidato non chiude la sessione
+            assert provider.stats()["open"] == 1 and engine.pool.checkedout() == 1
+
+        assert provider.stats() == {"open": 0, "peak_open": 1, "opened": 1, "leaked": 0}
+        assert engine.pool.checkedout() == 0
+
+    def test_closed_on_control_flow_exception(self, provider, engine):
+        with pytest.raises(_Rerun):
+            with provider.session() as db:
+                db.execute(text("SELECT 1"))
+                raise _Rerun()
+
+        assert provider.stats()["open"] == 0 and engine.pool.checkedout() == 0
+        # Il run successivo riceve una sessione nuova
+        with provider.session() as db:
+            assert db is not None
+        assert provider.stats()["opened"] == 2
+
+    def test_concurrent_runs_counted(self, provider):
+        inside, release = threading.Barrier(3), threading.Event()
+
+        def run():
+            with provider.session():
+                inside.wait()
+                release.wait()
+
+        threads = [threading.Thread(target=run) for _ in range(2)]
+        for t in threads:
+            t.start()
+        inside.wait()
+        assert provider.stats()["open"] == 2
+        release.set()
+        for t in threads:
+            t.join()
+
+        assert provider.stats() == {"open": 0, "peak_open": 2, "opened": 2, "leaked": 0}
+
+
+# =============================================================================
+# TESTS: Leak
+# =============================================================================
+
+class TestLeakDetection:
+
+    def test_session_outliving_its_thread(self, provider, engine, caplog):
+        held = []
+
+        def run():
+            db = provider.open()               # come next(get_db()) senza close()
+            db.execute(text("SELECT 1"))
+            held.append(db)
+
+        t = threading.Thread(target=run, name="ScriptRunner.scriptThread")
+        t.start()
+        t.join()
+        assert engine.pool.checkedout() == 1
+
+        stats = provider.stats()
+        assert (stats["leaked"], stats["open"]) == (1, 0)
+        assert engine.pool.checkedout() == 0          # chiusa dallo sweep
+        assert "ScriptRunner.scriptThread" in caplog.text
+
+    def test_session_open_too_long(self, engine):
+        now = [0.0]
+        provider = SessionProvider(engine, leak_after_seconds=10, clock=lambda: now[0])
+        with provider.session():
+            now[0] = 11.0
+            assert provider.sweep() == 1
+            assert provider.sweep() == 0           # segnalata una sola volta
+            assert provider.stats()["open"] == 1   # thread vivo: non viene chiusa
+        assert provider.stats() == {"open": 0, "peak_open": 1, "opened": 1, "leaked": 1}
+
+    def test_garbage_collected_without_close(self, provider):
+        provider.open()
+        gc.collect()
+        assert provider.stats()["leaked"] == 1 and provider.stats()["open"] == 0
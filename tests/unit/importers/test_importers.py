@@ -5,15 +5,20 @@ Copertura: utils, fuel importer, maintenance importer, manager.
 Esecuzione: pytest tests/unit/importers/test_importers.py -v
 """
 
+import tracemalloc
+
 import pytest
 import pandas as pd
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import sys, os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../')))
 
-from src.services.data.importers.utils import clean_column_names, parse_date, parse_float, parse_int
+from src.services.data.importers.utils import (
+    clean_column_names, parse_date, parse_float, parse_int,
+    parse_date_column, parse_float_column, parse_int_column, parse_typed_columns
+)
 from src.services.data.importers import fuel as fuel_importer
 from src.services.data.importers import maintenance as maint_importer
 from src.services.data.importers import manager
@@ -162,6 +167,40 @@ class TestParseInt:
         assert result == 45  # Non 45000 — limitazione nota
 
 
+class TestParseColumns:
+    """Parsing vettoriale: stessi risultati delle funzioni scalari, cella per cella."""
+
+    DATES = ["2024-03-15", "15/03/2024", "15-03-2024", "2024-3-5", "2024-03-15 10:30:00",
+             datetime(2024, 3, 15, 10, 30), date(2024, 1, 1), pd.Timestamp("2024-03-15"),
+             None, float('nan'), "non-una-data", "32/13/2024", 45000, "3000-01-01", ""]
+    NUMBERS = [1.75, "1,75", float('nan'), None, "123.45", "non-numero", " 2 ", "1_000",
+               True, 45000, "45.000", "45000,9", "", -3.7]
+
+    def test_date_column_matches_scalar(self):
+        # Indice non standard (come dopo il data_editor) per verificare il lavoro posizionale
+        s = pd.Series(self.DATES, dtype=object, index=[7] * len(self.DATES))
+        assert parse_date_column(s).tolist() == [parse_date(v) for v in self.DATES]
+
+    def test_datetime64_column(self):
+        s = pd.Series(pd.to_datetime(["2024-03-15 10:00", None]))
+        assert parse_date_column(s).tolist() == [date(2024, 3, 15), None]
+
+    def test_float_and_int_columns_match_scalar(self):
+        s = pd.Series(self.NUMBERS, dtype=object)
+        assert parse_float_column(s).tolist() == [parse_float(v) for v in self.NUMBERS]
+        assert parse_int_column(s).tolist() == [parse_int(v) for v in self.NUMBERS]
+
+    def test_typed_columns_fill_missing(self):
+        typed = parse_typed_columns(pd.DataFrame({"km": ["1,5"]}),
+                                    dates=["data"], floats=["costo"], ints=["km"])
+        assert typed.to_dict("records") == [{"km": 1, "data": None, "costo": 0.0}]
+
+    def test_benchmark_parity(self):
+        """Il benchmark (50k righe di default) verifica internamente la parità dei due percorsi."""
+        from src.scripts.bench_import_parsing import run
+        assert run(2_000)["rows"] == 2_000
+
+
 # =============================================================================
 # TESTS: fuel.py — Logica Parse e Validazione
 # =============================================================================
@@ -369,6 +408,72 @@ class TestFuelValidation:
         assert result.iloc[0]["Costo"] == pytest.approx(87.5)
 
 
+class TestFuelTimelineIndex:
+    """Lookup su timeline ordinata (bisect): stessi risultati della scansione lineare originale."""
+
+    @staticmethod
+    def _legacy_neighbors(d_date, sorted_history):
+        prev_rec = next_rec = None
+        for r in sorted_history:
+            if r.date < d_date: prev_rec = r
+            elif r.date > d_date:
+                next_rec = r
+                break
+        return prev_rec, next_rec
+
+    def test_sandwich_check_matches_linear_scan(self):
+        import random
+        from types import SimpleNamespace
+        rng = random.Random(3)
+        history = sorted(
+            (SimpleNamespace(id=i, date=date(2024, 1, 1) + timedelta(days=rng.randint(0, 60)),
+                             total_km=rng.randint(1000, 9000)) for i in range(120)),
+            key=lambda x: (x.date, x.total_km)
+        )
+        dates = [r.date for r in history]
+
+        for _ in range(300):
+            d_date = date(2023, 12, 25) + timedelta(days=rng.randint(0, 75))
+            d_km = rng.randint(500, 9500)
+            prev_rec, next_rec = self._legacy_neighbors(d_date, history)
+            expected_notes = []
+            expected = "Nuovo"
+            if prev_rec and d_km <= prev_rec.total_km:
+                expected_notes, expected = [f"Km ≤ del {prev_rec.date} ({prev_rec.total_km})"], "Errore"
+            elif next_rec and d_km >= next_rec.total_km:
+                expected_notes, expected = [f"Km ≥ del {next_rec.date} ({next_rec.total_km})"], "Errore"
+
+            notes = []
+            assert fuel_importer._sandwich_check(d_date, d_km, history, dates, notes, "Nuovo") == expected
+            assert notes == expected_notes
+
+    def test_large_import_scales(self):
+        """3.000 record a DB + 3.000 righe nel file: validazione in tempi interattivi."""
+        import time
+        from types import SimpleNamespace
+        start_day = date(2000, 1, 1)
+        history = [
+            SimpleNamespace(id=i, date=start_day + timedelta(days=i), total_km=10000 + i * 500,
+                            total_cost=50.0, price_per_liter=1.75, is_full_tank=True, notes="", liters=28.57)
+            for i in range(3000)
+        ]
+        n = 3000
+        df = pd.DataFrame({
+            "data": [start_day + timedelta(days=3000 + i) for i in range(n)],
+            "km": [10000 + (3000 + i) * 500 for i in range(n)],
+            "prezzo": [1.75] * n, "costo": [50.0] * n, "pieno": [True] * n,
+        })
+        with patch('src.services.data.importers.fuel.crud') as mock_crud:
+            mock_crud.get_settings.return_value = _make_settings()
+            mock_crud.get_all_refuelings.return_value = history
+            t0 = time.perf_counter()
+            result = fuel_importer.validate_fuel_logic(MagicMock(), USER_ID, df)
+            elapsed = time.perf_counter() - t0
+
+        assert (result["Stato"] == "Nuovo").all()
+        assert elapsed < 10.0
+
+
 class TestFuelSaveRow:
     """Test per save_row: routing Create/Update."""
 
@@ -547,6 +652,105 @@ class TestMaintenanceSaveRow:
             mock_crud.update_maintenance.assert_not_called()
 
 
+class TestBulkSaveRows:
+    """save_rows: stesso routing di save_row, un'unica transazione sul DB reale (SQLite)."""
+
+    def _fuel_df(self):
+        return pd.DataFrame([
+            {"Stato": "Nuovo", "db_id": None, "Data": pd.Timestamp(2024, 1, 15), "Km": 50000,
+             "Prezzo": 1.75, "Costo": 87.5, "Litri": 50.0, "Pieno": True, "Note_User": float("nan")},
+            {"Stato": "Warning", "db_id": None, "Data": pd.Timestamp(2024, 2, 1), "Km": 50600,
+             "Prezzo": 1.8, "Costo": 250.0, "Litri": 138.9, "Pieno": True, "Note_User": "Alto"},
+            {"Stato": "Errore", "db_id": None, "Data": None, "Km": None,
+             "Prezzo": None, "Costo": None, "Litri": None, "Pieno": False, "Note_User": None},
+        ])
+
+    def test_fuel_saves_and_reports_progress(self, db_session):
+        from src.database import crud
+        progress = []
+        saved = fuel_importer.save_rows(db_session, USER_ID, self._fuel_df(),
+                                        on_progress=lambda d, t: progress.append((d, t)))
+
+        records = crud.get_all_refuelings(db_session, USER_ID)
+        assert saved == 2
+        assert [r.total_km for r in records] == [50600, 50000]
+        assert records[1].date == date(2024, 1, 15) and records[1].notes is None
+        assert progress[-1] == (2, 2)
+
+    def test_fuel_update_and_insert_in_one_batch(self, db_session):
+        from src.database import crud
+        existing = crud.create_refueling(db_session, USER_ID, date(2024, 1, 1), 49000,
+                                         1.7, 85.0, 50.0, True, "old")
+        df = pd.DataFrame([
+            {"Stato": "Modifica", "db_id": existing.id, "Data": pd.Timestamp(2024, 1, 1), "Km": 49000,
+             "Prezzo": 1.7, "Costo": 90.0, "Litri": 52.9, "Pieno": False, "Note_User": "new"},
+            {"Stato": "Nuovo", "db_id": None, "Data": pd.Timestamp(2024, 1, 15), "Km": 50000,
+             "Prezzo": 1.75, "Costo": 87.5, "Litri": 50.0, "Pieno": True, "Note_User": ""},
+        ])
+        assert fuel_importer.save_rows(db_session, USER_ID, df) == 2
+
+        records = {r.id: r for r in crud.get_all_refuelings(db_session, USER_ID)}
+        assert len(records) == 2
+        assert (records[existing.id].total_cost, records[existing.id].is_full_tank,
+                records[existing.id].notes) == (90.0, False, "new")
+
+    def test_fuel_failure_rolls_back_whole_import(self, db_session):
+        """Un errore dopo la scrittura dell'upsert annulla l'intero import (modifiche incluse)."""
+        from src.database import crud
+        existing = crud.create_refueling(db_session, USER_ID, date(2024, 1, 1), 49000,
+                                         1.7, 85.0, 50.0, True, "old")
+        df = pd.DataFrame([
+            {"Stato": "Modifica", "db_id": existing.id, "Data": pd.Timestamp(2024, 1, 1), "Km": 49000,
+             "Prezzo": 1.7, "Costo": 90.0, "Litri": 52.9, "Pieno": True, "Note_User": "new"},
+            {"Stato": "Nuovo", "db_id": None, "Data": pd.Timestamp(2024, 1, 15), "Km": 50000,
+             "Prezzo": 1.75, "Costo": 87.5, "Litri": 50.0, "Pieno": True, "Note_User": ""},
+        ])
+        def _boom(done, total):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            fuel_importer.save_rows(db_session, USER_ID, df, on_progress=_boom)
+
+        records = crud.get_all_refuelings(db_session, USER_ID)
+        assert len(records) == 1
+        assert (records[0].total_cost, records[0].notes) == (85.0, "old")
+
+    def test_maintenance_skips_errors_and_saves_new(self, db_session):
+        from src.database import crud
+        df = pd.DataFrame([
+            {"Stato": "Nuovo", "db_id": None, "Data": pd.Timestamp(2024, 3, 1), "Km": 52000,
+             "Tipo": "Tagliando", "Costo": 300.0, "Descrizione": float("nan")},
+            {"Stato": "Errore", "db_id": None, "Data": None, "Km": float("nan"),
+             "Tipo": None, "Costo": None, "Descrizione": None},
+        ])
+        assert maint_importer.save_rows(db_session, USER_ID, df) == 1
+        rec = crud.get_all_maintenances(db_session, USER_ID)[0]
+        assert (rec.date, rec.expense_type, rec.description) == (date(2024, 3, 1), "Tagliando", None)
+
+    def test_fuel_reimport_updates_by_natural_key(self, db_session):
+        """Righe già presenti (stessa data e km) aggiornate senza db_id né record duplicati."""
+        from src.database import crud
+        fuel_importer.save_rows(db_session, USER_ID, self._fuel_df())
+        df = self._fuel_df().iloc[:2].assign(Stato="Modifica", db_id=None, Costo=[88.0, 251.0])
+
+        assert fuel_importer.save_rows(db_session, USER_ID, df) == 2
+
+        records = crud.get_all_refuelings(db_session, USER_ID)
+        assert [(r.total_km, r.total_cost) for r in records] == [(50600, 251.0), (50000, 88.0)]
+
+    def test_maintenance_new_row_matching_existing_is_not_duplicated(self, db_session):
+        from src.database import crud
+        crud.create_maintenance(db_session, USER_ID, date(2024, 3, 1), 52000, "Tagliando", 280.0)
+        df = pd.DataFrame([
+            {"Stato": "Nuovo", "db_id": None, "Data": pd.Timestamp(2024, 3, 1), "Km": 52000,
+             "Tipo": "Tagliando", "Costo": 300.0, "Descrizione": "Filtri"},
+        ])
+        assert maint_importer.save_rows(db_session, USER_ID, df) == 1
+
+        recs = crud.get_all_maintenances(db_session, USER_ID)
+        assert [(r.cost, r.description) for r in recs] == [(300.0, "Filtri")]
+
+
 # =============================================================================
 # TESTS: manager.py — Orchestrazione
 # =============================================================================
@@ -622,6 +826,58 @@ class TestManager:
         assert "maintenance" in result
 
 
+class TestManagerWorkbook:
+    """Lettura reale di un .xlsx: workbook aperto una volta, modalità streaming, metriche."""
+
+    @staticmethod
+    def _xlsx(name="import.xlsx"):
+        import io
+        buf = io.BytesIO()
+        with pd.ExcelWriter(buf, engine="xlsxwriter") as writer:
+            pd.DataFrame({"Data": ["2024-01-15", "2024-02-01"], "Km": [50000, 50600],
+                          "Prezzo": [1.75, 1.8], "Costo": [87.5, 90.0]}).to_excel(writer, sheet_name="Rifornimenti", index=False)
+            pd.DataFrame({"Data": ["2024-03-01"], "Km": [51000], "Tipo": ["Tagliando"],
+                          "Costo": [300.0]}).to_excel(writer, sheet_name="Manutenzione", index=False)
+        buf.seek(0)
+        buf.name = name
+        return buf
+
+    def _parse(self, **kwargs):
+        with patch('src.services.data.importers.fuel.crud') as fuel_crud, \
+             patch('src.services.data.importers.maintenance.crud') as maint_crud:
+            fuel_crud.get_settings.return_value = _make_settings()
+            fuel_crud.get_all_refuelings.return_value = []
+            maint_crud.get_all_maintenances.return_value = []
+            return manager.parse_upload_file(MagicMock(), USER_ID, self._xlsx(), **kwargs)
+
+    def test_workbook_opened_once(self):
+        with patch('src.services.data.importers.manager.pd.ExcelFile', wraps=pd.ExcelFile) as spy:
+            result = self._parse(streaming=False)
+        assert spy.call_count == 1
+        assert len(result["fuel"][0]) == 2
+        assert len(result["maintenance"][0]) == 1
+
+    def test_streaming_matches_pandas(self):
+        classic = self._parse(streaming=False)
+        streamed = self._parse(streaming=True)
+        for key in ("fuel", "maintenance"):
+            pd.testing.assert_frame_equal(classic[key][0], streamed[key][0], check_dtype=False)
+        assert streamed["stats"]["mode"] == "streaming"
+
+    def test_stats_reported(self):
+        stats = self._parse()["stats"]
+        assert stats["mode"] == "pandas"  # file piccolo: sotto la soglia di streaming
+        assert stats["read_seconds"] >= 0 and stats["validate_seconds"] >= 0
+        assert "peak_memory_mb" not in stats  # tracemalloc spento nel percorso normale
+        assert not tracemalloc.is_tracing()
+
+    def test_memory_traced_only_with_debug_flag(self, monkeypatch):
+        monkeypatch.setattr(manager, "cfg", lambda key, fallback=None: True if key == "import.trace_memory" else fallback)
+        stats = self._parse()["stats"]
+        assert stats["peak_memory_mb"] > 0
+        assert not tracemalloc.is_tracing()
+
+
 # =============================================================================
 # TESTS: Nuove Validazioni (data futura, km/L anomalo)
 # =============================================================================
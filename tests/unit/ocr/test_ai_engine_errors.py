@@ -68,6 +68,49 @@ class TestClientNotConfigured:
             engine.client = original_client
 
 
+# =============================================================================
+# TEST: Inizializzazione Lazy del Client
+# =============================================================================
+
+@pytest.fixture
+def lazy_client(monkeypatch):
+    """Client non ancora risolto e chiave dei secrets controllata dal test."""
+    key = {"value": None}
+    monkeypatch.setattr(engine, "client", engine._UNSET)
+    monkeypatch.setattr(engine, "_api_key", lambda: key["value"])
+    return key
+
+
+class TestLazyClient:
+
+    def test_module_import_does_not_load_openai(self):
+        """Importare il registro motori (come fa la UI) non deve caricare l'SDK OpenAI."""
+        import subprocess
+        import sys
+        code = "import sys, src.services.ocr.engines; print('openai' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        assert out.stdout.strip().splitlines()[-1] == "False"
+
+    def test_is_enabled_checks_config_without_building_client(self, lazy_client):
+        assert engine.is_openai_enabled() is False
+        lazy_client["value"] = "sk-test"
+        with patch("openai.OpenAI") as mock_cls:
+            assert engine.is_openai_enabled() is True
+        mock_cls.assert_not_called()
+        assert engine.client is engine._UNSET
+
+    def test_client_built_once_on_first_use(self, lazy_client):
+        lazy_client["value"] = "sk-test"
+        with patch("openai.OpenAI") as mock_cls:
+            first, second = engine.get_client(), engine.get_client()
+        assert first is second is mock_cls.return_value
+        mock_cls.assert_called_once_with(api_key="sk-test", max_retries=0)
+
+    def test_missing_key_resolves_to_none(self, lazy_client):
+        assert engine.get_client() is None
+        assert "mancante" in engine.analyze_receipt(_fake_file()).raw_text
+
+
 # =============================================================================
 # TEST: Errori API OpenAI
 # =============================================================================
@@ -0,0 +1,173 @@
+"""
+Tests per ocr/batch.py (scansione multipla) e per lo staging 'receipt_scans'
+
+Copre: token bucket, parallelismo limitato, esiti restituiti appena pronti,
+       un'immagine in errore non ferma il batch, scrittura nello staging durante
+       la scansione, conversione nel formato dell'importer Rifornimenti.
+
+Esecuzione: pytest tests/unit/ocr/test_batch.py -v
+"""
+
+import threading
+import time
+from datetime import date
+from unittest.mock import patch
+
+from src.database import crud
+from src.services.data.importers import fuel
+from src.services.ocr import batch
+from src.services.ocr.batch import ReceiptUpload, TokenBucket, scan_and_stage, scan_receipts, staged_fuel_frame
+from src.services.ocr.models import ReceiptData
+
+USER_ID = "test-user-uuid"
+
+
+def _uploads(n):
+    return [ReceiptUpload(f"scontrino_{i}.jpg", f"img-{i}".encode()) for i in range(n)]
+
+
+def _fake_scan(delays=None, fail=()):
+    """process_receipt_image finto: latenza per immagine e misura della concorrenza."""
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def scan(buffer):
+        name = buffer.read().decode()
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep((delays or {}).get(name, 0.05))
+        with lock:
+            state["active"] -= 1
+        if name in fail:
+            raise ValueError("immagine corrotta")
+        i = int(name.split("-")[1])
+        return ReceiptData(date=date(2025, 1, 1 + i), total_cost=50.0 + i, price_per_liter=1.8,
+                           liters=round((50.0 + i) / 1.8, 2), station_name="Eni",
+                           scan_stats={"engine": "openai"})
+
+    return scan, state
+
+
+# =============================================================================
+# TESTS: Token bucket
+# =============================================================================
+
+class TestTokenBucket:
+
+    def test_burst_then_paced(self):
+        now = [0.0]
+        sleeps = []
+
+        def fake_sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+
+        bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: now[0], sleep=fake_sleep)
+        waits = [bucket.acquire() for _ in range(4)]
+
+        assert waits[:2] == [0.0, 0.0]           # raffica iniziale
+        assert waits[2:] == [0.5, 0.5]           # poi 1 token ogni 1/rate secondi
+        assert now[0] == 1.0
+
+    def test_refill_capped_at_burst(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=1.0, burst=2, clock=lambda: now[0], sleep=lambda s: None)
+        bucket.acquire(), bucket.acquire()
+        now[0] = 100.0                           # lungo inattività: al più 'burst' token
+        assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+        assert bucket._tokens < 1
+
+
+# =============================================================================
+# TESTS: Scansione parallela
+# =============================================================================
+
+class TestScanReceipts:
+
+    def test_bounded_concurrency(self):
+        scan, state = _fake_scan()
+        with patch.object(batch, "process_receipt_image", side_effect=scan):
+            start = time.perf_counter()
+            results = list(scan_receipts(_uploads(8), max_workers=4, rate_per_minute=0))
+            elapsed = time.perf_counter() - start
+
+        assert len(results) == 8 and all(r.ok for r in results)
+        assert state["peak"] == 4
+        assert elapsed < 8 * 0.05 * 0.75   # ben sotto la somma seriale
+
+    def test_results_streamed_as_completed(self):
+        scan, _ = _fake_scan(delays={"img-0": 0.3, "img-1": 0.01})
+        with patch.object(batch, "process_receipt_image", side_effect=scan):
+            names = [r.upload.name for r in scan_receipts(_uploads(2), max_workers=2, rate_per_minute=0)]
+        assert names == ["scontrino_1.jpg", "scontrino_0.jpg"]
+
+    def test_failure_isolated(self):
+        scan, _ = _fake_scan(fail={"img-1"})
+        with patch.object(batch, "process_receipt_image", side_effect=scan):
+            results = {r.upload.name: r for r in scan_receipts(_uploads(3), max_workers=3, rate_per_minute=0)}
+
+        assert not results["scontrino_1.jpg"].ok
+        assert "immagine corrotta" in results["scontrino_1.jpg"].data.raw_text
+        assert results["scontrino_0.jpg"].ok and results["scontrino_2.jpg"].ok
+
+    def test_rate_limit_applied(self):
+        scan, _ = _fake_scan(delays={})
+        with patch.object(batch, "process_receipt_image", side_effect=scan):
+            start = time.perf_counter()
+            results = list(scan_receipts(_uploads(3), max_workers=3, rate_per_minute=600, burst=1))
+            elapsed = time.perf_counter() - start
+
+        # 10 scansioni/s con raffica 1: la terza parte dopo ~0.2 s
+        assert elapsed >= 0.18
+        assert sum(r.waited > 0 for r in results) == 2
+
+    def test_empty(self):
+        assert list(scan_receipts([])) == []
+
+
+# =============================================================================
+# TESTS: Staging e importer
+# =============================================================================
+
+class TestStaging:
+
+    def test_each_result_staged_while_scanning(self, db_session):
+        scan, _ = _fake_scan(fail={"img-2"})
+        staged_counts = []
+
+        def on_result(result, done, total):
+            staged_counts.append(len(crud.get_receipt_scans(db_session, USER_ID)))
+
+        with patch.object(batch, "process_receipt_image", side_effect=scan):
+            batch_id = scan_and_stage(db_session, USER_ID, _uploads(3), on_result=on_result,
+                                      max_workers=2, rate_per_minute=0)
+
+        assert staged_counts == [1, 2, 3]
+        scans = crud.get_receipt_scans(db_session, USER_ID, batch_id)
+        assert len(scans) == 3
+        assert sum(1 for s in scans if s.error) == 1
+        ok = next(s for s in scans if s.file_name == "scontrino_0.jpg")
+        assert (ok.total_cost, ok.engine, ok.date) == (50.0, "openai", date(2025, 1, 1))
+
+        assert crud.delete_receipt_scans(db_session, USER_ID, "other-batch") == 0
+        assert crud.delete_receipt_scans(db_session, USER_ID) == 3
+
+    def test_staged_rows_feed_fuel_importer(self, db_session):
+        scan, _ = _fake_scan(fail={"img-1"})
+        with patch.object(batch, "process_receipt_image", side_effect=scan):
+            scan_and_stage(db_session, USER_ID, _uploads(3), max_workers=3, rate_per_minute=0)
+
+        frame = staged_fuel_frame(crud.get_receipt_scans(db_session, USER_ID))
+        assert list(frame.columns) == batch.FUEL_IMPORT_COLUMNS
+        assert len(frame) == 2 and set(frame['note']) == {"Eni"}
+
+        # Km assenti sugli scontrini: righe bloccate finché non vengono inseriti
+        df, err = fuel.process_fuel_data(db_session, USER_ID, frame)
+        assert err is None
+        assert set(df['Stato']) == {"Errore"}
+
+        frame = frame.sort_values('data').assign(km=[10000, 10500])
+        df = fuel.validate_fuel_logic(db_session, USER_ID, frame)
+        assert list(df['Stato']) == ["Nuovo", "Nuovo"]
+        assert fuel.save_rows(db_session, USER_ID, df) == 2
@@ -0,0 +1,146 @@
+"""
+Tests per ocr/cache.py e per l'uso della cache in pipeline.process_receipt_image
+
+Copre: LRU in memoria, livello SQLite persistente tra istanze, limite righe,
+       confronto percettivo (dHash), scansioni duplicate senza chiamate al motore,
+       errori non cachati.
+
+Esecuzione: pytest tests/unit/ocr/test_cache.py -v
+"""
+
+import io
+import os
+from datetime import date
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from src.services.ocr import pipeline
+from src.services.ocr.cache import OcrCache, perceptual_hash
+from src.services.ocr.models import ReceiptData
+
+RESULT = ReceiptData(date=date(2025, 3, 14), total_cost=62.5, price_per_liter=1.789,
+                     liters=34.94, station_name="Eni", raw_text="{}")
+
+
+def _receipt(quality=90, seed=0):
+    """Scontrino sintetico (carta chiara con righe di testo) codificato in JPEG."""
+    rng = np.random.default_rng(seed)
+    img = Image.fromarray(rng.integers(230, 250, size=(400, 300), dtype=np.uint8), "L")
+    draw = ImageDraw.Draw(img)
+    for i, y in enumerate(range(30, 370, 40)):
+        draw.rectangle((30, y, 120 + 15 * i, y + 15), fill=20)
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality)
+    return out.getvalue()
+
+
+# =============================================================================
+# TESTS: OcrCache
+# =============================================================================
+
+class TestOcrCache:
+
+    def test_roundtrip_returns_independent_copy(self):
+        c = OcrCache()
+        c.store(b"img", RESULT)
+
+        found, tier = c.lookup(b"img")
+        assert tier == "memory" and found == RESULT and found is not RESULT
+        found.scan_stats["x"] = 1
+        assert c.lookup(b"img")[0].scan_stats == {}
+
+    def test_miss(self):
+        c = OcrCache()
+        assert c.lookup(b"img") == (None, None)
+        assert c.stats()["misses"] == 1
+
+    def test_memory_lru_evicts_least_recent(self):
+        c = OcrCache(max_entries=2)
+        c.store(b"a", RESULT)
+        c.store(b"b", RESULT)
+        c.lookup(b"a")            # 'a' diventa la più recente
+        c.store(b"c", RESULT)     # esce 'b'
+
+        assert c.lookup(b"b") == (None, None)
+        assert c.lookup(b"a")[1] == "memory"
+
+    def test_sqlite_tier_survives_new_instance(self, tmp_path):
+        path = str(tmp_path / "ocr" / "cache.sqlite3")
+        OcrCache(sqlite_path=path).store(b"img", RESULT)
+
+        fresh = OcrCache(sqlite_path=path)
+        assert fresh.lookup(b"img") == (RESULT, "sqlite")
+        assert fresh.lookup(b"img") == (RESULT, "memory")   # promossa in memoria
+
+    def test_sqlite_tier_is_row_bounded(self, tmp_path):
+        path = str(tmp_path / "cache.sqlite3")
+        c = OcrCache(max_entries=1, sqlite_path=path, sqlite_max_entries=2)
+        for key in (b"a", b"b", b"c"):
+            c.store(key, RESULT)
+
+        fresh = OcrCache(sqlite_path=path)
+        assert fresh.lookup(b"a") == (None, None)
+        assert fresh.lookup(b"c")[1] == "sqlite"
+
+    def test_unavailable_sqlite_falls_back_to_memory(self, tmp_path):
+        blocker = tmp_path / "file"
+        blocker.write_text("x")
+        c = OcrCache(sqlite_path=os.path.join(str(blocker), "cache.sqlite3"))
+
+        c.store(b"img", RESULT)
+        assert c.lookup(b"img")[1] == "memory"
+
+    def test_perceptual_match_on_recompressed_photo(self, tmp_path):
+        original, recompressed = _receipt(quality=90), _receipt(quality=60)
+        assert original != recompressed
+
+        exact = OcrCache()
+        exact.store(original, RESULT)
+        assert exact.lookup(recompressed) == (None, None)
+
+        path = str(tmp_path / "cache.sqlite3")
+        OcrCache(sqlite_path=path, perceptual=True).store(original, RESULT)
+        similar = OcrCache(sqlite_path=path, perceptual=True)
+        assert similar.lookup(recompressed) == (RESULT, "sqlite")
+        assert similar.lookup(recompressed) == (RESULT, "memory")
+
+    def test_perceptual_hash(self):
+        assert perceptual_hash(b"not an image") is None
+        assert 0 <= perceptual_hash(_receipt()) < 2 ** 64
+
+
+# =============================================================================
+# TESTS: Pipeline
+# =============================================================================
+
+class TestPipelineCache:
+
+    def test_duplicate_scan_skips_engine(self, ocr_cache):
+        raw = _receipt()
+        with patch.object(pipeline, "analyze_with_engines", return_value=(RESULT, "openai")) as engine:
+            first = pipeline.process_receipt_image(io.BytesIO(raw))
+            second = pipeline.process_receipt_image(io.BytesIO(raw))
+
+        assert engine.call_count == 1
+        assert first.scan_stats["cache"] is None
+        assert second.scan_stats["cache"] == "memory"
+        assert second.total_cost == first.total_cost == 62.5
+
+    def test_failed_read_not_cached(self, ocr_cache):
+        failure = ReceiptData(raw_text="Errore di connessione.")
+        with patch.object(pipeline, "analyze_with_engines", return_value=(failure, "openai")) as engine:
+            pipeline.process_receipt_image(io.BytesIO(b"fake_image_bytes"))
+            pipeline.process_receipt_image(io.BytesIO(b"fake_image_bytes"))
+
+        assert engine.call_count == 2
+        assert ocr_cache.stats()["entries"] == 0
+
+    def test_cache_bypassed_in_demo_mode(self):
+        with patch.object(pipeline, "is_demo_mode", return_value=True), \
+             patch.object(pipeline, "analyze_with_engines", return_value=(RESULT, None)) as engine:
+            pipeline.process_receipt_image(io.BytesIO(b"img"))
+            pipeline.process_receipt_image(io.BytesIO(b"img"))
+
+        assert engine.call_count == 2
@@ -0,0 +1,155 @@
+"""
+Tests per ocr/engines.py (registro e fallback) e ocr/local_engine.py (parsing regex)
+
+Copre: ordine di fallback, motori non disponibili saltati, errore del primo motore
+       se nessuno riesce, demo mode, estrazione di totale / prezzo / litri / data /
+       distributore dal testo Tesseract.
+       Il riconoscimento vero e proprio (cv2 + tesseract) non viene eseguito qui.
+
+Esecuzione: pytest tests/unit/ocr/test_engines.py -v
+"""
+
+import io
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from src.services.ocr import engines
+from src.services.ocr.base import OcrEngine
+from src.services.ocr.local_engine import parse_receipt_text
+from src.services.ocr.models import ReceiptData
+
+
+class FakeEngine(OcrEngine):
+    def __init__(self, name, result, available=True):
+        self.name, self.result, self.available, self.calls = name, result, available, 0
+
+    def is_available(self):
+        return self.available
+
+    def analyze(self, file_buffer):
+        self.calls += 1
+        return self.result
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Registro isolato: i motori reali (OpenAI, Tesseract) non vengono toccati."""
+    monkeypatch.setattr(engines, "_ENGINES", {})
+    return engines
+
+
+# =============================================================================
+# TESTS: Fallback tra motori
+# =============================================================================
+
+class TestEngineFallback:
+
+    def test_first_valid_result_wins(self, registry):
+        a = FakeEngine("a", ReceiptData(total_cost=10.0))
+        b = FakeEngine("b", ReceiptData(total_cost=20.0))
+        registry.register_engine(a)
+        registry.register_engine(b)
+
+        result, name = registry.analyze_with_engines(io.BytesIO(b"img"), order=["a", "b"])
+        assert (result.total_cost, name) == (10.0, "a")
+        assert b.calls == 0
+
+    def test_incomplete_engine_cannot_be_instantiated(self):
+        class NoAnalyze(OcrEngine):
+            name = "partial"
+
+            def is_available(self):
+                return True
+
+        with pytest.raises(TypeError):
+            NoAnalyze()
+
+    def test_falls_back_when_total_missing(self, registry):
+        registry.register_engine(FakeEngine("a", ReceiptData(raw_text="ERRORE RETE")))
+        registry.register_engine(FakeEngine("b", ReceiptData(total_cost=20.0)))
+
+        result, name = registry.analyze_with_engines(io.BytesIO(b"img"), order=["a", "b"])
+        assert (result.total_cost, name) == (20.0, "b")
+
+    def test_unavailable_and_unknown_engines_skipped(self, registry):
+        skipped = FakeEngine("a", ReceiptData(total_cost=10.0), available=False)
+        registry.register_engine(skipped)
+        registry.register_engine(FakeEngine("b", ReceiptData(total_cost=20.0)))
+
+        assert registry.available_engines(["missing", "a", "b"]) == ["b"]
+        assert registry.analyze_with_engines(io.BytesIO(b"img"), order=["a", "b"])[1] == "b"
+        assert skipped.calls == 0
+
+    def test_all_failed_returns_first_error(self, registry):
+        registry.register_engine(FakeEngine("a", ReceiptData(raw_text="ERRORE QUOTA")))
+        registry.register_engine(FakeEngine("b", ReceiptData(raw_text="ERRORE OCR LOCALE")))
+
+        result, name = registry.analyze_with_engines(io.BytesIO(b"img"), order=["a", "b"])
+        assert (result.raw_text, name) == ("ERRORE QUOTA", "a")
+
+    def test_no_engine_available(self, registry):
+        result, name = registry.analyze_with_engines(io.BytesIO(b"img"), order=["a"])
+        assert name is None and "API Key" in result.raw_text and "mancante" in result.raw_text
+        assert not registry.is_ocr_available()
+
+    def test_demo_mode_uses_mock(self, registry):
+        engine = FakeEngine("a", ReceiptData(total_cost=10.0))
+        registry.register_engine(engine)
+        with patch.object(engines, "is_demo_mode", return_value=True):
+            result, name = registry.analyze_with_engines(io.BytesIO(b"img"), order=["a"])
+        assert name is None and result.total_cost > 0 and engine.calls == 0
+
+    def test_openai_engine_follows_client(self):
+        with patch("src.services.ocr.engine.client", None):
+            assert not engines.OpenAIEngine().is_available()
+
+
+# =============================================================================
+# TESTS: Parsing del testo Tesseract
+# =============================================================================
+
+RECEIPT_TEXT = """
+ENI STATION
+Via Roma 12 - Milano
+P.IVA 01234567890
+14/03/25 10:42
+BENZINA SELF
+LITRI 34,94
+PREZZO 1,789 EUR/L
+TOTALE EURO 62,50
+"""
+
+
+class TestParseReceiptText:
+
+    def test_full_receipt(self):
+        rd = parse_receipt_text(RECEIPT_TEXT)
+        assert rd.total_cost == 62.5
+        assert rd.price_per_liter == 1.789
+        assert rd.liters == 34.94
+        assert rd.date == date(2025, 3, 14)
+        assert rd.station_name == "Eni"
+        assert rd.raw_text == "Analisi Tesseract Completata"
+
+    def test_price_derived_from_total_and_liters(self):
+        rd = parse_receipt_text("Q8 EASY\n01-02-2026\nQTA 40,00 L\nIMPORTO 72,00")
+        assert rd.price_per_liter == 1.8
+        assert rd.station_name == "Q8"
+        assert rd.date == date(2026, 2, 1)
+
+    def test_total_derived_from_price_and_liters(self):
+        rd = parse_receipt_text("1,850 €/L\n20,00 LT")
+        assert rd.total_cost == 37.0
+
+    def test_unknown_station_uses_header_line(self):
+        assert parse_receipt_text("DISTRIBUTORE ROSSI SNC\nTOTALE 50,00").station_name == "Distributore Rossi Snc"
+
+    def test_invalid_date_skipped(self):
+        assert parse_receipt_text("31/02/25 01/03/25\nTOTALE 50,00").date == date(2025, 3, 1)
+
+    def test_no_total_is_failure(self):
+        rd = parse_receipt_text("testo illeggibile")
+        assert rd.total_cost == 0
+        assert rd.raw_text.startswith("ERRORE OCR LOCALE")
@@ -0,0 +1,121 @@
+"""
+Tests per ocr/preprocessing.py e per le metriche di pipeline.process_receipt_image
+
+Copre: rotazione EXIF, scala di grigi, ritaglio sul contenuto, lato massimo,
+       fallback sui byte originali, statistiche della scansione.
+
+Esecuzione: pytest tests/unit/ocr/test_preprocessing.py -v
+"""
+
+import io
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from src.services.ocr import pipeline, preprocessing
+from src.services.ocr.models import ReceiptData
+from src.services.ocr.preprocessing import prepare_receipt_image
+
+
+def _photo(size=(4000, 3000), receipt_box=(1000, 500, 3000, 2500), orientation=None, quality=95):
+    """Foto sintetica: scontrino bianco con righe di testo su un tavolo scuro e rumoroso."""
+    rng = np.random.default_rng(0)
+    table = rng.integers(30, 90, size=(size[1], size[0], 3), dtype=np.uint8)
+    img = Image.fromarray(table, "RGB")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle(receipt_box, fill=(245, 245, 240))
+    left, top, right, bottom = receipt_box
+    width = right - left
+    for y in range(top + 60, bottom - 60, 80):
+        draw.rectangle((left + width // 10, y, right - width // 5, y + 25), fill=(20, 20, 20))
+
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    out = io.BytesIO()
+    img.save(out, format="JPEG", quality=quality, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def _decode(data):
+    return Image.open(io.BytesIO(data))
+
+
+# =============================================================================
+# TESTS: Preparazione immagine
+# =============================================================================
+
+class TestPrepareReceiptImage:
+
+    def test_large_photo_is_reduced(self):
+        raw = _photo()
+        res = prepare_receipt_image(raw, max_edge=1600, quality=80)
+
+        assert res.applied
+        assert res.bytes_saved > 0 and res.output_bytes < res.original_bytes / 3
+        img = _decode(res.data)
+        assert img.format == "JPEG" and img.mode == "L"
+        assert max(img.size) <= 1600
+        assert res.size == img.size
+
+    def test_exif_rotation_applied(self):
+        raw = _photo(orientation=6)  # 90° in senso orario: la foto "vera" è verticale
+        img = _decode(prepare_receipt_image(raw, max_edge=1600, crop=False).data)
+        assert img.size == (1200, 1600)
+
+    def test_crop_to_receipt(self):
+        raw = _photo(receipt_box=(1000, 200, 2000, 2800))  # scontrino stretto e alto
+        img = _decode(prepare_receipt_image(raw, max_edge=4000, crop=True).data)
+
+        width, height = img.size
+        assert 1000 <= width <= 1200      # 1000 px di carta + margini
+        assert 2600 <= height <= 2900
+        # Oltre il margine (2% del lato) si è già sulla carta: il tavolo scuro è stato rimosso
+        assert np.asarray(img)[100, 120] > 150
+
+    def test_color_kept_when_grayscale_disabled(self):
+        img = _decode(prepare_receipt_image(_photo(), grayscale=False).data)
+        assert img.mode == "RGB"
+
+    def test_not_an_image_passes_through(self):
+        res = prepare_receipt_image(b"fake_image_bytes")
+        assert res.data == b"fake_image_bytes"
+        assert not res.applied and res.bytes_saved == 0
+
+    def test_small_image_kept_when_not_smaller(self):
+        raw = _photo(size=(300, 400), receipt_box=(20, 20, 280, 380), quality=30)
+        res = prepare_receipt_image(raw, quality=95)
+        assert res.data == raw and not res.applied
+
+    def test_disabled_by_config(self, monkeypatch):
+        monkeypatch.setattr(preprocessing, "cfg", lambda path, fallback=None: False if path.endswith("enabled") else fallback)
+        raw = _photo()
+        assert prepare_receipt_image(raw).data == raw
+
+
+# =============================================================================
+# TESTS: Pipeline
+# =============================================================================
+
+class TestPipelineStats:
+
+    def test_scan_sends_prepared_image_and_reports_stats(self):
+        raw = _photo()
+        sent = {}
+
+        def fake_analyze(buffer):
+            sent["bytes"] = buffer.read()
+            return ReceiptData(total_cost=50.0), "openai"
+
+        with patch.object(pipeline, "analyze_with_engines", side_effect=fake_analyze):
+            result = pipeline.process_receipt_image(io.BytesIO(raw))
+
+        stats = result.scan_stats
+        assert len(sent["bytes"]) == stats["sent_bytes"] < stats["original_bytes"] == len(raw)
+        assert stats["bytes_saved"] == stats["original_bytes"] - stats["sent_bytes"]
+        assert stats["total_ms"] >= stats["preprocess_ms"] > 0
+
+    def test_empty_upload(self):
+        assert pipeline.process_receipt_image(None) == ReceiptData()
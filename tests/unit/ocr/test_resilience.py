@@ -0,0 +1,207 @@
+"""
+Tests per ocr/resilience.py e per il suo uso in engine.analyze_receipt
+
+Copre: transizioni del circuit breaker, retry solo su errori transitori,
+       deadline complessiva, contatori, fallback al motore locale con breaker aperto.
+
+Esecuzione: pytest tests/unit/ocr/test_resilience.py -v
+"""
+
+import io
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+from openai import APIConnectionError, AuthenticationError, RateLimitError
+
+from src.services.ocr import engine, engines
+from src.services.ocr.models import ReceiptData
+from src.services.ocr.resilience import (
+    CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, ResiliencePolicy,
+)
+
+
+class Transient(Exception):
+    pass
+
+
+class Permanent(Exception):
+    pass
+
+
+def _policy(**kwargs):
+    kwargs.setdefault("breaker", CircuitBreaker(failure_threshold=2, reset_seconds=60))
+    return ResiliencePolicy("test", lambda e: isinstance(e, Transient), sleep=lambda s: None, **kwargs)
+
+
+def _failing(*errors, result="ok"):
+    """func(timeout) che solleva gli errori indicati, poi ritorna result."""
+    calls = []
+
+    def func(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return func, calls
+
+
+def _status_error(cls, status, code=None):
+    resp = MagicMock()
+    resp.status_code = status
+    resp.headers = {}
+    resp.request = MagicMock()
+    return cls(message="errore", response=resp, body={"code": code} if code else {})
+
+
+# =============================================================================
+# TESTS: Circuit breaker
+# =============================================================================
+
+class TestCircuitBreaker:
+
+    def test_open_half_open_closed(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10, clock=lambda: now[0])
+
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN and not breaker.allow()
+
+        now[0] = 10.0
+        assert breaker.state == HALF_OPEN
+        assert breaker.allow()            # una sola chiamata di prova
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+
+    def test_failed_trial_reopens(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 10.0
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN and breaker.times_opened == 2
+        assert breaker.retry_in() == 10.0
+
+
+# =============================================================================
+# TESTS: Policy
+# =============================================================================
+
+class TestResiliencePolicy:
+
+    def test_transient_errors_retried(self):
+        policy = _policy(max_attempts=3)
+        func, calls = _failing(Transient(), Transient())
+
+        assert policy.call(func) == "ok"
+        # Ogni tentativo riceve il tempo residuo della deadline come timeout
+        assert calls[0] == pytest.approx(30.0, abs=0.5) and calls[0] >= calls[-1]
+        stats = policy.stats()
+        assert (stats["attempts"], stats["retries"], stats["successes"], stats["failures"]) == (3, 2, 1, 0)
+        assert stats["breaker_state"] == CLOSED
+
+    def test_gives_up_after_max_attempts(self):
+        policy = _policy(max_attempts=3)
+        func, calls = _failing(*[Transient()] * 5)
+
+        with pytest.raises(Transient):
+            policy.call(func)
+        assert len(calls) == 3
+        assert policy.stats()["failures"] == 1 and policy.stats()["consecutive_failures"] == 1
+
+    def test_permanent_error_not_retried_nor_counted_by_breaker(self):
+        policy = _policy(max_attempts=3)
+        func, calls = _failing(Permanent())
+
+        with pytest.raises(Permanent):
+            policy.call(func)
+        assert len(calls) == 1
+        assert policy.stats()["consecutive_failures"] == 0
+
+    def test_breaker_short_circuits(self):
+        policy = _policy(max_attempts=1)
+        for _ in range(2):
+            with pytest.raises(Transient):
+                policy.call(_failing(Transient())[0])
+
+        func, calls = _failing()
+        with pytest.raises(CircuitOpenError):
+            policy.call(func)
+        assert calls == []
+        stats = policy.stats()
+        assert stats["short_circuits"] == 1 and stats["breaker_state"] == OPEN and stats["breaker_opened"] == 1
+
+    def test_deadline_bounds_attempts(self):
+        policy = _policy(max_attempts=50, deadline_seconds=0.2, backoff_base_seconds=0.001)
+        calls = []
+
+        def slow(timeout):
+            calls.append(timeout)
+            time.sleep(0.06)
+            raise Transient()
+
+        with pytest.raises(Transient):
+            policy.call(slow)
+        assert 2 <= len(calls) <= 5
+
+
+# =============================================================================
+# TESTS: Engine OpenAI
+# =============================================================================
+
+def _completion(content='{"total_cost": 50.0, "price_per_liter": 1.8, "date": null, "station_name": null}'):
+    completion = MagicMock()
+    completion.choices[0].message.content = content
+    return completion
+
+
+class TestEngineResilience:
+
+    @patch("src.services.ocr.engine.client")
+    def test_connection_blip_recovered(self, mock_client, ocr_resilience):
+        mock_client.chat.completions.create.side_effect = [APIConnectionError(request=MagicMock()), _completion()]
+
+        result = engine.analyze_receipt(io.BytesIO(b"img"))
+        assert result.total_cost == 50.0
+        assert mock_client.chat.completions.create.call_count == 2
+        assert mock_client.chat.completions.create.call_args.kwargs["timeout"] > 0
+        assert engine.resilience_stats()["retries"] == 1
+
+    @patch("src.services.ocr.engine.client")
+    def test_exhausted_quota_not_retried(self, mock_client):
+        mock_client.chat.completions.create.side_effect = _status_error(RateLimitError, 429, "insufficient_quota")
+
+        result = engine.analyze_receipt(io.BytesIO(b"img"))
+        assert "QUOTA" in result.raw_text
+        assert mock_client.chat.completions.create.call_count == 1
+
+    @patch("src.services.ocr.engine.client")
+    def test_auth_error_not_retried(self, mock_client, ocr_resilience):
+        mock_client.chat.completions.create.side_effect = _status_error(AuthenticationError, 401)
+
+        assert "AUTH" in engine.analyze_receipt(io.BytesIO(b"img")).raw_text
+        assert mock_client.chat.completions.create.call_count == 1
+        assert ocr_resilience.stats()["breaker_state"] == CLOSED
+
+    @patch("src.services.ocr.engine.client")
+    def test_open_breaker_fails_fast_to_local_engine(self, mock_client, ocr_resilience, monkeypatch):
+        mock_client.chat.completions.create.side_effect = APIConnectionError(request=MagicMock())
+        for _ in range(ocr_resilience.breaker.failure_threshold):
+            engine.analyze_receipt(io.BytesIO(b"img"))
+        calls_before = mock_client.chat.completions.create.call_count
+        assert ocr_resilience.stats()["breaker_state"] == OPEN
+
+        local = MagicMock(name="tesseract")
+        local.is_available.return_value = True
+        local.analyze.return_value = ReceiptData(total_cost=42.0)
+        monkeypatch.setitem(engines._ENGINES, "tesseract", local)
+
+        result, name = engines.analyze_with_engines(io.BytesIO(b"img"), order=["openai", "tesseract"])
+        assert (result.total_cost, name) == (42.0, "tesseract")
+        assert mock_client.chat.completions.create.call_count == calls_before
+        assert ocr_resilience.stats()["short_circuits"] == 1
@@ -1,6 +1,7 @@
-from datetime import date
+import random
+from datetime import date, timedelta
 from src.database.models import Refueling
-from src.services.business.calculations import calculate_stats
+from src.services.business.calculations import calculate_stats, calculate_all_stats
 
 def test_simple_consumption():
     """Scenario Standard: Due pieni completi consecutivi."""
@@ -41,4 +42,30 @@ def test_first_record():
     stats = calculate_stats(curr, [curr])
     
     assert stats["delta_km"] == 0
-    assert stats["km_per_liter"] is None
\ No newline at end of file
+    assert stats["km_per_liter"] is None
+
+
+def test_all_stats_empty_history():
+    """Edge Case: storico vuoto → nessuna statistica."""
+    assert calculate_all_stats([]) == []
+
+
+def test_all_stats_matches_per_record_stats():
+    """Parità: la versione batch deve coincidere ESATTAMENTE con calculate_stats su ogni record."""
+    rng = random.Random(42)
+    history = []
+    day, km = date(2022, 1, 1), 40000
+    for i in range(300):
+        # Alcuni record condividono la data (stesso giorno) per coprire i casi di parità
+        day += timedelta(days=rng.choice([0, 0, 3, 7, 12]))
+        km += rng.randint(0, 700)
+        history.append(Refueling(
+            id=i, date=day, total_km=km,
+            liters=rng.choice([0.0, rng.uniform(5, 55)]),
+            is_full_tank=rng.random() > 0.35
+        ))
+    rng.shuffle(history)
+
+    batch = calculate_all_stats(history)
+
+    assert batch == [calculate_stats(r, history) for r in history]
@@ -0,0 +1,179 @@
+"""
+Tests per exporters/artifact_cache.py (cache dei file di export):
+  - LRU in memoria limitato in byte, livello su disco persistente tra istanze
+  - livello su disco per utente, svuotato quando cambiano i dati dell'utente
+  - chiavi: parametri, anno e versione dati distinti → file distinti
+  - export Excel / PDF cachati: nessuna rigenerazione finché i dati non cambiano
+
+Esecuzione: pytest tests/unit/services/test_export_cache.py -v
+"""
+
+import os
+from datetime import date
+from unittest.mock import patch
+
+import pytest
+
+from src.database import cache, crud
+from src.services.data.exporters import artifact_cache
+from src.services.data.exporters.artifact_cache import ExportCache, make_key
+
+USER_ID = "test-user-uuid"
+
+
+@pytest.fixture
+def export_cache(tmp_path, monkeypatch):
+    """Cache isolata per test (directory temporanea), al posto dell'istanza condivisa."""
+    instance = ExportCache(max_bytes=1024, disk_dir=str(tmp_path / "exports"), disk_max_bytes=4096)
+    monkeypatch.setattr(artifact_cache, "get_export_cache", lambda: instance)
+    monkeypatch.setattr(cache, "_bump_listeners", [instance.on_data_changed])
+    return instance
+
+
+# =============================================================================
+# TESTS: ExportCache
+# =============================================================================
+
+class TestExportCache:
+
+    def test_memory_lru_evicts_least_recent(self):
+        c = ExportCache(max_bytes=10)
+        c.put(USER_ID, "a", b"aaaa")
+        c.put(USER_ID, "b", b"bbbb")
+        c.get(USER_ID, "a")        # 'a' diventa la più recente
+        c.put(USER_ID, "c", b"cccc")  # 12 byte > 10 → esce 'b'
+
+        assert c.get(USER_ID, "b") is None
+        assert c.get(USER_ID, "a") == b"aaaa"
+        assert c.stats()["evictions"] == 1
+        assert c.stats()["bytes"] == 8
+
+    def test_oversized_item_skips_memory(self):
+        c = ExportCache(max_bytes=3)
+        c.put(USER_ID, "big", b"xxxx")
+        assert c.stats()["entries"] == 0
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        disk = str(tmp_path / "exports")
+        ExportCache(max_bytes=100, disk_dir=disk, disk_max_bytes=100).put(USER_ID, "k", b"payload")
+
+        fresh = ExportCache(max_bytes=100, disk_dir=disk, disk_max_bytes=100)
+        assert fresh.get(USER_ID, "k") == b"payload"
+        assert fresh.stats()["disk_hits"] == 1
+        assert fresh.get(USER_ID, "k") == b"payload"
+        assert fresh.stats()["hits"] == 1   # promossa in memoria
+
+    def test_disk_tier_is_size_bounded(self, tmp_path):
+        disk = tmp_path / "exports"
+        c = ExportCache(max_bytes=100, disk_dir=str(disk), disk_max_bytes=10)
+        c.put(USER_ID, "old", b"123456")
+        os.utime(c._path(USER_ID, "old"), (1, 1))  # accesso più vecchio
+        c.put("other", "new", b"654321")
+
+        assert [os.path.basename(p) for p in c._disk_files()] == ["new.bin"]
+
+    def test_disk_entries_are_per_user(self, tmp_path):
+        disk = tmp_path / "exports"
+        c = ExportCache(max_bytes=100, disk_dir=str(disk), disk_max_bytes=100)
+        c.put(USER_ID, "k", b"mine")
+        c.put("other", "k", b"theirs")
+
+        assert len(os.listdir(disk)) == 2
+        assert USER_ID not in os.listdir(disk)   # directory con l'hash, non l'id in chiaro
+        assert (c.get(USER_ID, "k"), c.get("other", "k")) == (b"mine", b"theirs")
+
+    def test_purge_user_removes_only_that_user(self, tmp_path):
+        c = ExportCache(max_bytes=100, disk_dir=str(tmp_path / "exports"), disk_max_bytes=100)
+        c.put(USER_ID, "k", b"mine")
+        c.put("other", "k", b"theirs")
+
+        c.purge_user(USER_ID)
+
+        assert not os.path.exists(c._user_dir(USER_ID))
+        assert c.get(USER_ID, "k") is None
+        assert c.get("other", "k") == b"theirs"
+        assert c.stats()["bytes"] == len(b"theirs")
+
+    def test_disk_tier_off_by_default(self, monkeypatch):
+        monkeypatch.setattr(artifact_cache, "cfg", lambda key, fallback=None: fallback)
+        monkeypatch.setattr(cache, "_bump_listeners", [])
+        artifact_cache.get_export_cache.cache_clear()
+        try:
+            instance = artifact_cache.get_export_cache()
+            assert instance.disk_dir is None
+            assert cache._bump_listeners == [instance.on_data_changed]
+        finally:
+            artifact_cache.get_export_cache.cache_clear()
+
+    def test_get_or_create_builds_once(self):
+        c = ExportCache(max_bytes=100)
+        calls = []
+        build = lambda: calls.append(1) or b"data"
+
+        assert c.get_or_create(USER_ID, "k", build) == b"data"
+        assert c.get_or_create(USER_ID, "k", build) == b"data"
+        assert len(calls) == 1
+
+
+# =============================================================================
+# TESTS: Chiavi ed export cachati
+# =============================================================================
+
+class TestCachedExports:
+
+    def test_key_components(self):
+        base = make_key(USER_ID, "pdf", 2024, {"plate": "AB123CD"}, "v1")
+        assert base == make_key(USER_ID, "pdf", 2024, {"plate": "AB123CD"}, "v1")
+        assert base != make_key("other", "pdf", 2024, {"plate": "AB123CD"}, "v1")
+        assert base != make_key(USER_ID, "pdf", 2025, {"plate": "AB123CD"}, "v1")
+        assert base != make_key(USER_ID, "pdf", 2024, {"plate": "ZZ999ZZ"}, "v1")
+        assert base != make_key(USER_ID, "pdf", 2024, {"plate": "AB123CD"}, "v2")
+
+    def test_excel_regenerated_only_after_write(self, db_session, export_cache):
+        export_cache.max_bytes = 10 * 1024 * 1024
+        crud.create_refueling(db_session, USER_ID, date(2025, 1, 1), 50000, 1.8, 90.0, 50.0, True)
+
+        with patch.object(artifact_cache.reports, "generate_excel_report",
+                          side_effect=lambda db, uid: b"xlsx-%d" % len(crud.get_all_refuelings(db, uid))) as gen:
+            first = artifact_cache.get_excel_report(db_session, USER_ID)
+            assert artifact_cache.get_excel_report(db_session, USER_ID) == first
+            assert gen.call_count == 1
+
+            crud.create_refueling(db_session, USER_ID, date(2025, 2, 1), 51000, 1.8, 90.0, 50.0, True)
+            assert artifact_cache.get_excel_report(db_session, USER_ID) == b"xlsx-2"
+            assert gen.call_count == 2
+
+    def test_pdf_keyed_by_parameters(self, db_session, export_cache):
+        crud.create_maintenance(db_session, USER_ID, date(2024, 5, 1), 60000, "Gomme", 400.0)
+
+        with patch.object(artifact_cache.pdf_generator, "generate_maintenance_report",
+                          return_value=b"%PDF") as gen:
+            artifact_cache.get_maintenance_report(db_session, USER_ID, "Mario", "AB123CD", "Panda", 2024)
+            artifact_cache.get_maintenance_report(db_session, USER_ID, "Mario", "AB123CD", "Panda", 2024)
+            assert gen.call_count == 1
+
+            artifact_cache.get_maintenance_report(db_session, USER_ID, "Mario", "AB123CD", "Panda", None)
+            artifact_cache.get_maintenance_report(db_session, USER_ID, "Luigi", "AB123CD", "Panda", 2024)
+            assert gen.call_count == 3
+
+    def test_write_purges_user_files(self, db_session, export_cache):
+        crud.create_maintenance(db_session, USER_ID, date(2024, 5, 1), 60000, "Gomme", 400.0)
+
+        with patch.object(artifact_cache.pdf_generator, "generate_maintenance_report", return_value=b"%PDF"):
+            artifact_cache.get_maintenance_report(db_session, USER_ID, "Mario", "AB123CD", "Panda", 2024)
+        assert export_cache._disk_files()
+
+        crud.update_settings(db_session, USER_ID, 5.0, 120.0, 33.0, ["A"], ["B"])
+        assert export_cache._disk_files()           # impostazioni: non entrano negli export
+
+        crud.create_maintenance(db_session, USER_ID, date(2024, 6, 1), 61000, "Olio", 80.0)
+        assert export_cache._disk_files() == []
+        assert export_cache.stats()["entries"] == 0
+
+    def test_data_version_is_content_based(self, db_session):
+        """Il digest dipende dai dati, non dai contatori di processo: valido anche dopo un riavvio."""
+        crud.create_maintenance(db_session, USER_ID, date(2024, 5, 1), 60000, "Gomme", 400.0)
+        digest = artifact_cache._maintenances_digest(db_session, USER_ID)
+
+        artifact_cache._maintenances_digest.clear()
+        assert artifact_cache._maintenances_digest(db_session, USER_ID) == digest
@@ -0,0 +1,113 @@
+"""
+Tests per exporters/pdf_generator.py:
+  - asset del logo risolti una volta per processo e ridimensionati a LOGO_DPI
+  - immagine decodificata una sola volta tra pagine e documenti dello stesso thread
+  - generazione massiva in process pool: ordine, tempi ed errori per documento
+
+Esecuzione: pytest tests/unit/services/test_pdf_generator.py -v
+"""
+
+import threading
+from datetime import date
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import fpdf.image_parsing
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.database import crud
+from src.database.models import Base
+from src.database.pool import build_engine
+from src.services.data.exporters import pdf_generator
+from src.services.data.exporters.pdf_generator import (
+    ServiceBookJob, generate_maintenance_report, generate_maintenance_reports_batch
+)
+
+USER_ID = "test-user-uuid"
+
+
+def _maintenances(n):
+    return [SimpleNamespace(date=date(2024, 1, 1 + i % 28), total_km=1000 * i, expense_type="Tagliando",
+                            cost=100.0, description="Olio", expiry_km=None, expiry_date=None)
+            for i in range(n)]
+
+
+def _in_fresh_thread(func):
+    """Esegue func in un thread nuovo (ImageCache thread-local vuota) e ne ritorna il risultato."""
+    out = {}
+    t = threading.Thread(target=lambda: out.setdefault("value", func()))
+    t.start()
+    t.join()
+    return out["value"]
+
+
+# =============================================================================
+# TESTS: Asset condivisi
+# =============================================================================
+
+class TestAssets:
+
+    def test_logo_resolved_at_print_resolution(self):
+        asset = pdf_generator._logo_asset()
+        if asset is None:
+            pytest.skip("assets/logo.png non presente")
+        _, (width, height) = asset
+        assert height == round(pdf_generator.LOGO_HEIGHT_MM / 25.4 * pdf_generator.LOGO_DPI)
+        assert width > height
+
+    def test_logo_decoded_once_across_pages_and_documents(self):
+        if pdf_generator._logo_asset() is None:
+            pytest.skip("assets/logo.png non presente")
+
+        def render_two():
+            with patch.object(pdf_generator.crud, "get_all_maintenances", side_effect=lambda db, u: _maintenances(80)), \
+                 patch.object(fpdf.image_parsing, "get_img_info", wraps=fpdf.image_parsing.get_img_info) as decode:
+                docs = [generate_maintenance_report(None, USER_ID, "Mario", "AB123CD", "Panda") for _ in range(2)]
+            return docs, decode.call_count
+
+        docs, decodes = _in_fresh_thread(render_two)
+
+        assert decodes == 1
+        # Ogni documento (multi-pagina) incorpora comunque il logo
+        for pdf in docs:
+            assert b"/Count 1\n" not in pdf
+            assert b"/Subtype /Image" in pdf
+
+
+# =============================================================================
+# TESTS: Generazione massiva
+# =============================================================================
+
+class TestBatch:
+
+    @pytest.fixture
+    def database_url(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'batch.db'}"
+        engine = create_engine(url)
+        Base.metadata.create_all(bind=engine)
+        engine.dispose()
+
+        db = sessionmaker(bind=build_engine(url))()
+        crud.create_maintenance(db, USER_ID, date(2024, 5, 1), 60000, "Gomme", 400.0)
+        crud.create_maintenance(db, USER_ID, date(2025, 3, 1), 70000, "Tagliando", 250.0)
+        db.close()
+        return url
+
+    def test_results_in_job_order_with_timing(self, database_url):
+        jobs = [
+            ServiceBookJob(USER_ID, "Mario", "AB123CD", "Panda", 2024),
+            ServiceBookJob(USER_ID, "Mario", "AB123CD", "Panda", 2025),
+            ServiceBookJob(USER_ID, "Mario", None, "Panda"),   # targa mancante → errore del singolo job
+        ]
+        results = generate_maintenance_reports_batch(jobs, database_url=database_url, max_workers=2)
+
+        assert [r.job for r in results] == jobs
+        assert [r.ok for r in results] == [True, True, False]
+        assert all(r.pdf.startswith(b"%PDF") for r in results[:2])
+        assert all(r.seconds > 0 for r in results)
+        assert results[2].pdf is None and "AttributeError" in results[2].error
+
+    def test_empty_batch(self):
+        assert generate_maintenance_reports_batch([], database_url="sqlite://") == []
@@ -0,0 +1,196 @@
+"""
+Tests per exporters/reports.py (export Excel) ed exporters/streaming.py (CSV / NDJSON):
+  - contenuto e formati (date dd/mm/yyyy, bordi, header, ordinamento)
+  - celle nulle scritte come blank formattate, foglio vuoto con solo header
+  - stima della larghezza colonne su campione
+  - crescita lineare della memoria con il numero di righe
+  - export in streaming: contenuto, un blocco per partizione, reimport del CSV
+
+Esecuzione: pytest tests/unit/services/test_reports.py -v
+"""
+
+import io
+import json
+from datetime import date, datetime
+
+import openpyxl
+import pandas as pd
+import pytest
+
+from src.database import crud
+from src.database.dto import MaintenanceDTO, RefuelingDTO
+from src.scripts.bench_excel_export import build_history, measure
+from src.services.data.exporters import reports, streaming
+from src.services.data.importers import fuel
+
+USER_ID = "test-user-uuid"
+
+
+# =============================================================================
+# HELPERS
+# =============================================================================
+
+def _fuel(i, day, notes=None, full=True):
+    return RefuelingDTO(id=i, user_id=USER_ID, date=day, total_km=1000 * i, price_per_liter=1.8,
+                        total_cost=90.0, liters=50.0, is_full_tank=full, notes=notes)
+
+
+def _maint(i, day, description=None, expiry_km=None, expiry_date=None):
+    return MaintenanceDTO(id=i, user_id=USER_ID, date=day, total_km=1000 * i, expense_type="Tagliando",
+                          cost=250.0, description=description, expiry_km=expiry_km, expiry_date=expiry_date)
+
+
+def _load(payload):
+    return openpyxl.load_workbook(io.BytesIO(payload))
+
+
+# =============================================================================
+# TESTS: Contenuto e formati
+# =============================================================================
+
+class TestExcelContent:
+
+    def test_sheets_headers_and_sorting(self):
+        refs = [_fuel(2, date(2025, 3, 1), full=False), _fuel(1, date(2025, 1, 1), notes="Autostrada")]
+        wb = _load(reports.build_excel_report(refs, [_maint(1, date(2025, 2, 1))]))
+
+        assert wb.sheetnames == ["Rifornimenti", "Manutenzione"]
+        ws = wb["Rifornimenti"]
+        header = [c.value for c in ws[1]]
+        assert header == ["Data", "Km", "Prezzo", "Costo", "Litri", "Pieno", "Note"]
+        assert all(c.font.b and c.fill.fgColor.rgb.endswith("D9E1F2") for c in ws[1])
+
+        rows = [[c.value for c in r] for r in ws.iter_rows(min_row=2)]
+        assert rows == [
+            [datetime(2025, 1, 1), 1000, 1.8, 90, 50, "Sì", "Autostrada"],
+            [datetime(2025, 3, 1), 2000, 1.8, 90, 50, "No", None],
+        ]
+
+    def test_cell_formats(self):
+        maint = _maint(1, date(2025, 2, 1), expiry_km=16000, expiry_date=date(2026, 2, 1))
+        ws = _load(reports.build_excel_report([], [maint]))["Manutenzione"]
+
+        data_row = ws[2]
+        assert data_row[0].number_format == "dd/mm/yyyy"
+        assert data_row[6].value == datetime(2026, 2, 1)
+        assert data_row[6].number_format == "dd/mm/yyyy"
+        assert all(c.border.left.style == "thin" and c.alignment.horizontal == "center" for c in data_row)
+
+    def test_null_cells_are_formatted_blanks(self):
+        ws = _load(reports.build_excel_report([], [_maint(1, date(2025, 2, 1))]))["Manutenzione"]
+
+        for cell in ws[2][4:]:  # Descrizione, Scadenza Km, Scadenza Data
+            assert cell.value is None
+            assert cell.border.left.style == "thin"
+
+    def test_empty_history_writes_headers_only(self):
+        wb = _load(reports.build_excel_report([], []))
+        for ws in wb:
+            assert ws.max_row == 1
+
+    def test_generate_reads_from_db(self, db_session):
+        crud.create_refueling(db=db_session, user_id=USER_ID, date_obj=date(2025, 1, 1), total_km=50000,
+                              price_per_liter=1.8, total_cost=90.0, liters=50.0, is_full_tank=True)
+        ws = _load(reports.generate_excel_report(db_session, USER_ID))["Rifornimenti"]
+        assert ws.max_row == 2
+        assert ws["B2"].value == 50000
+
+
+# =============================================================================
+# TESTS: Larghezza colonne
+# =============================================================================
+
+class TestColumnWidths:
+
+    def test_minimum_and_long_text(self):
+        refs = [_fuel(1, date(2025, 1, 1), notes="x" * 40)]
+        ws = _load(reports.build_excel_report(refs, []))["Rifornimenti"]
+
+        assert ws.column_dimensions["G"].width == pytest.approx(44, abs=1)  # 40 + 4
+        assert ws.column_dimensions["B"].width == pytest.approx(15, abs=1)  # minimo (B:F raggruppate)
+
+    def test_sample_covers_head_and_spread(self, monkeypatch):
+        monkeypatch.setattr(reports, "WIDTH_SAMPLE_HEAD", 5)
+        monkeypatch.setattr(reports, "WIDTH_SAMPLE_SPREAD", 5)
+        df = pd.DataFrame({"Note": ["a"] * 100})
+        df.loc[2, "Note"] = "b" * 20    # nella testa
+        df.loc[99, "Note"] = "c" * 30   # ultima riga, sempre campionata
+
+        assert reports._estimate_widths(df) == [34]
+
+
+# =============================================================================
+# TESTS: Scalabilità
+# =============================================================================
+
+class TestScaling:
+
+    def test_history_rows_roundtrip(self):
+        refs, maints = build_history(1200)
+        wb = _load(reports.build_excel_report(refs, maints))
+        assert wb["Rifornimenti"].max_row == 1201
+        assert wb["Manutenzione"].max_row == len(maints) + 1
+
+    def test_peak_memory_grows_linearly(self):
+        small, large = measure(1000), measure(4000)
+        # 4x righe → memoria al più ~4x (+ margine per overhead fisso), mai quadratica
+        assert large["peak_mb"] < small["peak_mb"] * 5
+
+
+# =============================================================================
+# TESTS: Export in streaming (CSV / NDJSON)
+# =============================================================================
+
+def _seed(db_session, n=5):
+    crud.bulk_create_refuelings(db_session, USER_ID, [
+        {"date": date(2024, 1, 1 + i), "total_km": 40000 + i * 500, "price_per_liter": 1.8,
+         "total_cost": 90.0, "liters": 50.0, "is_full_tank": i % 2 == 0, "notes": "a, \"b\"" if i == 0 else None}
+        for i in range(n)
+    ])
+
+
+class TestStreamingExport:
+
+    def test_csv_matches_excel_columns(self, db_session):
+        _seed(db_session)
+        text = b"".join(streaming.stream_export(db_session, USER_ID, "fuel", "csv")).decode("utf-8")
+        lines = text.splitlines()
+
+        assert lines[0] == "Data,Km,Prezzo,Costo,Litri,Pieno,Note"
+        assert lines[1] == '2024-01-01,40000,1.8,90.0,50.0,Sì,"a, ""b"""'
+        assert len(lines) == 6
+
+    def test_one_chunk_per_partition(self, db_session):
+        _seed(db_session)
+        chunks = list(streaming.stream_export(db_session, USER_ID, "fuel", "ndjson", chunk_size=2))
+        assert [c.count(b"\n") for c in chunks] == [2, 2, 1]
+
+    def test_ndjson_records(self, db_session):
+        crud.create_maintenance(db_session, USER_ID, date(2024, 5, 1), 60000, "Gomme", 400.0,
+                                expiry_date=date(2028, 5, 1))
+        lines = b"".join(streaming.stream_export(db_session, USER_ID, "maintenance", "ndjson")).splitlines()
+        record = json.loads(lines[0])
+
+        assert "user_id" not in record
+        assert record["date"] == "2024-05-01"
+        assert record["expiry_date"] == "2028-05-01"
+        assert record["expense_type"] == "Gomme"
+
+    def test_empty_csv_has_header(self, db_session):
+        chunks = list(streaming.stream_export(db_session, USER_ID, "maintenance", "csv"))
+        assert b"".join(chunks) == "Data,Km,Tipo,Costo,Descrizione,Scadenza Km,Scadenza Data\n".encode()
+
+    def test_invalid_arguments(self, db_session):
+        with pytest.raises(ValueError):
+            streaming.stream_export(db_session, USER_ID, "reminders")
+        with pytest.raises(ValueError):
+            streaming.stream_export(db_session, USER_ID, "fuel", "xml")
+
+    def test_fuel_csv_is_reimportable(self, db_session):
+        _seed(db_session)
+        with streaming.write_export(db_session, USER_ID, "fuel", "csv") as export_file:
+            df = pd.read_csv(export_file)
+
+        result, error = fuel.process_fuel_data(db_session, USER_ID, df)
+        assert error is None
+        assert set(result["Stato"]) == {"Invariato"}